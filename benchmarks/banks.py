@@ -0,0 +1,125 @@
+"""
+Term bank split settings compared by what they cost at import time.
+
+The corpus is converted once, then packed with each setting. The import
+side is simulated the way Yomitan handles a dictionary: every term bank is
+read and parsed as one JSON document, so the slowest bank and the memory
+that one bank needs are what stall the browser.
+
+    python -m benchmarks.banks --size 10k
+    python -m benchmarks.banks --size 100k --setting 10000:0 --setting 10000:2
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+from benchmarks.corpus import SIZES, corpus_path
+from benchmarks.run import DEFAULT_CORPUS_DIR
+from src.converter import DslConverter
+from src.packer import YomitanPacker
+from src.parser import DslParser
+from src.pipeline import encode_entry, load_abbreviations
+
+# entries per bank : MiB per bank (0 = entry count only)
+DEFAULT_SETTINGS = ["10000:0", "10000:16", "10000:4", "10000:1"]
+
+
+def encode_corpus(dsl_path: Path) -> list[tuple[list[bytes], bytes]]:
+    converter = DslConverter(load_abbreviations(dsl_path.parent))
+    return [
+        encode_entry(converter, entry) for entry in DslParser(str(dsl_path)).parse()
+    ]
+
+
+def import_banks(zip_path: Path) -> dict[str, float]:
+    """Parses every term bank like an import; returns total and worst-bank time and memory."""
+    total = slowest = peak = 0.0
+    largest = 0
+    with zipfile.ZipFile(zip_path) as zipf:
+        banks = [
+            info for info in zipf.infolist() if info.filename.startswith("term_bank_")
+        ]
+        for info in banks:
+            data = zipf.read(info)
+            started = time.perf_counter()
+            json.loads(data)
+            seconds = time.perf_counter() - started
+            # Second parse under tracemalloc, which would distort the timing
+            tracemalloc.start()
+            json.loads(data)
+            _, bank_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            total += seconds
+            slowest = max(slowest, seconds)
+            peak = max(peak, bank_peak)
+            largest = max(largest, info.file_size)
+    return {
+        "banks": len(banks),
+        "largest_mb": round(largest / 1_048_576, 2),
+        "import_s": round(total, 3),
+        "slowest_bank_s": round(slowest, 3),
+        "peak_mb": round(peak / 1_048_576, 1),
+    }
+
+
+def measure(
+    entries: list[tuple[list[bytes], bytes]], max_entries: int, max_mb: float
+) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as output_dir:
+        packer = YomitanPacker(
+            output_dir,
+            "bench",
+            streaming=True,
+            max_entries_per_bank=max_entries,
+            max_bank_bytes=int(max_mb * 1_048_576) or None,
+        )
+        started = time.perf_counter()
+        for sequence, (prefixes, glossary_json) in enumerate(entries, 1):
+            packer.add_encoded_variants(prefixes, glossary_json, sequence)
+        zip_path = packer.pack({"title": "bench", "format": 3})
+        result = {"pack_s": round(time.perf_counter() - started, 3)}
+        result.update(import_banks(zip_path))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare term bank split settings by import time and memory."
+    )
+    parser.add_argument(
+        "--size", choices=SIZES, default="10k", help="Corpus size (default: 10k)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument(
+        "--corpus-dir",
+        default=str(DEFAULT_CORPUS_DIR),
+        help="Where generated corpora are kept",
+    )
+    parser.add_argument(
+        "--setting",
+        action="append",
+        metavar="ENTRIES:MB",
+        help="Split setting (repeatable, default: a few)",
+    )
+    args = parser.parse_args()
+
+    entries = encode_corpus(corpus_path(Path(args.corpus_dir), args.size, args.seed))
+    print(
+        f"{'setting':<12} {'banks':>6} {'largest':>9} {'pack':>8} {'import':>8} {'slowest':>8} {'peak':>9}"
+    )
+    for setting in args.setting or DEFAULT_SETTINGS:
+        max_entries, max_mb = setting.split(":")
+        r = measure(entries, int(max_entries), float(max_mb))
+        print(
+            f"{setting:<12} {r['banks']:>6} {r['largest_mb']:>6.2f} MiB {r['pack_s']:>6.2f} s "
+            f"{r['import_s']:>6.2f} s {r['slowest_bank_s']:>6.3f} s {r['peak_mb']:>5.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
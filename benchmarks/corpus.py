@@ -0,0 +1,185 @@
+"""
+Seeded generator for synthetic DSL corpora used by the benchmarks.
+
+The output mimics the Duden/Langenscheidt files: UTF-16 with BOM, CRLF line
+endings, #-headers, nested [m]/[p]/[c]/[ex] markup, a share of malformed
+nesting, escaped brackets, sound and image references and a matching
+_abrv.dsl abbreviation file.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+SYLLABLES = [
+    "ab",
+    "an",
+    "auf",
+    "bau",
+    "ber",
+    "bild",
+    "ein",
+    "er",
+    "fahr",
+    "ge",
+    "haus",
+    "heit",
+    "keit",
+    "land",
+    "lich",
+    "mann",
+    "ner",
+    "scha",
+    "schu",
+    "stadt",
+    "te",
+    "ung",
+    "ver",
+    "wald",
+    "zeit",
+    "ä",
+    "ö",
+    "ü",
+]
+WORDS = [
+    "der",
+    "die",
+    "das",
+    "und",
+    "mit",
+    "einem",
+    "Haus",
+    "gehen",
+    "schnell",
+    "Zeit",
+    "über",
+    "Bäume",
+    "Straße",
+    "groß",
+    "klein",
+    "Arbeit",
+    "spielen",
+    "Wasser",
+    "fahren",
+    "schön",
+    "Kinder",
+    "lesen",
+]
+ABBREVIATIONS = {
+    "m": "Maskulinum",
+    "f": "Femininum",
+    "n": "Neutrum",
+    "vt": "transitives Verb",
+    "vi": "intransitives Verb",
+    "refl": "reflexiv",
+    "adj": "Adjektiv",
+    "adv": "Adverb",
+    "ugs.": "umgangssprachlich",
+    "geh.": "gehoben",
+    "Pl.": "Plural",
+    "landsch.": "landschaftlich",
+    "veraltet": "veraltet",
+}
+POS = ["m", "f", "n", "vt", "vi", "refl", "adj", "adv"]
+LABELS = ["ugs.", "geh.", "Pl.", "landsch.", "veraltet"]
+COLORS = ["", " darkred", " green", " steelblue"]
+
+
+def _headword(rng: random.Random) -> str:
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    if rng.random() < 0.3:
+        # Syllable dots and stress marks that clean_headword() strips
+        cut = rng.randint(1, len(word) - 1)
+        word = f"{word[:cut]}·{word[cut:]}"
+    if rng.random() < 0.2:
+        word = f"[']{word[0]}[/']{word[1:]}"
+    return word.capitalize() if rng.random() < 0.5 else word
+
+
+def _phrase(rng: random.Random, low: int = 2, high: int = 9) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _sense(rng: random.Random, level: int, headword: str) -> str:
+    parts = [f"[p]{rng.choice(POS)}[/p]"]
+    if rng.random() < 0.4:
+        parts.append(f"[p]{rng.choice(LABELS)}[/p]")
+    parts.append(f"[c{rng.choice(COLORS)}]{_phrase(rng)}[/c]")
+    if rng.random() < 0.6:
+        parts.append(f"[ex][*][i]{_phrase(rng, 4, 12)}[/i][/*][/ex]")
+    if rng.random() < 0.2:
+        parts.append(f"[com]([b]{_phrase(rng, 1, 3)}[/b])[/com]")
+    if rng.random() < 0.15:
+        parts.append(f"[ref]{_headword(rng)}[/ref]")
+    if rng.random() < 0.05:
+        parts.append(f"\\[{_phrase(rng, 1, 2)}\\]")
+    if rng.random() < 0.03:
+        parts.append(f"[s]{headword.lower()}.wav[/s]")
+    if rng.random() < 0.01:
+        parts.append(f"[s]{headword.lower()}.tif[/s]")
+    if rng.random() < 0.05:
+        # Overlapping tags as found in the Langenscheidt data
+        parts.append(f"[p][i][c]{rng.choice(POS)}[/p] [p]=[/c][/i][/p]")
+    return f"\t[m{level}]{' '.join(parts)}[/m]"
+
+
+def generate_corpus(path: Path, entries: int, seed: int = 0) -> Path:
+    """Writes a DSL file with `entries` entries plus its _abrv.dsl, returns the DSL path."""
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-16", newline="\r\n") as f:
+        f.write(
+            f'#NAME\t"Synthetic {entries}"\n#INDEX_LANGUAGE\t"German"\n#CONTENTS_LANGUAGE\t"German"\n\n'
+        )
+        for _ in range(entries):
+            headword = _headword(rng)
+            lines = [headword]
+            if rng.random() < 0.5:
+                lines.append(f"\t[m1][b]{headword}[/b], [p]{rng.choice(POS)}[/p][/m]")
+            for _ in range(rng.randint(1, 6)):
+                lines.append(_sense(rng, rng.randint(1, 3), headword))
+            f.write("\n".join(lines) + "\n\n")
+
+    abrv_path = path.with_name(f"{path.stem}_abrv.dsl")
+    with open(abrv_path, "w", encoding="utf-16", newline="\r\n") as f:
+        f.write('#NAME\t"Abbreviations"\n\n')
+        f.writelines(
+            f"{abbr}\n\t{expansion}\n" for abbr, expansion in ABBREVIATIONS.items()
+        )
+    return path
+
+
+def corpus_path(directory: Path, size: str, seed: int = 0) -> Path:
+    """Returns the corpus for a size label, generating it on first use."""
+    path = directory / f"synthetic_{size}_s{seed}.dsl"
+    if not path.exists():
+        generate_corpus(path, SIZES[size], seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic DSL corpora for benchmarking."
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmarks/.corpus",
+        help="Directory for the generated files",
+    )
+    parser.add_argument(
+        "--size",
+        choices=SIZES,
+        action="append",
+        help="Corpus size (repeatable, default: all)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    for size in args.size or SIZES:
+        print(corpus_path(Path(args.output), size, args.seed))
+
+
+if __name__ == "__main__":
+    main()
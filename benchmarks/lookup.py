@@ -0,0 +1,145 @@
+"""
+Load test for the lookup server: latency percentiles of exact and prefix
+lookups over HTTP.
+
+The corpus is converted once into a temporary directory (or --dictionary
+names a ZIP to use instead), served on a free local port, and queried by a
+few client threads with kept-alive connections.
+
+    python -m benchmarks.lookup --size 100k
+    python -m benchmarks.lookup --dictionary output/Duden.zip --requests 20000
+"""
+
+import argparse
+import http.client
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from benchmarks.corpus import SIZES, corpus_path
+from benchmarks.run import DEFAULT_CORPUS_DIR
+from src.lookup import LookupIndex, read_dictionary, scan_bank
+from src.pipeline import convert_dsl_file, load_abbreviations
+from src.server import LookupServer
+
+
+def sample_queries(source: Path, count: int, seed: int) -> list[tuple[str, str]]:
+    """Picks (mode, query) pairs: half exact terms, half 1-3 character prefixes of terms."""
+    _, banks = read_dictionary(source)
+    terms = [term for _, data in banks for term, _, _ in scan_bank(data)]
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        term = rng.choice(terms)
+        if i % 2:
+            queries.append(("prefix", term[: rng.randint(1, 3)]))
+        else:
+            queries.append(("exact", term))
+    return queries
+
+
+def run_client(port: int, queries: list[tuple[str, str]]) -> list[tuple[str, float]]:
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    for mode, query in queries:
+        started = time.perf_counter()
+        connection.request("GET", f"/lookup?mode={mode}&q={quote(query)}")
+        response = connection.getresponse()
+        response.read()
+        latencies.append((mode, time.perf_counter() - started))
+        if response.status != 200:
+            raise RuntimeError(
+                f"{mode} lookup of {query!r} failed with {response.status}"
+            )
+    connection.close()
+    return latencies
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        round(fraction * 100) - 1
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure lookup server latency.")
+    parser.add_argument(
+        "--dictionary",
+        help="Dictionary ZIP or directory to serve (default: convert the corpus)",
+    )
+    parser.add_argument(
+        "--size", choices=SIZES, default="10k", help="Corpus size (default: 10k)"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Corpus and query seed (default: 0)"
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        default=str(DEFAULT_CORPUS_DIR),
+        help="Where generated corpora are kept",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=10000, help="Lookups to send (default: 10000)"
+    )
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=4,
+        help="Concurrent client connections (default: 4)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.dictionary:
+            source = Path(args.dictionary)
+        else:
+            dsl_path = corpus_path(Path(args.corpus_dir), args.size, args.seed)
+            convert_dsl_file(
+                dsl_path, dsl_path.parent, work_dir, load_abbreviations(dsl_path.parent)
+            )
+            source = next(Path(work_dir).glob("*.zip"))
+
+        started = time.perf_counter()
+        index = LookupIndex.open(source, Path(work_dir) / "index")
+        print(
+            f"index: {index.entries} entries in {time.perf_counter() - started:.2f} s"
+        )
+        started = time.perf_counter()
+        LookupIndex(Path(work_dir) / "index").close()
+        print(f"open:  {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        queries = sample_queries(source, args.requests, args.seed)
+        server = LookupServer(("127.0.0.1", 0), [index])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                batches = pool.map(
+                    run_client,
+                    [server.server_port] * args.clients,
+                    [queries[i :: args.clients] for i in range(args.clients)],
+                )
+                latencies = [latency for batch in batches for latency in batch]
+            seconds = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+            index.close()
+
+    print(
+        f"{len(latencies)} lookups from {args.clients} clients in {seconds:.2f} s ({len(latencies) / seconds:.0f}/s)"
+    )
+    for mode in ("exact", "prefix"):
+        values = [latency * 1000 for m, latency in latencies if m == mode]
+        print(
+            f"{mode:<7} p50 {percentile(values, 0.5):6.2f} ms   p99 {percentile(values, 0.99):6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
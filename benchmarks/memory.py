@@ -0,0 +1,73 @@
+"""
+Memory held by converted trees, per entry, as nodes and as plain dicts.
+
+The converter builds immutable nodes (src/nodes.py) and keeps them in its
+line cache; the plain dicts are what it held before, and what it still
+hands out for serialization. Both are measured with tracemalloc while the
+trees of the whole corpus are kept alive.
+
+    python -m benchmarks.memory --size 100k
+"""
+
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.corpus import SIZES, corpus_path
+from benchmarks.run import DEFAULT_CORPUS_DIR
+from src.converter import DslConverter
+from src.nodes import to_json
+from src.parser import DslParser
+from src.pipeline import load_abbreviations
+
+
+def convert_lines(
+    converter: DslConverter, bodies: list[list[str]]
+) -> list[list[object]]:
+    return [[converter._convert_line(line) for line in body] for body in bodies]
+
+
+def measure(
+    bodies: list[list[str]], abbreviations: dict[str, str], as_dicts: bool
+) -> dict[str, float]:
+    converter = DslConverter(abbreviations, line_cache_size=0)
+    gc.collect()
+    tracemalloc.start()
+    trees = convert_lines(converter, bodies)
+    if as_dicts:
+        trees = [[to_json(tree) for tree in body] for body in trees]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trees
+    return {"bytes_per_entry": size / len(bodies), "total_mb": size / 1_048_576}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the memory of converted trees per entry."
+    )
+    parser.add_argument(
+        "--size", choices=SIZES, default="10k", help="Corpus size (default: 10k)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument(
+        "--corpus-dir",
+        default=str(DEFAULT_CORPUS_DIR),
+        help="Where generated corpora are kept",
+    )
+    args = parser.parse_args()
+
+    dsl_path = corpus_path(Path(args.corpus_dir), args.size, args.seed)
+    abbreviations = load_abbreviations(dsl_path.parent)
+    bodies = [entry["body"] for entry in DslParser(str(dsl_path)).parse()]
+
+    print(f"{'trees':<8} {'per entry':>12} {'total':>11}")
+    for label, as_dicts in (("dicts", True), ("nodes", False)):
+        r = measure(bodies, abbreviations, as_dicts)
+        print(f"{label:<8} {r['bytes_per_entry']:>8.0f} B {r['total_mb']:>7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
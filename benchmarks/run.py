@@ -0,0 +1,196 @@
+"""
+Per-stage throughput and memory benchmarks for DslParser, DslConverter and
+YomitanPacker on the synthetic corpora from benchmarks/corpus.py.
+
+Each stage is timed on its own calls only, while the earlier stages feed it
+entry by entry. Peak memory comes from a second, tracemalloc-instrumented
+pass and covers the pipeline up to and including the stage.
+
+    python -m benchmarks.run --size 10k                      # compare with baseline
+    python -m benchmarks.run --size 10k --update-baseline    # record a new baseline
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.corpus import SIZES, corpus_path
+from src.converter import DslConverter
+from src.packer import YomitanPacker
+from src.parser import DslParser
+from src.pipeline import load_abbreviations
+
+STAGES = ("parse", "convert", "pack")
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_CORPUS_DIR = Path(__file__).parent / ".corpus"
+
+
+def _run_pipeline(
+    dsl_path: Path, stage: str, clock: Callable[[], float]
+) -> tuple[int, float]:
+    """Runs the pipeline up to `stage` and returns (entries, seconds spent in `stage`)."""
+    abbreviations = load_abbreviations(dsl_path.parent)
+    parser = DslParser(str(dsl_path))
+    converter = DslConverter(abbreviations)
+    entries = 0
+    spent = 0.0
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        packer = YomitanPacker(output_dir, dsl_path.stem, streaming=True)
+        entry_iter = parser.parse()
+        while True:
+            started = clock()
+            entry = next(entry_iter, None)
+            if stage == "parse":
+                spent += clock() - started
+            if entry is None:
+                break
+            entries += 1
+            if stage == "parse":
+                continue
+
+            started = clock()
+            content, rules = converter.convert_with_rules(entry["body"])
+            term = converter.clean_headword(entry["headword"])
+            glossary = [{"type": "structured-content", "content": content}]
+            if stage == "convert":
+                spent += clock() - started
+                continue
+
+            started = clock()
+            packer.add_entry(term, "", glossary, entries, rules)
+            spent += clock() - started
+
+        if stage == "pack":
+            started = clock()
+            packer.pack({"title": dsl_path.stem, "format": 3})
+            spent += clock() - started
+
+    return entries, spent
+
+
+def measure(dsl_path: Path, stage: str, memory: bool = True) -> dict[str, float]:
+    entries, seconds = _run_pipeline(dsl_path, stage, time.perf_counter)
+    result = {
+        "entries": entries,
+        "seconds": round(seconds, 3),
+        "entries_per_sec": round(entries / seconds, 1),
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            _run_pipeline(dsl_path, stage, time.perf_counter)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_mb"] = round(peak / 1_048_576, 2)
+    return result
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Lists every stage that is slower or uses more memory than baseline * (1 ± threshold)."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                continue
+            if result["entries_per_sec"] < base["entries_per_sec"] * (1 - threshold):
+                regressions.append(
+                    f"{size}/{stage}: {result['entries_per_sec']:.0f} entries/s, baseline {base['entries_per_sec']:.0f}"
+                )
+            if (
+                "peak_mb" in result
+                and "peak_mb" in base
+                and result["peak_mb"] > base["peak_mb"] * (1 + threshold)
+            ):
+                regressions.append(
+                    f"{size}/{stage}: {result['peak_mb']:.1f} MiB peak, baseline {base['peak_mb']:.1f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parse, convert and pack stages."
+    )
+    parser.add_argument(
+        "--size",
+        choices=SIZES,
+        action="append",
+        help="Corpus size (repeatable, default: 10k)",
+    )
+    parser.add_argument(
+        "--stage",
+        choices=STAGES,
+        action="append",
+        help="Stage to measure (repeatable, default: all)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument(
+        "--corpus-dir",
+        default=str(DEFAULT_CORPUS_DIR),
+        help="Where generated corpora are kept",
+    )
+    parser.add_argument(
+        "--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed regression as a fraction (default: 0.2)",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc pass"
+    )
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for size in args.size or ["10k"]:
+        dsl_path = corpus_path(Path(args.corpus_dir), size, args.seed)
+        results[size] = {}
+        for stage in args.stage or STAGES:
+            result = measure(dsl_path, stage, memory=not args.no_memory)
+            results[size][stage] = result
+            peak = f"{result['peak_mb']:>9.1f} MiB" if "peak_mb" in result else ""
+            print(
+                f"{size:>5} {stage:<8} {result['entries_per_sec']:>10.0f} entries/s {result['seconds']:>8.2f} s {peak}"
+            )
+
+    baseline_path = Path(args.baseline)
+    baseline = (
+        json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline_path.exists()
+        else {}
+    )
+
+    if args.update_baseline:
+        for size, stages in results.items():
+            baseline.setdefault(size, {}).update(stages)
+        baseline_path.write_text(
+            json.dumps(baseline, indent=4) + "\n", encoding="utf-8"
+        )
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print("Regressions beyond threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
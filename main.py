@@ -1,63 +1,86 @@
 import argparse
 import logging
 import sys
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-from src.parser import DslParser
-from src.converter import DslConverter
-from src.packer import YomitanPacker
+from src.cache import DEFAULT_MAX_ENTRIES
+from src.packer import DEFAULT_MAX_BANK_BYTES, DEFAULT_MAX_ENTRIES_PER_BANK
+from src.pipeline import (
+    ConversionStats,
+    EntrySelection,
+    PackLimits,
+    SortOptions,
+    convert_dsl_file,
+    dsl_stem,
+    find_dsl_files,
+    load_abbreviations,
+)
+from src.sorter import DEFAULT_RUN_BYTES, DUPLICATE_MODES
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
-def load_abbreviations(input_path: Path) -> dict[str, str]:
-    abbrevs = {}
-    abrv_files = list(input_path.glob("*_abrv.dsl"))
-    for abrv_file in abrv_files:
-        logger.info(f"Loading abbreviations from {abrv_file.name}...")
-        try:
-            # Abrv files are simple: headword \n \t expansion
-            with open(abrv_file, "r", encoding="utf-16") as f:
-                current_abrv = None
-                for line in f:
-                    line = line.rstrip("\r\n")
-                    if not line or line.startswith("#"):
-                        continue
-                    if line.startswith("\t"):
-                        if current_abrv:
-                            abbrevs[current_abrv] = line.strip()
-                            current_abrv = None
-                    else:
-                        current_abrv = line.strip()
-        except Exception as e:
-            logger.warning(f"Failed to load abbreviations from {abrv_file}: {e}")
-    return abbrevs
-
-def get_rules_for_entry(body_text: str) -> list[str]:
-    rules = []
-    # Heuristic for German POS tagging based on abbreviations
-    # Nouns
-    if any(p in body_text for p in ["[p]f[/p]", "[p]m[/p]", "[p]n[/p]", "[p]nm[/p]", "[p]nf[/p]"]):
-        rules.append("n")
-    # Verbs
-    if any(p in body_text for p in ["[p]v[/p]", "[p]vt[/p]", "[p]vi[/p]", "[p]refl[/p]"]):
-        rules.append("v")
-    # Adjectives
-    if "[p]adj[/p]" in body_text:
-        rules.append("adj")
-    # Adverbs
-    if "[p]adv[/p]" in body_text:
-        rules.append("adv")
-        
-    return list(set(rules))
+def log_summary(stats: list[ConversionStats]) -> None:
+    """Logs one line per converted dictionary with entries, time and output size."""
+    if not stats:
+        return
+    width = max(len(s["name"]) for s in stats)
+    logger.info("Summary:")
+    for s in stats:
+        rate = s["entries"] / s["seconds"] if s["seconds"] else 0.0
+        logger.info(
+            f"  {s['name']:<{width}}  {s['entries']:>9} entries  {s['seconds']:>8.1f} s"
+            f"  {rate:>9.0f} entries/s  {s['output_size'] / 1_048_576:>8.1f} MiB"
+        )
 
 def main():
     parser = argparse.ArgumentParser(description="Convert German DSL dictionaries to Yomitan format.")
     parser.add_argument("--input", required=True, help="Path to the directory containing .dsl files")
     parser.add_argument("--output", required=True, help="Path to the output directory")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes used to convert each dictionary (default: 1)")
+    parser.add_argument("--parallel-dicts", type=int, default=1, help="Dictionaries converted concurrently, largest first (default: 1)")
+    parser.add_argument("--cache", action="store_true", help="Reuse conversions of unchanged entries from <output>/.cache")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help=f"Entries kept per dictionary cache, least recently used are evicted (default: {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--profile", action="store_true", help="Write per-stage timings, memory and slowest entries to <output>/<name>.profile.json")
+    parser.add_argument("--profile-convert", action="store_true", help="With --profile, also dump a cProfile of the convert stage to <output>/<name>.convert.prof")
+    parser.add_argument("--json-encoder", choices=["json", "orjson", "auto"], default="json", help="JSON backend for term banks; orjson is faster but writes compact JSON (default: json, byte-identical output)")
+    parser.add_argument("--compression-level", type=int, choices=range(10), metavar="0-9", help="zlib level for the ZIP; 0 stores members uncompressed for fast local runs (default: zlib default, 6)")
+    parser.add_argument("--max-bank-mb", type=float, default=DEFAULT_MAX_BANK_BYTES / 1_048_576, help=f"Close a term bank at this much serialized JSON; 0 splits by entry count only (default: {DEFAULT_MAX_BANK_BYTES / 1_048_576:g})")
+    parser.add_argument("--max-entries-per-bank", type=int, default=DEFAULT_MAX_ENTRIES_PER_BANK, help=f"Entry ceiling per term bank (default: {DEFAULT_MAX_ENTRIES_PER_BANK})")
+    parser.add_argument("--max-archive-mb", type=float, help="Split dictionaries larger than this into numbered volumes <name>-1.zip, <name>-2.zip, ...")
+    parser.add_argument("--compact", action="store_true", help="Shrink the structured content (merge text, unwrap unstyled spans, drop default attributes) without changing how it renders")
+    parser.add_argument("--sort", action="store_true", help="Order the terms by headword with an on-disk merge sort before packing")
+    parser.add_argument("--duplicates", choices=DUPLICATE_MODES, default="keep", help="With --sort: keep repeated headwords apart, group them under one sequence number, or merge their glossaries (default: keep)")
+    parser.add_argument("--sort-run-mb", type=float, default=DEFAULT_RUN_BYTES / 1_048_576, help=f"Memory for one sorted run of --sort (default: {DEFAULT_RUN_BYTES / 1_048_576:g})")
+    parser.add_argument("--forms", action="store_true", help="Also write <name>-forms.zip, mapping generated inflected forms of the headwords to them")
+    parser.add_argument("--only", action="append", metavar="HEADWORD", help="Convert only entries with this headword (repeatable)")
+    parser.add_argument("--sample", type=int, metavar="N", help="Convert only N randomly chosen entries")
+    parser.add_argument("--range", metavar="START:END", help="Convert only entries START to END-1 (0-based, either side optional)")
     args = parser.parse_args()
 
+    selection: EntrySelection = {}
+    if args.only:
+        selection["only"] = args.only
+    if args.sample is not None:
+        selection["sample"] = args.sample
+    if args.range:
+        try:
+            start, end = args.range.split(":")
+            selection["entry_range"] = (int(start) if start else 0, int(end) if end else sys.maxsize)
+        except ValueError:
+            parser.error("--range must look like START:END")
+
+    limits: PackLimits = {
+        "max_bank_bytes": int(args.max_bank_mb * 1_048_576) or None,
+        "max_entries_per_bank": args.max_entries_per_bank,
+        "max_archive_bytes": int(args.max_archive_mb * 1_048_576) if args.max_archive_mb else None,
+    }
+
+    sort: SortOptions | None = None
+    if args.sort or args.duplicates != "keep":
+        sort = {"duplicates": args.duplicates, "run_bytes": int(args.sort_run_mb * 1_048_576)}
+
     input_path = Path(args.input)
     if not input_path.exists():
         logger.error(f"Input path {input_path} does not exist.")
@@ -66,88 +89,52 @@ def main():
     abbreviations = load_abbreviations(input_path)
 
     # Find all main DSL files (not _abrv.dsl)
-    dsl_files = list(input_path.glob("*.dsl"))
-    main_dsls = [f for f in dsl_files if not f.name.endswith("_abrv.dsl")]
+    main_dsls = find_dsl_files(input_path)
 
     if not main_dsls:
         logger.error(f"No main .dsl file found in {input_path}")
         sys.exit(1)
 
-    for main_dsl in main_dsls:
-        logger.info(f"Processing {main_dsl.name}...")
-
-        dsl_parser = DslParser(str(main_dsl))
-        converter = DslConverter(abbreviations)
-        
-        # Trigger header parsing
-        temp_parser = DslParser(str(main_dsl))
-        try:
-            next(temp_parser.parse())
-        except StopIteration:
-            pass
-        
-        dict_title = temp_parser.headers.get("NAME", main_dsl.stem)
-        filename = main_dsl.stem
-        if "Langenscheidt" in dict_title or "langens" in filename.lower():
-            dict_title = "Langenscheidt De-De"
-        elif "duden" in filename.lower() and "big" in filename.lower():
-            dict_title = "Duden Big De-De"
-        elif "duden" in filename.lower() and "synonym" in filename.lower():
-            dict_title = "Duden Synonym De-De"
-        elif "duden" in filename.lower() and "etym" in filename.lower():
-            dict_title = "Duden Etym De-De"
-        packer = YomitanPacker(args.output, main_dsl.stem)
-
-        sequence = 1
-        for entry in dsl_parser.parse():
-            headword = entry["headword"]
-            clean_headword = converter.clean_headword(headword)
-            
-            body = entry["body"]
-            body_text = "\n".join(body)
-            
-            # Convert tags in body lines
-            # Reset converter media files for this entry if needed, but it's better to keep them cumulative for the dictionary
-            structured_content = converter.convert_to_structured_content(body)
-            
-            # Wrap in the format Yomitan expects for glossary items
-            glossary = [{"type": "structured-content", "content": structured_content}]
-            
-            rules = get_rules_for_entry(body_text)
-            
-            packer.add_entry(clean_headword, "", glossary, sequence, rules)
-            sequence += 1
-
-        # Add media files to packer (skip for Langens - TIFF images don't work in Yomitan)
-        skip_media = "Langens" in dict_title or "langens" in str(input_path).lower()
-        if not skip_media:
-            for media_filename in converter.media_files:
-                media_path = input_path / media_filename
-                if media_path.exists():
-                    packer.add_media_file(media_path)
-                else:
-                    pass
-
-        metadata = {
-            "title": dict_title,
-            "format": 3,
-            "author": "DSL to Yomitan Converter",
-            "sourceLanguage": "de",
-            "targetLanguage": "de", # Default to German-German
-            "description": f"Converted from {main_dsl.name}",
-            "revision": datetime.now().strftime("%Y.%m.%d.%H%M%S")
-        }
-        
-        # Check if it's De-Ru
-        if "De-Ru" in dict_title or "DeRu" in main_dsl.name:
-            metadata["targetLanguage"] = "ru"
-        elif "Ru-De" in dict_title or "RuDe" in main_dsl.name:
-            metadata["sourceLanguage"] = "ru"
-            metadata["targetLanguage"] = "de"
-
-        # Packer automatically includes data/styles.css
-        zip_path = packer.pack(metadata)
-        logger.info(f"Successfully created {zip_path} with {sequence - 1} entries.")
+    stats: list[ConversionStats] = []
+    failed: list[str] = []
+    if args.parallel_dicts > 1 and len(main_dsls) > 1:
+        # Start the slowest dictionaries first so they don't end up running alone at the end
+        main_dsls.sort(key=lambda f: f.stat().st_size, reverse=True)
+        with ProcessPoolExecutor(max_workers=args.parallel_dicts) as pool:
+            futures = {
+                pool.submit(
+                    convert_dsl_file, main_dsl, input_path, args.output, abbreviations, args.jobs, selection,
+                    args.cache, args.cache_max_entries, args.profile, args.profile_convert, args.json_encoder,
+                    args.compression_level, args.forms, limits, args.compact, sort,
+                ): main_dsl
+                for main_dsl in main_dsls
+            }
+            for future in as_completed(futures):
+                main_dsl = futures[future]
+                try:
+                    stats.append(future.result())
+                except Exception as e:
+                    logger.error(f"[{dsl_stem(main_dsl)}] Conversion failed: {e}")
+                    failed.append(main_dsl.name)
+        # Report in the same order the dictionaries were scheduled
+        order = {f.name: i for i, f in enumerate(main_dsls)}
+        stats.sort(key=lambda s: order[s["name"]])
+    else:
+        for main_dsl in main_dsls:
+            try:
+                stats.append(convert_dsl_file(
+                    main_dsl, input_path, args.output, abbreviations, args.jobs, selection,
+                    args.cache, args.cache_max_entries, args.profile, args.profile_convert, args.json_encoder,
+                    args.compression_level, args.forms, limits, args.compact, sort,
+                ))
+            except Exception as e:
+                logger.error(f"[{dsl_stem(main_dsl)}] Conversion failed: {e}")
+                failed.append(main_dsl.name)
+
+    log_summary(stats)
+    if failed:
+        logger.error(f"Failed to convert: {', '.join(failed)}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
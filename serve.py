@@ -0,0 +1,109 @@
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+from src.lookup import LookupIndex
+from src.pipeline import convert_dsl_file, dsl_stem, find_dsl_files, load_abbreviations
+from src.server import LookupServer
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+def convert_stale(input_path: Path, output_dir: Path) -> list[Path]:
+    """Converts the DSLs of a directory whose ZIP is missing or older than the DSL; returns the ZIPs."""
+    main_dsls = find_dsl_files(input_path)
+    if not main_dsls:
+        return []
+    abbreviations = load_abbreviations(input_path)
+    zips = []
+    for main_dsl in main_dsls:
+        zip_path = output_dir / f"{dsl_stem(main_dsl)}.zip"
+        if not zip_path.exists() or zip_path.stat().st_mtime < main_dsl.stat().st_mtime:
+            convert_dsl_file(main_dsl, input_path, str(output_dir), abbreviations)
+        zips.append(zip_path)
+    return zips
+
+
+def dictionary_sources(input_path: Path, output_dir: Path) -> list[Path]:
+    """
+    Dictionaries to serve for one --input: a ZIP, an unpacked dictionary
+    directory, or a directory of ZIPs and DSLs, the DSLs converted first.
+    """
+    if input_path.is_file() or (input_path / "index.json").exists():
+        return [input_path]
+    # Media bundles of DSLs are ZIPs too
+    zips = [
+        path
+        for path in sorted(input_path.glob("*.zip"))
+        if not path.name.endswith(".files.zip")
+    ]
+    return zips + convert_stale(input_path, output_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve exact and prefix lookups over converted dictionaries."
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        action="append",
+        help="A dictionary ZIP, an unpacked dictionary, or a directory of ZIPs or .dsl files (repeatable)",
+    )
+    parser.add_argument(
+        "--output",
+        help="Where DSLs are converted to before serving (default: <input>/.serve)",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})",
+    )
+    args = parser.parse_args()
+
+    sources: list[Path] = []
+    for item in args.input:
+        input_path = Path(item)
+        if not input_path.exists():
+            logger.error(f"Input path {input_path} does not exist.")
+            sys.exit(1)
+        output_dir = Path(args.output) if args.output else input_path / ".serve"
+        sources += dictionary_sources(input_path, output_dir)
+    if not sources:
+        logger.error("No dictionaries found to serve.")
+        sys.exit(1)
+
+    indexes = []
+    for source in sources:
+        started = time.perf_counter()
+        index = LookupIndex.open(source)
+        logger.info(
+            f"{index.title}: {index.entries} entries, index ready in {time.perf_counter() - started:.2f} s"
+        )
+        indexes.append(index)
+
+    server = LookupServer((args.host, args.port), indexes)
+    logger.info(
+        f"Serving {len(indexes)} dictionaries on http://{args.host}:{server.server_port}/lookup?q=..."
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for index in indexes:
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
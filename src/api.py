@@ -0,0 +1,70 @@
+"""
+Library entry point for converting DSL dictionaries from other programs.
+
+    from src.api import convert_dictionary
+    from src.sinks import BytesSink
+
+    sink = BytesSink()
+    stats = convert_dictionary("dicts/Duden.dsl", sink)
+    archive = sink.archives["Duden.zip"]
+
+Importing this module loads only the sinks. The conversion pipeline is
+imported on the first call and stays loaded, so a long-running worker
+converts one dictionary after another without importing modules or
+compiling the tag patterns again.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from src.sinks import OutputSink
+
+if TYPE_CHECKING:
+    from src.pipeline import ConversionStats, PackLimits, SortOptions
+
+
+def convert_dictionary(
+    dsl_path: str | Path,
+    sink: OutputSink | None = None,
+    *,
+    output_dir: str | Path | None = None,
+    abbreviations: dict[str, str] | None = None,
+    jobs: int = 1,
+    use_cache: bool = False,
+    json_encoder: str = "json",
+    compression_level: int | None = None,
+    forms: bool = False,
+    limits: "PackLimits | None" = None,
+    compact: bool = False,
+    sort: "SortOptions | None" = None,
+) -> "ConversionStats":
+    """
+    Converts one DSL dictionary, Name.dsl or Name.dsl.dz, and returns its
+    stats. The archives go to `sink`, or to ZIPs in output_dir without one;
+    output_dir also holds the cache with use_cache. Abbreviations, media and
+    POS rules are looked up next to the DSL file unless abbreviations are
+    passed in, e.g. loaded once for a directory of dictionaries. The other
+    options are those of convert_dsl_file() and main.py.
+    """
+    from src.pipeline import convert_dsl_file, load_abbreviations
+
+    if sink is None and output_dir is None:
+        raise ValueError("convert_dictionary() needs a sink or an output directory")
+    dsl_path = Path(dsl_path)
+    if abbreviations is None:
+        abbreviations = load_abbreviations(dsl_path.parent)
+    return convert_dsl_file(
+        dsl_path,
+        dsl_path.parent,
+        str(output_dir) if output_dir is not None else None,
+        abbreviations,
+        jobs,
+        use_cache=use_cache,
+        json_encoder=json_encoder,
+        compression_level=compression_level,
+        forms=forms,
+        limits=limits,
+        compact=compact,
+        sort=sort,
+        sink=sink,
+    )
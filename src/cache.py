@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from src.converter import CONVERTER_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Default cap on cached entries per dictionary, roughly the size of Duden Big
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Cached lookups are written back in batches of this many rows
+FLUSH_EVERY = 5000
+
+# Media references of a body, whose archive names are part of the key
+MEDIA_REFERENCE = re.compile(r"\[s\](.*?)\[/s\]")
+
+
+class ConversionCache:
+    """
+    On-disk cache of converted entries, one SQLite file per dictionary.
+    Keys hash the entry body together with the abbreviation and POS rule
+    tables, the JSON encoder name and CONVERTER_VERSION, so any change to
+    them simply stops matching and the old rows age out through LRU eviction.
+    With resolve_media, the archive names the body's media references
+    resolve to are hashed too; other files in the media directory do not
+    affect the key.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        abbreviations: dict[str, str],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        pos_rules: dict[str, str] | None = None,
+        encoder: str = "json",
+        resolve_media: Callable[[str], str] | None = None,
+        compact: bool = False,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.resolve_media = resolve_media
+
+        context = json.dumps(
+            [
+                CONVERTER_VERSION,
+                sorted(abbreviations.items()),
+                list((pos_rules or {}).items()),
+                encoder,
+                compact,
+            ],
+            ensure_ascii=False,
+        )
+        self._context = hashlib.blake2b(
+            context.encode("utf-8"), digest_size=16
+        ).digest()
+        self._pending: list[tuple[bytes, bytes, str, str, int]] = []
+        self._touched: list[tuple[int, bytes]] = []
+
+        # Workers of one dictionary share the file, so wait for locks instead of failing
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key BLOB PRIMARY KEY, glossary BLOB NOT NULL, rules TEXT NOT NULL, "
+            "media TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+        self._db.commit()
+
+    def key(self, body: list[str]) -> bytes:
+        digest = hashlib.blake2b(self._context, digest_size=16)
+        text = "\n".join(body)
+        digest.update(text.encode("utf-8"))
+        if self.resolve_media and "[s]" in text:
+            for reference in MEDIA_REFERENCE.findall(text):
+                digest.update(
+                    b"\0" + self.resolve_media(reference.strip()).encode("utf-8")
+                )
+        return digest.digest()
+
+    def get(self, key: bytes) -> tuple[bytes, list[str], list[str]] | None:
+        """Returns (glossary JSON, rules, media files) for a key, or None on a miss."""
+        row = self._db.execute(
+            "SELECT glossary, rules, media FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((int(time.time()), key))
+        if len(self._touched) >= FLUSH_EVERY:
+            self.flush()
+        glossary, rules, media = row
+        return glossary, rules.split(), json.loads(media)
+
+    def put(
+        self, key: bytes, glossary: bytes, rules: list[str], media: list[str]
+    ) -> None:
+        self._pending.append(
+            (
+                key,
+                glossary,
+                " ".join(rules),
+                json.dumps(media, ensure_ascii=False),
+                int(time.time()),
+            )
+        )
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes pending rows and last-used updates in one transaction."""
+        if not self._pending and not self._touched:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", self._pending
+            )
+            self._db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", self._touched
+            )
+        self._pending = []
+        self._touched = []
+
+    def evict(self) -> int:
+        """Deletes the least recently used rows above max_entries, returns how many."""
+        self.flush()
+        (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        with self._db:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        logger.info(f"Evicted {excess} stale entries from {self.path.name}")
+        return excess
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
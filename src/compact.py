@@ -0,0 +1,107 @@
+"""
+Size optimizations for converted structured content.
+
+Every rewrite here keeps the rendering with data/styles.css unchanged:
+- spans without attributes are inline and unstyled, so their content can
+  take their place;
+- a div without attributes that is the only child of another div adds no
+  box of its own, as long as the parent is not matched by a child combinator;
+- attributes that repeat what another attribute already selects are dropped.
+"""
+
+import json
+from typing import Any
+
+from src.tag_map import DEFAULT_COLOR
+
+# Parents that styles.css matches with `parent > child` selectors; moving a
+# child up to them would change which rules apply
+CHILD_SELECTOR_PARENTS = frozenset({"sense-group"})
+
+# Characters a div wrapper adds around its content: {"tag": "div", "content": ...}
+DIV_WRAPPER_SIZE = len(json.dumps({"tag": "div", "content": None})) - len("null")
+
+
+def json_size(content: Any) -> int:
+    """Size of the content as JSON, the unit bytes saved are reported in."""
+    return len(json.dumps(content, ensure_ascii=False))
+
+
+def _is_bare(node: Any, tag: str) -> bool:
+    """Whether the node is a `tag` element with no attributes besides its content."""
+    return (
+        isinstance(node, dict)
+        and node.get("tag") == tag
+        and node.keys() <= {"tag", "content"}
+    )
+
+
+def _flatten(items: list[Any]) -> Any:
+    """Splices bare spans, drops empty text and merges adjacent text."""
+    result: list[Any] = []
+    for item in items:
+        if _is_bare(item, "span"):
+            item = item.get("content", "")
+        for part in item if isinstance(item, list) else (item,):
+            if isinstance(part, str):
+                if not part:
+                    continue
+                if result and isinstance(result[-1], str):
+                    result[-1] += part
+                    continue
+            result.append(part)
+    if not result:
+        return ""
+    return result[0] if len(result) == 1 else result
+
+
+def _compact_data(data: dict[str, str]) -> None:
+    # span[data-sc-class="colored"] repeats span[data-sc-content="color"]
+    if data.get("content") == "color":
+        if data.get("class") == "colored":
+            del data["class"]
+        if data.get("value") == DEFAULT_COLOR:
+            del data["value"]
+
+
+def fold_sole_wrapper(node: dict[str, Any]) -> int:
+    """
+    Replaces the content of a div whose only child is a bare div with the
+    content of that child. Returns the number of characters saved.
+    """
+    child = node.get("content")
+    if node.get("tag") != "div" or not _is_bare(child, "div"):
+        return 0
+    if node.get("data", {}).get("content") in CHILD_SELECTOR_PARENTS:
+        return 0
+    if "content" in child:
+        node["content"] = child["content"]
+        return DIV_WRAPPER_SIZE
+    del node["content"]
+    return json_size(child) + len(', "content": ')
+
+
+def compact_content(content: Any) -> Any:
+    """
+    Returns a smaller tree that renders the same. Nodes of the input are
+    changed in place, so pass a tree that is not shared.
+    """
+    if isinstance(content, list):
+        return _flatten([compact_content(item) for item in content])
+    if not isinstance(content, dict):
+        return content
+
+    if "content" in content:
+        inner = compact_content(content["content"])
+        if _is_bare(inner, "span"):
+            inner = inner.get("content", "")
+        if inner == "":
+            del content["content"]
+        else:
+            content["content"] = inner
+        fold_sole_wrapper(content)
+    if "data" in content:
+        _compact_data(content["data"])
+    if _is_bare(content, "span"):
+        return content.get("content", "")
+    return content
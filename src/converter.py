@@ -1,12 +1,30 @@
-import re
+from collections import OrderedDict
+from collections.abc import Callable
 from typing import Any, TypedDict
 
+from src.compact import compact_content, fold_sole_wrapper, json_size
+from src.nodes import LeadingAttrsNode, Node, from_json, intern_attrs, to_json
 from src.tag_map import (
+    DEFAULT_COLOR,
     ESC_CLOSE_BRACKET,
     ESC_OPEN_BRACKET,
     MARGIN_PATTERN,
+    POS_RULES,
+    STRESS_TAGS,
+    TAG_PATTERN,
 )
 
+# Bump whenever the generated structured content or rules change, so cached
+# conversions from older versions are no longer reused
+CONVERTER_VERSION = 1
+
+# Distinct body lines remembered by the line-level conversion cache
+DEFAULT_LINE_CACHE_SIZE = 50_000
+
+# Upper bound on the forms one headword expands to, guards against headwords
+# with many (optional) parts
+MAX_HEADWORD_VARIANTS = 64
+
 class StructuredContent(TypedDict):
     tag: str
     content: Any
@@ -15,11 +33,43 @@ class StructuredContent(TypedDict):
     href: str | None
 
 class DslConverter:
-    def __init__(self, abbreviations: dict[str, str] | None = None):
+    def __init__(
+        self,
+        abbreviations: dict[str, str] | None = None,
+        line_cache_size: int = DEFAULT_LINE_CACHE_SIZE,
+        pos_rules: dict[str, str] | None = None,
+        resolve_media: Callable[[str], str] | None = None,
+        compact: bool = False,
+    ):
         self.abbreviations = abbreviations or {}
-        # Pre-compile some common regexes
-        self.tag_regex = re.compile(r'\[(?P<close>/)?(?P<tag>[\w\*\']+)(?:\s+(?P<val>.*?))?\]')
+        # Referenced media name -> archive name, see MediaIndex.resolve()
+        self.resolve_media = resolve_media
+        # [p] abbreviation -> Yomitan rule, detected while the tags are converted
+        self.pos_rules = POS_RULES if pos_rules is None else pos_rules
+        self._rule_order = list(dict.fromkeys(self.pos_rules.values()))
+        self._entry_rules: set[str] = set()
         self.media_files: set[str] = set()
+        # LRU of line text -> (node tree, media files, rules found in the line, characters
+        # saved by --compact); 0 disables it
+        self.line_cache_size = line_cache_size
+        self.line_cache_hits = 0
+        self.line_cache_misses = 0
+        self._line_cache: OrderedDict[str, tuple[Any, tuple[str, ...], tuple[str, ...], int]] = OrderedDict()
+        self._line_media: list[str] = []
+        self._line_rules: list[str] = []
+        # Run src/compact.py over every line and count the JSON characters it saves
+        self.compact = compact
+        self.compact_saved = 0
+
+    def convert_with_rules(self, body_lines: list[str]) -> tuple[list[dict[str, Any]], list[str]]:
+        """
+        Converts DSL body lines like convert_to_structured_content() and also
+        returns the Yomitan rules of the [p] abbreviations found on the way.
+        """
+        self._entry_rules = set()
+        content = self.convert_to_structured_content(body_lines)
+        rules = [rule for rule in self._rule_order if rule in self._entry_rules]
+        return content, rules
 
     def convert_to_structured_content(self, body_lines: list[str]) -> list[dict[str, Any]]:
         """
@@ -39,19 +89,19 @@ class DslConverter:
                 inner_text = margin_match.group("content")
                 parsed_content = self._text_to_structured_content(inner_text)
                 # Always use div for sense items - they will be inside sense-group divs
-                parsed_lines.append((level, {
+                parsed_lines.append((level, self._sense({
                     "tag": "div",
                     "content": parsed_content,
                     "data": {"content": "sense", "class": f"margin-{level}"}
-                }))
+                })))
             else:
                 parsed_content = self._text_to_structured_content(line)
                 # Always use div for sense items - they will be inside sense-group divs
-                parsed_lines.append((None, {
+                parsed_lines.append((None, self._sense({
                     "tag": "div",
                     "content": parsed_content,
                     "data": {"content": "sense"}
-                }))
+                })))
         
         # Second pass: group consecutive lines with same margin level
         content_items: list[dict[str, Any]] = []
@@ -95,195 +145,206 @@ class DslConverter:
         
         return content_items
 
+    def _sense(self, item: dict[str, Any]) -> dict[str, Any]:
+        if self.compact:
+            self.compact_saved += fold_sole_wrapper(item)
+        return item
+
     def _text_to_structured_content(self, text: str) -> Any:
         """
-        Token-based parser to handle malformed/overlapping DSL tags.
+        Converts one line, reusing earlier results for identical lines.
+        Cached trees are immutable nodes and callers get fresh dicts built
+        from them, so mutating the result can never leak into other entries.
         """
-        # Handle escaped brackets
-        text = ESC_OPEN_BRACKET.sub("[", text)
-        text = ESC_CLOSE_BRACKET.sub("]", text)
-
-        tokens = self._tokenize(text)
-        return self._build_tree(tokens)
-
-    def _tokenize(self, text: str) -> list[Any]:
-        tokens = []
-        last_pos = 0
-        for match in self.tag_regex.finditer(text):
-            if match.start() > last_pos:
-                tokens.append(text[last_pos:match.start()])
-            
-            is_close = bool(match.group("close"))
-            tag_name = match.group("tag")
-            tag_val = match.group("val")
-            
-            tokens.append({
-                "is_tag": True,
-                "is_close": is_close,
-                "name": tag_name,
-                "val": tag_val
-            })
-            last_pos = match.end()
-        
-        if last_pos < len(text):
-            tokens.append(text[last_pos:])
-        
-        return tokens
+        self._line_media = []
+        self._line_rules = []
+        if not self.line_cache_size:
+            tree, saved = self._convert_compact(text)
+            self.compact_saved += saved
+            return to_json(tree)
+
+        cached = self._line_cache.get(text)
+        if cached is not None:
+            self._line_cache.move_to_end(text)
+            self.line_cache_hits += 1
+            tree, media, rules, saved = cached
+            self.compact_saved += saved
+            # Media and rules are collected per dictionary or entry, so replay them on a hit
+            self.media_files.update(media)
+            self._entry_rules.update(rules)
+            return to_json(tree)
+
+        self.line_cache_misses += 1
+        tree, saved = self._convert_compact(text)
+        self.compact_saved += saved
+        self._line_cache[text] = (tree, tuple(self._line_media), tuple(self._line_rules), saved)
+        if len(self._line_cache) > self.line_cache_size:
+            self._line_cache.popitem(last=False)
+        return to_json(tree)
+
+    def line_cache_info(self) -> dict[str, float]:
+        """Returns hit/miss counts and the hit rate of the line cache."""
+        lookups = self.line_cache_hits + self.line_cache_misses
+        return {
+            "hits": self.line_cache_hits,
+            "misses": self.line_cache_misses,
+            "size": len(self._line_cache),
+            "hit_rate": self.line_cache_hits / lookups if lookups else 0.0,
+        }
 
-    def _build_tree(self, tokens: list[Any]) -> Any:
+    def _convert_compact(self, text: str) -> tuple[Any, int]:
+        """Converts one line, compacted if enabled; returns the node tree and the characters saved."""
+        tree = self._convert_line(text)
+        if not self.compact:
+            return tree, 0
+        content = to_json(tree)
+        size = json_size(content)
+        content = compact_content(content)
+        return from_json(content), size - json_size(content)
+
+    def _convert_line(self, text: str) -> Any:
         """
-        Builds a tree from tokens, handling overlapping tags by closing them early if needed.
+        Single-pass parser that tolerates malformed/overlapping DSL tags.
+        Overlapping tags are closed early: a close tag closes every tag opened
+        after its match, unmatched close tags are ignored and tags still open
+        at the end of the line are closed there.
         """
-        root = []
-        stack = [] # list of (tag_name, tag_val, list_of_children)
+        # Handle escaped brackets
+        if "\\" in text:
+            text = ESC_OPEN_BRACKET.sub("[", text)
+            text = ESC_CLOSE_BRACKET.sub("]", text)
+
+        # Fast path: plain text lines need no tree at all
+        if "[" not in text:
+            return text
 
-        current_content = root
+        root: list[Any] = []
+        # Open tags as [name, val, children, has_block]; has_block is set when a
+        # div child is appended, so no subtree ever has to be rescanned
+        stack: list[list[Any]] = []
+        # Stack depths of the open frames of each tag name, for O(1) close lookup
+        open_at: dict[str, list[int]] = {}
+        content = root
+        pos = 0
 
-        for token in tokens:
-            if isinstance(token, str):
-                current_content.append(token)
+        for match in TAG_PATTERN.finditer(text):
+            start = match.start()
+            if start > pos:
+                content.append(text[pos:start])
+            pos = match.end()
+            name = match.group("tag")
+
+            if match.group("close"):
+                depths = open_at.get(name)
+                if not depths:
+                    # Ignore unmatched closing tag
+                    continue
+                self._close_frames(stack, open_at, root, depths[-1])
+                content = stack[-1][2] if stack else root
             else:
-                if token["is_close"]:
-                    # Find the corresponding opening tag in the stack
-                    found_idx = -1
-                    for i in range(len(stack) - 1, -1, -1):
-                        if stack[i][0] == token["name"]:
-                            found_idx = i
-                            break
-                    
-                    if found_idx != -1:
-                        # Close all tags up to the found one
-                        while len(stack) > found_idx:
-                            tag_name, tag_val, tag_children = stack.pop()
-                            tag_obj = self._create_tag_object(tag_name, tag_val, tag_children)
-                            if stack:
-                                stack[-1][2].append(tag_obj)
-                                current_content = stack[-1][2]
-                            else:
-                                root.append(tag_obj)
-                                current_content = root
-                    else:
-                        # Ignore unmatched closing tag
-                        pass
-                else:
-                    # Opening tag
-                    new_tag = [token["name"], token["val"], []]
-                    stack.append(new_tag)
-                    current_content = new_tag[2]
+                open_at.setdefault(name, []).append(len(stack))
+                content = []
+                stack.append([name, match.group("val"), content, False])
+
+        if pos < len(text):
+            content.append(text[pos:])
 
         # Close any remaining open tags
-        while stack:
-            tag_name, tag_val, tag_children = stack.pop()
-            tag_obj = self._create_tag_object(tag_name, tag_val, tag_children)
+        self._close_frames(stack, open_at, root, 0)
+
+        return tuple(root) if len(root) > 1 else (root[0] if root else "")
+
+    def _close_frames(self, stack: list[list[Any]], open_at: dict[str, list[int]], root: list[Any], depth: int) -> None:
+        """Closes every open tag from the top of the stack down to `depth`."""
+        while len(stack) > depth:
+            name, val, children, has_block = stack.pop()
+            open_at[name].pop()
+            tag_obj = self._create_tag_object(name, val, children, has_block)
             if stack:
-                stack[-1][2].append(tag_obj)
-                current_content = stack[-1][2]
+                parent = stack[-1]
+                parent[2].append(tag_obj)
+                if tag_obj.tag == "div":
+                    parent[3] = True
             else:
                 root.append(tag_obj)
-                current_content = root
 
-        return root if len(root) > 1 else (root[0] if root else "")
+    def _create_tag_object(self, name: str, val: str | None, content: Any, has_block: bool | None = None) -> Node:
+        """
+        Builds the node for one closed tag. `has_block` tells whether the
+        children contain a div; the parser tracks it while appending children.
+        """
+        if has_block is None:
+            items = content if isinstance(content, list) else [content]
+            has_block = any(isinstance(item, Node) and item.tag == "div" for item in items)
 
-    def _create_tag_object(self, name: str, val: str | None, content: Any) -> dict[str, Any]:
         # Unwrap content if it's a single item list
-        if isinstance(content, list) and len(content) == 1:
-            content = content[0]
-        
+        if isinstance(content, list):
+            content = content[0] if len(content) == 1 else tuple(content)
+
         # Default container
-        tag_obj = {"tag": "span", "content": content}
-        
-        # Helper to check if content contains a block element
-        def has_block(c):
-            if isinstance(c, dict):
-                return c.get("tag") == "div"
-            if isinstance(c, list):
-                return any(has_block(item) for item in c)
-            return False
-
-        # Helper to check if content is already a structured object
-        def has_structured_content(c):
-            if isinstance(c, dict) and "tag" in c:
-                return True
-            if isinstance(c, list):
-                return any(has_structured_content(item) for item in c)
-            return False
+        tag = "span"
+        attrs: dict[str, Any] = {}
 
         # Use data attributes for styling (CSS handles it in styles.css)
         # Only upgrade to div if content contains actual block elements (divs)
         # Don't upgrade for inline structured content like italic, bold, etc.
         if name in ("b", "'"):
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "bold"}
+            attrs["data"] = {"content": "bold"}
         elif name == "i":
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "italic"}
+            attrs["data"] = {"content": "italic"}
         elif name == "u":
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "underline"}
+            attrs["data"] = {"content": "underline"}
         elif name == "sup":
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "superscript"}
+            attrs["data"] = {"content": "superscript"}
         elif name == "sub":
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "subscript"}
+            attrs["data"] = {"content": "subscript"}
         elif name == "c":
-            color = val.strip() if val else "darkcyan"
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "color", "value": color}
-            tag_obj["data"]["class"] = "colored"
+            color = val.strip() if val else DEFAULT_COLOR
+            attrs["data"] = {"content": "color", "value": color, "class": "colored"}
         elif name == "p":
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            tag_obj["data"] = {"content": "abbreviation"}
-            if isinstance(content, str) and content.strip() in self.abbreviations:
-                tag_obj["title"] = self.abbreviations[content.strip()]
-        
+            attrs["data"] = {"content": "abbreviation"}
+            if isinstance(content, str):
+                if content.strip() in self.abbreviations:
+                    attrs["title"] = self.abbreviations[content.strip()]
+                # Only an exact [p]abbr[/p] marks the part of speech
+                rule = self.pos_rules.get(content)
+                if rule:
+                    self._entry_rules.add(rule)
+                    self._line_rules.append(rule)
+
         # Block elements
         elif name == "m":
-            tag_obj["tag"] = "div"
+            tag = "div"
             try:
                 margin = int(val) if val else 1
-                tag_obj["data"] = {"content": "sense", "class": f"margin-{margin}"}
+                attrs["data"] = {"content": "sense", "class": f"margin-{margin}"}
             except ValueError:
-                tag_obj["data"] = {"content": "sense"}
+                attrs["data"] = {"content": "sense"}
         elif name == "ex":
-            tag_obj["tag"] = "span"
-            tag_obj["data"] = {"content": "example-sentence"}
+            attrs["data"] = {"content": "example-sentence"}
         elif name == "com":
-            tag_obj["data"] = {"content": "comment"}
+            attrs["data"] = {"content": "comment"}
         elif name == "trn":
-            tag_obj["tag"] = "span"
-            tag_obj["data"] = {"content": "translation"}
+            attrs["data"] = {"content": "translation"}
         elif name == "tr":
-            tag_obj["tag"] = "tr"
-            if isinstance(content, list):
-                new_content = []
-                for child in content:
-                    if isinstance(child, dict) and child.get("tag") in ("td", "th"):
-                        new_content.append(child)
-                    else:
-                        new_content.append({"tag": "td", "content": child})
-                tag_obj["content"] = new_content
+            tag = "tr"
+            if isinstance(content, tuple):
+                content = tuple(
+                    child if isinstance(child, Node) and child.tag in ("td", "th") else Node("td", child)
+                    for child in content
+                )
             else:
-                tag_obj["content"] = [{"tag": "td", "content": content}]
+                content = (Node("td", content),)
         elif name in ("td", "th"):
-            tag_obj["tag"] = name
+            tag = name
         elif name == "*":
-            tag_obj["data"] = {"content": "optional"}
-            if has_block(content):
-                tag_obj["tag"] = "div"
-            
+            attrs["data"] = {"content": "optional"}
+
         # Media & Links
         elif name == "ref":
-            tag_obj["tag"] = "a"
+            tag = "a"
             ref_text = self._get_plain_text(content)
-            tag_obj["href"] = f"?query={ref_text}"
+            attrs["href"] = f"?query={ref_text}"
         elif name == "s":
             media_file = self._get_plain_text(content).strip()
             if media_file:
@@ -291,27 +352,28 @@ class DslConverter:
                 # The packer won't include them anyway
                 if media_file.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif")):
                     # Just skip adding media - the tag won't be created
-                    return {"tag": "span", "content": ""}
+                    return Node("span", "")
+                if self.resolve_media:
+                    media_file = self.resolve_media(media_file)
                 self.media_files.add(media_file)
+                self._line_media.append(media_file)
                 if media_file.lower().endswith(".wav"):
-                    tag_obj = {
-                        "tag": "a",
-                        "href": f"?sound={media_file}",
-                        "content": "🔊"
-                    }
+                    return LeadingAttrsNode("a", "🔊", intern_attrs({"href": f"?sound={media_file}"}))
 
         # Final check: if tag is span but content has blocks, upgrade to div
-        if tag_obj["tag"] == "span" and has_block(tag_obj["content"]):
-            tag_obj["tag"] = "div"
+        if tag == "span" and has_block:
+            tag = "div"
 
-        return tag_obj
+        return Node(tag, content, intern_attrs(attrs))
 
 
     def _get_plain_text(self, content: Any) -> str:
         if isinstance(content, str):
             return content
-        if isinstance(content, list):
+        if isinstance(content, (list, tuple)):
             return "".join(self._get_plain_text(item) for item in content)
+        if isinstance(content, Node):
+            return self._get_plain_text(content.content or "")
         if isinstance(content, dict):
             return self._get_plain_text(content.get("content", ""))
         return ""
@@ -322,11 +384,53 @@ class DslConverter:
         # Remove middle dot (·)
         headword = headword.replace("·", "")
         # Remove DSL stress tags
-        headword = re.sub(r"\[/?\'\]", "", headword)
+        headword = STRESS_TAGS.sub("", headword)
         # Remove other common cleanups
         headword = headword.replace("|", "")
         return headword.strip()
 
+    @staticmethod
+    def expand_headword(headword: str) -> list[str]:
+        """
+        Returns the lookup forms of a DSL headword, cleaned like clean_headword().
+        {unsorted} parts are dropped and every (optional) part yields forms
+        with and without it, so "Schiff(s)bau" gives Schiffsbau and Schiffbau.
+        Backslash escapes stand for the character itself.
+        """
+        if not any(c in headword for c in "{(\\"):
+            return [DslConverter.clean_headword(headword)]
+
+        forms = [""]
+        # Forms as they were before each open optional part
+        groups: list[list[str]] = []
+        unsorted_depth = 0
+        i = 0
+        while i < len(headword):
+            char = headword[i]
+            if char == "\\" and i + 1 < len(headword):
+                i += 1
+                char = headword[i]
+            elif char == "{":
+                unsorted_depth += 1
+                char = ""
+            elif char == "}" and unsorted_depth:
+                unsorted_depth -= 1
+                char = ""
+            elif char == "(" and not unsorted_depth:
+                groups.append(forms)
+                char = ""
+            elif char == ")" and groups and not unsorted_depth:
+                # With the optional part first, then without it
+                forms = list(dict.fromkeys(forms + groups.pop()))[:MAX_HEADWORD_VARIANTS]
+                char = ""
+            if char and not unsorted_depth:
+                forms = [form + char for form in forms]
+            i += 1
+
+        cleaned = (" ".join(DslConverter.clean_headword(form).split()) for form in forms)
+        variants = list(dict.fromkeys(form for form in cleaned if form))
+        return variants or [DslConverter.clean_headword(headword)]
+
     @staticmethod
     def is_inline_content(content: Any) -> bool:
         """Check if content contains only inline elements (no divs)."""
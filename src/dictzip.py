@@ -0,0 +1,165 @@
+"""
+Random-access reading of dictzip (.dsl.dz) files.
+
+dictzip is gzip with an "RA" extra field listing the compressed size of
+every fixed-size chunk; each chunk ends on a full flush, so any of them can
+be inflated on its own. Plain gzip files without the table still work, but
+seeking backwards in them restarts decompression from the beginning.
+"""
+
+import gzip
+import io
+import struct
+import zlib
+from itertools import accumulate
+from pathlib import Path
+from typing import BinaryIO
+
+# Uncompressed chunk size written by dictzip itself; compressed chunks must fit in 16 bits
+DEFAULT_CHUNK_SIZE = 58315
+
+COMPRESSED_SUFFIXES = (".dz", ".gz")
+
+_FEXTRA, _FNAME, _FCOMMENT, _FHCRC = 0x04, 0x08, 0x10, 0x02
+
+
+def is_compressed(path: str | Path) -> bool:
+    return str(path).lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def open_binary(path: str | Path) -> BinaryIO:
+    """Opens a plain or dictzip/gzip file as a seekable binary stream of its uncompressed bytes."""
+    if not is_compressed(path):
+        return open(path, "rb")
+    return io.BufferedReader(DictzipReader(path), buffer_size=DEFAULT_CHUNK_SIZE)
+
+
+def _read_header(f: BinaryIO) -> tuple[int, list[int]] | None:
+    """Skips the gzip header and returns (chunk size, compressed chunk sizes), or None without an RA table."""
+    head = f.read(10)
+    if len(head) < 10 or head[:2] != b"\x1f\x8b" or head[2] != 8:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a gzip file")
+    flags = head[3]
+    table = None
+    if flags & _FEXTRA:
+        (xlen,) = struct.unpack("<H", f.read(2))
+        extra = f.read(xlen)
+        pos = 0
+        while pos + 4 <= len(extra):
+            (length,) = struct.unpack("<H", extra[pos + 2 : pos + 4])
+            if extra[pos : pos + 2] == b"RA":
+                field = extra[pos + 4 : pos + 4 + length]
+                _, chunk_size, count = struct.unpack("<HHH", field[:6])
+                table = (
+                    chunk_size,
+                    list(struct.unpack(f"<{count}H", field[6 : 6 + 2 * count])),
+                )
+            pos += 4 + length
+    for flag in (_FNAME, _FCOMMENT):
+        if flags & flag:
+            while f.read(1) not in (b"\x00", b""):
+                pass
+    if flags & _FHCRC:
+        f.read(2)
+    return table
+
+
+class DictzipReader(io.RawIOBase):
+    """Raw stream over the uncompressed bytes of a dictzip or gzip file."""
+
+    def __init__(self, path: str | Path):
+        super().__init__()
+        self.name = str(path)
+        self._file = open(path, "rb")
+        self._pos = 0
+        self._cached: tuple[int, bytes] = (-1, b"")
+        self._gzip: gzip.GzipFile | None = None
+        try:
+            table = _read_header(self._file)
+            if table is None:
+                # ISIZE trailer, the uncompressed size modulo 2**32
+                self._file.seek(-4, io.SEEK_END)
+                (self._size,) = struct.unpack("<I", self._file.read(4))
+                self._file.seek(0)
+                self._gzip = gzip.GzipFile(fileobj=self._file)
+                return
+            self._chunk_size, sizes = table
+            self._offsets = list(accumulate(sizes, initial=self._file.tell()))
+            count = len(sizes)
+            self._size = (
+                (count - 1) * self._chunk_size + len(self._chunk(count - 1))
+                if count
+                else 0
+            )
+        except Exception:
+            self._file.close()
+            raise
+
+    def _chunk(self, index: int) -> bytes:
+        if self._cached[0] != index:
+            self._file.seek(self._offsets[index])
+            data = self._file.read(self._offsets[index + 1] - self._offsets[index])
+            self._cached = (index, zlib.decompressobj(-15).decompress(data))
+        return self._cached[1]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._size:
+            return 0
+        if self._gzip is not None:
+            self._gzip.seek(self._pos)
+            count = self._gzip.readinto(buffer)
+        else:
+            index, skip = divmod(self._pos, self._chunk_size)
+            chunk = self._chunk(index)
+            count = min(len(buffer), len(chunk) - skip)
+            buffer[:count] = chunk[skip : skip + count]
+        self._pos += count
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._gzip is not None:
+                self._gzip.close()
+            self._file.close()
+        super().close()
+
+
+def write_dictzip(
+    path: str | Path, data: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE, level: int = 9
+) -> None:
+    """Writes `data` as a dictzip file, readable by DictzipReader and by gzip/dictzip tools."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    chunks = []
+    for start in range(0, len(data), chunk_size):
+        last = start + chunk_size >= len(data)
+        piece = compressor.compress(data[start : start + chunk_size])
+        chunks.append(
+            piece + compressor.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+        )
+    if not chunks:
+        chunks.append(compressor.flush())
+    if len(chunks) > 0xFFFF or any(len(chunk) > 0xFFFF for chunk in chunks):
+        raise ValueError("Data too large for a single dictzip member")
+
+    sizes = [len(chunk) for chunk in chunks]
+    field = struct.pack(f"<HHH{len(sizes)}H", 1, chunk_size, len(sizes), *sizes)
+    extra = b"RA" + struct.pack("<H", len(field)) + field
+    with open(path, "wb") as f:
+        f.write(b"\x1f\x8b\x08" + bytes([_FEXTRA]) + struct.pack("<I", 0) + b"\x02\x03")
+        f.write(struct.pack("<H", len(extra)) + extra)
+        f.writelines(chunks)
+        f.write(struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF))
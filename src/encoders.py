@@ -0,0 +1,59 @@
+import json
+from typing import Any, Protocol
+
+
+class JsonEncoder(Protocol):
+    name: str
+    # Separator between list items, entries are spliced together with it
+    separator: bytes
+
+    def dumps(self, obj: Any) -> bytes: ...
+
+
+class StdlibEncoder:
+    """The json module; output is byte-identical to json.dumps(..., ensure_ascii=False)."""
+
+    name = "json"
+    separator = b", "
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+class OrjsonEncoder:
+    """orjson, several times faster; writes compact JSON without spaces after separators."""
+
+    name = "orjson"
+    separator = b","
+
+    def __init__(self):
+        import orjson
+
+        self._dumps = orjson.dumps
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._dumps(obj)
+
+
+ENCODERS = {"json": StdlibEncoder, "orjson": OrjsonEncoder}
+
+DEFAULT_ENCODER = StdlibEncoder()
+
+
+def get_encoder(name: str = "json") -> JsonEncoder:
+    """
+    Returns the encoder called `name`; "auto" picks orjson when it is
+    installed and falls back to the standard library otherwise.
+    """
+    if name == "auto":
+        try:
+            return OrjsonEncoder()
+        except ImportError:
+            return DEFAULT_ENCODER
+    if name not in ENCODERS:
+        raise ValueError(
+            f"Unknown JSON encoder {name!r}, expected one of: auto, {', '.join(ENCODERS)}"
+        )
+    if name == "json":
+        return DEFAULT_ENCODER
+    return ENCODERS[name]()
@@ -0,0 +1,585 @@
+"""
+Inflected German surface forms for the companion forms dictionary.
+
+The rules generate forms forward from a headword and the Yomitan POS rule
+the converter detected for it (n, v, adj), mirroring what
+yomitan-de-language/german-transforms.js strips at lookup time. Forms are
+written as Yomitan deinflection glossaries, [lemma, [inflection]], so a
+lookup of "Häuser" is an exact hit that Yomitan resolves to "Haus" in the
+main dictionary without any runtime transforms.
+
+Generation over-approximates on purpose: a form that does not exist in
+German never matches scanned text, while a missing one loses a lookup.
+"""
+
+import re
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from src.encoders import DEFAULT_ENCODER, JsonEncoder
+from src.packer import YomitanPacker
+from src.sinks import OutputSink
+
+# (surface form, inflection name)
+Form = tuple[str, str]
+
+# Lemma chunks per worker process, keeps the pool busy when chunk costs differ
+CHUNKS_PER_JOB = 4
+
+SEPARABLE_PREFIXES = sorted(
+    [
+        "ab",
+        "an",
+        "auf",
+        "aus",
+        "bei",
+        "dar",
+        "ein",
+        "empor",
+        "entgegen",
+        "entlang",
+        "fehl",
+        "fest",
+        "fort",
+        "gegenüber",
+        "gleich",
+        "her",
+        "heran",
+        "heraus",
+        "herein",
+        "hin",
+        "hinab",
+        "hinauf",
+        "hinaus",
+        "hinein",
+        "los",
+        "mit",
+        "nach",
+        "nieder",
+        "vor",
+        "voran",
+        "voraus",
+        "vorbei",
+        "weg",
+        "weiter",
+        "wieder",
+        "zu",
+        "zurück",
+        "zusammen",
+    ],
+    key=len,
+    reverse=True,
+)
+INSEPARABLE_PREFIXES = ("be", "emp", "ent", "er", "ge", "miss", "ver", "zer")
+
+VOWELS = "aeiouäöüy"
+
+ADJECTIVE_ENDINGS = ("e", "en", "er", "em", "es")
+
+# Verbs whose forms cannot be derived from the infinitive, inverted from the
+# irregularVerbs table of german-transforms.js. Like there, they come on top
+# of the regular present and imperative forms
+IRREGULAR_VERBS = {
+    "sein": [
+        "bin",
+        "bist",
+        "ist",
+        "sind",
+        "seid",
+        "war",
+        "warst",
+        "waren",
+        "wart",
+        "gewesen",
+    ],
+    "haben": [
+        "habe",
+        "hast",
+        "hat",
+        "habt",
+        "hatte",
+        "hattest",
+        "hatten",
+        "hattet",
+        "gehabt",
+    ],
+    "werden": [
+        "werde",
+        "wirst",
+        "wird",
+        "werdet",
+        "wurde",
+        "wurdest",
+        "wurden",
+        "wurdet",
+        "geworden",
+    ],
+    "können": [
+        "kann",
+        "kannst",
+        "könnt",
+        "konnte",
+        "konntest",
+        "konnten",
+        "gekonnt",
+        "könnte",
+    ],
+    "müssen": [
+        "muss",
+        "musst",
+        "müsst",
+        "musste",
+        "musstest",
+        "mussten",
+        "gemusst",
+        "müsste",
+    ],
+    "dürfen": [
+        "darf",
+        "darfst",
+        "dürft",
+        "durfte",
+        "durftest",
+        "durften",
+        "gedurft",
+        "dürfte",
+    ],
+    "sollen": ["soll", "sollst", "sollt", "sollte", "solltest", "sollten", "gesollt"],
+    "wollen": ["will", "willst", "wollt", "wollte", "wolltest", "wollten", "gewollt"],
+    "mögen": [
+        "mag",
+        "magst",
+        "mögt",
+        "mochte",
+        "mochtest",
+        "mochten",
+        "gemocht",
+        "möchte",
+        "möchten",
+    ],
+    "wissen": ["weiß", "weißt", "wisst", "wusste", "wusstest", "wussten", "gewusst"],
+    "tun": ["tue", "tust", "tut", "tat", "tatest", "taten", "getan"],
+    "gehen": ["ging", "gingst", "gingen", "gegangen"],
+    "kommen": ["kam", "kamst", "kamen", "gekommen"],
+    "sehen": ["sieh", "siehst", "sieht", "sah", "sahst", "sahen", "gesehen"],
+    "ziehen": ["zog", "zogst", "zogen", "gezogen"],
+    "bringen": ["brachte", "brachtest", "brachten", "gebracht"],
+    "denken": ["dachte", "dachtest", "dachten", "gedacht"],
+    "nehmen": ["nimm", "nimmst", "nimmt", "nahm", "nahmst", "nahmen", "genommen"],
+    "sprechen": [
+        "sprich",
+        "sprichst",
+        "spricht",
+        "sprach",
+        "sprachst",
+        "sprachen",
+        "gesprochen",
+    ],
+    "geben": ["gib", "gibst", "gibt", "gab", "gabst", "gaben", "gegeben"],
+    "essen": ["iss", "isst", "aß", "aßt", "aßen", "gegessen"],
+    "lesen": ["lies", "liest", "las", "last", "lasen", "gelesen"],
+    "schreiben": ["schrieb", "schriebst", "schrieben", "geschrieben"],
+    "bleiben": ["blieb", "bliebst", "blieben", "geblieben"],
+    "lassen": ["lässt", "ließ", "ließt", "ließen", "gelassen"],
+    "fallen": ["fällst", "fällt", "fiel", "fielst", "fielen", "gefallen"],
+    "halten": ["hältst", "hält", "hielt", "hieltst", "hielten", "gehalten"],
+    "stehen": ["stand", "standst", "standen", "gestanden"],
+    "finden": ["fand", "fandst", "fanden", "gefunden"],
+    "verlieren": ["verlor", "verlorst", "verloren"],
+    "bieten": ["bot", "botst", "boten", "geboten"],
+    "bitten": ["bat", "batst", "baten", "gebeten"],
+    "fliegen": ["flog", "flogst", "flogen", "geflogen"],
+    "helfen": ["hilf", "hilfst", "hilft", "half", "halfst", "halfen", "geholfen"],
+    "laufen": ["läufst", "läuft", "lief", "liefst", "liefen", "gelaufen"],
+    "liegen": ["lag", "lagst", "lagen", "gelegen"],
+    "rufen": ["rief", "riefst", "riefen", "gerufen"],
+    "schlagen": ["schlägst", "schlägt", "schlug", "schlugst", "schlugen", "geschlagen"],
+    "tragen": ["trägst", "trägt", "trug", "trugst", "trugen", "getragen"],
+    "treffen": ["triff", "triffst", "trifft", "traf", "trafst", "trafen", "getroffen"],
+    "trinken": ["trank", "trankst", "tranken", "getrunken"],
+    "waschen": ["wäschst", "wäscht", "wusch", "wuschst", "wuschen", "gewaschen"],
+    "fahren": ["fährst", "fährt", "fuhr", "fuhrst", "fuhren", "gefahren"],
+    "schlafen": [
+        "schläfst",
+        "schläft",
+        "schlief",
+        "schliefst",
+        "schliefen",
+        "geschlafen",
+    ],
+    "sitzen": ["saß", "saßt", "saßen", "gesessen"],
+    "sterben": [
+        "stirb",
+        "stirbst",
+        "stirbt",
+        "starb",
+        "starbst",
+        "starben",
+        "gestorben",
+    ],
+    "werfen": ["wirf", "wirfst", "wirft", "warf", "warfst", "warfen", "geworfen"],
+}
+
+# Irregular verbs without a single regular present form, sei- would give "seit"
+SUPPLETIVE_VERBS = {"sein"}
+
+# Noun plurals that the suffix rules miss, inverted from irregularNouns
+IRREGULAR_NOUNS = {
+    "mutter": ["mütter", "müttern"],
+    "vater": ["väter", "vätern"],
+    "bruder": ["brüder", "brüdern"],
+    "tochter": ["töchter", "töchtern"],
+    "apfel": ["äpfel", "äpfeln"],
+    "vogel": ["vögel", "vögeln"],
+    "garten": ["gärten"],
+    "hafen": ["häfen"],
+    "mantel": ["mäntel", "mänteln"],
+    "boden": ["böden"],
+    "faden": ["fäden"],
+    "graben": ["gräben"],
+    "ofen": ["öfen"],
+    "schaden": ["schäden"],
+    "nagel": ["nägel", "nägeln"],
+    "thema": ["themen"],
+    "zentrum": ["zentren"],
+    "museum": ["museen"],
+    "stadion": ["stadien"],
+    "praktikum": ["praktika"],
+    "lexikon": ["lexika"],
+    "firma": ["firmen"],
+    "villa": ["villen"],
+    "pizza": ["pizzen"],
+    "rhythmus": ["rhythmen"],
+    "globus": ["globen"],
+    "klima": ["klimata"],
+    "risiko": ["risiken"],
+    "material": ["materialien"],
+    "prinzip": ["prinzipien"],
+    "ei": ["eier", "eiern"],
+    "herr": ["herrn", "herren"],
+}
+
+# Adjectives with irregular comparison: (comparative stem, superlative stem)
+IRREGULAR_ADJECTIVES = {
+    "gut": ("besser", "best"),
+    "groß": ("größer", "größt"),
+    "viel": ("mehr", "meist"),
+    "hoch": ("höher", "höchst"),
+    "nah": ("näher", "nächst"),
+    "gern": ("lieber", "liebst"),
+}
+
+
+def umlaut(stem: str) -> str | None:
+    """Umlauts the last a/o/u/au of a stem, or returns None when there is none."""
+    for i in range(len(stem) - 1, -1, -1):
+        char = stem[i]
+        if char in "äöüÄÖÜ":
+            return None
+        if char in "aouAOU":
+            if char in "uU" and i > 0 and stem[i - 1] in "aA":
+                # au becomes äu
+                return stem[: i - 1] + ("ä" if stem[i - 1] == "a" else "Ä") + stem[i:]
+            if char in "uU" and i > 0 and stem[i - 1] in "eE":
+                # eu never takes an umlaut
+                return None
+            return stem[:i] + "äöüÄÖÜ"["aouAOU".index(char)] + stem[i + 1 :]
+    return None
+
+
+def _match_case(form: str, lemma: str) -> str:
+    return form[:1].upper() + form[1:] if lemma[:1].isupper() else form
+
+
+def noun_forms(lemma: str) -> list[Form]:
+    lower = lemma.lower()
+    forms: list[Form] = []
+    if lower in IRREGULAR_NOUNS:
+        forms += [
+            (_match_case(form, lemma), "plural") for form in IRREGULAR_NOUNS[lower]
+        ]
+
+    if lower.endswith(("s", "ß", "x", "z")):
+        forms.append((lemma + "es", "genitive"))
+    else:
+        forms.append((lemma + "s", "genitive"))
+        if not lower.endswith(("e", "el", "er", "en", "in", "chen", "lein")):
+            forms.append((lemma + "es", "genitive"))
+
+    if lower.endswith("in"):
+        forms.append((lemma + "nen", "plural"))
+    elif lower.endswith("e"):
+        forms.append((lemma + "n", "plural"))
+    elif lower.endswith(("el", "er", "en", "chen", "lein")):
+        umlauted = umlaut(lemma)
+        if umlauted:
+            forms.append((umlauted, "plural"))
+        if not lower.endswith("en"):
+            forms.append((lemma + "n", "dative plural"))
+            if umlauted:
+                forms.append((umlauted + "n", "dative plural"))
+    elif lower[-1:] in "aiouy":
+        forms.append((lemma + "s", "plural"))
+    else:
+        forms += [
+            (lemma + "e", "plural"),
+            (lemma + "en", "plural"),
+            (lemma + "er", "plural"),
+        ]
+        forms.append((lemma + "ern", "dative plural"))
+        umlauted = umlaut(lemma)
+        if umlauted:
+            forms += [(umlauted + "e", "plural"), (umlauted + "er", "plural")]
+            forms += [
+                (umlauted + "en", "dative plural"),
+                (umlauted + "ern", "dative plural"),
+            ]
+    return forms
+
+
+def _is_verb(word: str) -> bool:
+    """Whether a word can be an infinitive: -en, -eln, -ern or -n after a stem with a vowel."""
+    if word.endswith(("eln", "ern")):
+        stem = word[:-3]
+    elif word.endswith("en"):
+        stem = word[:-2]
+    else:
+        stem = word[:-1]
+    return (
+        word.endswith("n") and len(stem) >= 2 and any(char in VOWELS for char in stem)
+    )
+
+
+def _split_separable(lemma: str) -> tuple[str, str]:
+    # Only where the rest is a verb of its own: auf|stehen, but not bei|chten
+    for prefix in SEPARABLE_PREFIXES:
+        if lemma.startswith(prefix) and _is_verb(lemma[len(prefix) :]):
+            return prefix, lemma[len(prefix) :]
+    return "", lemma
+
+
+def _split_inseparable(base: str) -> tuple[str, str]:
+    """Splits an inseparable prefix off an irregular verb: verstehen gives ver, stehen."""
+    if base not in IRREGULAR_VERBS:
+        for prefix in INSEPARABLE_PREFIXES:
+            if base.startswith(prefix) and base[len(prefix) :] in IRREGULAR_VERBS:
+                return prefix, base[len(prefix) :]
+    return "", base
+
+
+def verb_forms(lemma: str) -> list[Form]:
+    prefix, base = _split_separable(lemma)
+    inseparable, root = _split_inseparable(base)
+    participles: list[str] = []
+    finite: list[str] = []
+    for form in IRREGULAR_VERBS.get(root, []):
+        if form.startswith("ge") and form.endswith(("en", "t")):
+            # The inseparable prefix takes the place of ge-: gestanden -> verstanden
+            participles.append(inseparable + form[2:] if inseparable else form)
+        else:
+            finite.append(inseparable + form)
+    forms: list[Form] = []
+
+    if base.endswith(("eln", "ern")):
+        stem = base[:-1]
+    elif base.endswith("en"):
+        stem = base[:-2]
+    elif base.endswith("n"):
+        stem = base[:-1]
+    else:
+        stem = ""
+    if len(stem) >= 2 and root not in SUPPLETIVE_VERBS:
+        # arbeiten -> arbeitet, öffnen -> öffnet
+        link = (
+            "e"
+            if stem.endswith(("t", "d"))
+            or (stem[-1:] in "mn" and stem[-2:-1] not in "aeiouäöülrhm")
+            else ""
+        )
+        present = [stem + "e", stem + link + "st", stem + link + "t"]
+        if base.endswith("eln"):
+            # sammeln -> ich sammle
+            present[0] = stem[:-2] + "le"
+        if stem.endswith(("s", "ß", "x", "z")):
+            present[1] = stem + "t"
+        imperative = [stem]
+        # The table's own du form replaces the regular one: fährst, not fahrst.
+        # fuhrst is past, since fuhr and fuhren are listed too, and stem + t
+        # stays as the ihr form (ihr fahrt). An imperative of its own does the
+        # same: gib, lies
+        past = {
+            form for form in finite if form + "en" in finite or form + "n" in finite
+        }
+        du_forms = {
+            form for form in finite if form.endswith("st") and form[:-2] not in past
+        }
+        if du_forms and present[1] != present[2]:
+            del present[1]
+        if any(form + "st" in du_forms or form + "t" in du_forms for form in finite):
+            imperative = []
+        forms += [(form, "present") for form in present]
+        forms += [(form, "imperative") for form in imperative]
+        # fahren -> fahrend, sammeln -> sammelnd, tun -> tuend
+        forms.append(
+            (
+                base + "d" if base.endswith(("en", "ln", "rn")) else stem + "end",
+                "present participle",
+            )
+        )
+        if root not in IRREGULAR_VERBS:
+            past = stem + link + "te"
+            forms += [(past + ending, "past") for ending in ("", "st", "n", "t")]
+            if prefix:
+                participles.append("ge" + stem + link + "t")
+            elif base.startswith(INSEPARABLE_PREFIXES) or base.endswith("ieren"):
+                participles.append(stem + link + "t")
+            else:
+                participles.append("ge" + stem + link + "t")
+
+    forms += [(form, "irregular") for form in finite]
+    if prefix:
+        # Finite forms get the prefix in subordinate clauses, irregular ones
+        # only there, since bare stand is stehen
+        forms = [(prefix + form, label) for form, label in forms] + [
+            (form, label) for form, label in forms if label != "irregular"
+        ]
+        forms.append((prefix + "zu" + base, "zu-infinitive"))
+    # Participles keep the separable prefix in front
+    forms += [(prefix + form, "participle") for form in participles]
+    return forms
+
+
+def adjective_forms(lemma: str) -> list[Form]:
+    if lemma in IRREGULAR_ADJECTIVES:
+        comparatives, superlatives = (
+            [IRREGULAR_ADJECTIVES[lemma][0]],
+            [IRREGULAR_ADJECTIVES[lemma][1]],
+        )
+    else:
+        # dunkel -> dunkler, leise -> leiser, alt -> ältest-
+        comparative_stem = (
+            lemma[:-2] + lemma[-1]
+            if lemma.endswith(("el", "er"))
+            else lemma.rstrip("e")
+        )
+        superlative_link = (
+            "e" if lemma.endswith(("d", "t", "s", "ß", "x", "z", "sch")) else ""
+        )
+        comparatives = [comparative_stem + "er"]
+        superlatives = [lemma + superlative_link + "st"]
+        umlauted = umlaut(lemma)
+        # Only one-syllable adjectives take an umlaut: alt -> älter, but not dunkel
+        syllables = len(re.findall("[aeiouäöüy]+", lemma))
+        if umlauted and syllables == 1:
+            comparatives.append(umlaut(comparative_stem) + "er")
+            superlatives.append(umlauted + superlative_link + "st")
+
+    forms: list[Form] = [(lemma + ending, "declined") for ending in ADJECTIVE_ENDINGS]
+    if lemma.endswith("e"):
+        forms = [
+            (lemma + ending[1:], "declined")
+            for ending in ADJECTIVE_ENDINGS
+            if ending != "e"
+        ]
+    for comparative in comparatives:
+        forms.append((comparative, "comparative"))
+        forms += [(comparative + ending, "comparative") for ending in ADJECTIVE_ENDINGS]
+    for superlative in superlatives:
+        forms += [(superlative + ending, "superlative") for ending in ADJECTIVE_ENDINGS]
+    return forms
+
+
+GENERATORS = {"n": noun_forms, "v": verb_forms, "adj": adjective_forms}
+
+
+def inflect(lemma: str, rules: Iterable[str]) -> list[Form]:
+    """Forms of a single-word lemma for each of its POS rules, without the lemma itself."""
+    if not lemma.replace("-", "").isalpha():
+        return []
+    seen = {lemma}
+    forms = []
+    for rule in rules:
+        generate = GENERATORS.get(rule)
+        if generate is None:
+            continue
+        for form, label in generate(lemma):
+            if form not in seen:
+                seen.add(form)
+                forms.append((form, label))
+    return forms
+
+
+def inflect_batch(lemmas: list[tuple[str, list[str]]]) -> list[tuple[str, str, str]]:
+    """Process-pool worker: (form, lemma, inflection) for every lemma in the batch."""
+    return [
+        (form, lemma, label)
+        for lemma, rules in lemmas
+        for form, label in inflect(lemma, rules)
+    ]
+
+
+def generate_forms(
+    lemmas: dict[str, set[str]], jobs: int = 1
+) -> list[tuple[str, str, str]]:
+    """
+    Generates the forms of all lemmas, in parallel with jobs > 1, and
+    returns them sorted and deduplicated by (form, lemma).
+    """
+    items = sorted((lemma, sorted(rules)) for lemma, rules in lemmas.items())
+    if jobs > 1 and len(items) > jobs:
+        size = -(-len(items) // (jobs * CHUNKS_PER_JOB))
+        chunks = [items[i : i + size] for i in range(0, len(items), size)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            batches = list(pool.map(inflect_batch, chunks))
+    else:
+        batches = [inflect_batch(items)]
+
+    unique: dict[tuple[str, str], str] = {}
+    for batch in batches:
+        for form, lemma, label in batch:
+            unique.setdefault((form, lemma), label)
+    return [(form, lemma, label) for (form, lemma), label in sorted(unique.items())]
+
+
+def build_forms_dictionary(
+    lemmas: dict[str, set[str]],
+    output_dir: str | None,
+    name: str,
+    title: str,
+    jobs: int = 1,
+    encoder: JsonEncoder = DEFAULT_ENCODER,
+    compression_level: int | None = None,
+    sink: OutputSink | None = None,
+) -> tuple[Path | str, int]:
+    """
+    Writes <name>-forms.zip, a Yomitan dictionary mapping the generated
+    forms of `lemmas` (term -> POS rules) to their lemma, to output_dir or
+    `sink`. Returns what YomitanPacker.pack() returned and the number of forms.
+    """
+    forms = generate_forms(lemmas, jobs)
+    packer = YomitanPacker(
+        output_dir,
+        f"{name}-forms",
+        streaming=True,
+        encoder=encoder,
+        compression_level=compression_level,
+        sink=sink,
+    )
+    try:
+        for sequence, (form, lemma, label) in enumerate(forms, 1):
+            packer.add_entry(form, "", [[lemma, [label]]], sequence)
+
+        metadata = {
+            "title": f"{title} Forms",
+            "format": 3,
+            "author": "DSL to Yomitan Converter",
+            "sourceLanguage": "de",
+            "targetLanguage": "de",
+            "description": f"Inflected forms of the {title} headwords, each pointing to its headword",
+            "revision": datetime.now().strftime("%Y.%m.%d.%H%M%S"),
+        }
+        return packer.pack(metadata), len(forms)
+    finally:
+        packer.close()
@@ -0,0 +1,255 @@
+"""
+On-disk lookup index over the term banks of a converted dictionary.
+
+The banks of a dictionary, a ZIP from YomitanPacker or its unpacked
+directory, are copied verbatim into entries.bin. index.bin holds one
+fixed-size record per key, sorted by the UTF-8 key, that points to the
+bank and byte range of an entry; every term is a key, and so is its
+lowercased form. Both files are memory-mapped, so opening an index reads
+nothing up front, and a lookup is a binary search that returns the entry
+JSON as stored, without parsing it.
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+# Bump when the files below change, so older indexes are rebuilt
+INDEX_VERSION = 1
+
+# magic, record count, offset of the key bytes
+_HEADER = struct.Struct("<8sQQ")
+_MAGIC = b"DSLYIDX1"
+# key offset, key length, flags, bank, entry offset, entry length
+_RECORD = struct.Struct("<QIBIQI")
+
+# Record flags: the key is the term itself, the key is the lowercased term
+EXACT = 1
+LOWER = 2
+
+BANK_NAME = re.compile(r"term_bank_(\d+)\.json$")
+
+_decoder = json.JSONDecoder()
+
+
+def _bank_number(name: str) -> int:
+    match = BANK_NAME.search(name)
+    return int(match.group(1)) if match else 0
+
+
+def read_dictionary(source: Path) -> tuple[dict[str, Any], Iterator[tuple[int, bytes]]]:
+    """Returns index.json and the (number, bytes) of the term banks, in bank order."""
+    if source.is_dir():
+        banks = sorted(
+            source.glob("term_bank_*.json"), key=lambda path: _bank_number(path.name)
+        )
+        metadata = json.loads((source / "index.json").read_text(encoding="utf-8"))
+        return metadata, (
+            (_bank_number(path.name), path.read_bytes()) for path in banks
+        )
+
+    zipf = zipfile.ZipFile(source)
+    metadata = json.loads(zipf.read("index.json"))
+    names = sorted(
+        (name for name in zipf.namelist() if BANK_NAME.match(name)), key=_bank_number
+    )
+
+    def banks() -> Iterator[tuple[int, bytes]]:
+        with zipf:
+            for name in names:
+                yield _bank_number(name), zipf.read(name)
+
+    return metadata, banks()
+
+
+def source_stamp(source: Path) -> list[list[Any]]:
+    """Names, sizes and modification times of the files an index is built from."""
+    paths = (
+        [source]
+        if source.is_file()
+        else [source / "index.json", *source.glob("term_bank_*.json")]
+    )
+    return sorted(
+        [path.name, path.stat().st_size, path.stat().st_mtime_ns] for path in paths
+    )
+
+
+def scan_bank(data: bytes) -> Iterator[tuple[str, int, int]]:
+    """Yields the term, byte offset and byte length of every entry of a term bank."""
+    text = data.decode("utf-8")
+    pos = text.index("[") + 1
+    # Everything outside the entries is ASCII, so characters and bytes advance together there
+    offset = len(text[:pos].encode("utf-8"))
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+            offset += 1
+        if pos >= len(text) or text[pos] == "]":
+            return
+        entry, end = _decoder.raw_decode(text, pos)
+        length = len(text[pos:end].encode("utf-8"))
+        yield entry[0], offset, length
+        pos = end
+        offset += length
+
+
+def build_index(source: Path, index_dir: Path) -> None:
+    """Writes entries.bin, index.bin and meta.json for a dictionary to index_dir."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    metadata, banks = read_dictionary(source)
+    records: list[tuple[bytes, int, int, int, int]] = []
+    entries = 0
+    base = 0
+    with open(index_dir / "entries.bin.tmp", "wb") as out:
+        for bank, data in banks:
+            out.write(data)
+            for term, offset, length in scan_bank(data):
+                key = term.encode("utf-8")
+                lower = term.lower().encode("utf-8")
+                if key == lower:
+                    records.append((key, EXACT | LOWER, bank, base + offset, length))
+                else:
+                    records.append((key, EXACT, bank, base + offset, length))
+                    records.append((lower, LOWER, bank, base + offset, length))
+                entries += 1
+            base += len(data)
+    # Entries sharing a key stay in dictionary order
+    records.sort(key=lambda record: (record[0], record[2], record[3]))
+
+    with open(index_dir / "index.bin.tmp", "wb") as out:
+        keys_at = _HEADER.size + len(records) * _RECORD.size
+        out.write(_HEADER.pack(_MAGIC, len(records), keys_at))
+        key_offset = 0
+        for key, flags, bank, offset, length in records:
+            out.write(_RECORD.pack(key_offset, len(key), flags, bank, offset, length))
+            key_offset += len(key)
+        out.writelines(record[0] for record in records)
+
+    os.replace(index_dir / "entries.bin.tmp", index_dir / "entries.bin")
+    os.replace(index_dir / "index.bin.tmp", index_dir / "index.bin")
+    meta = {
+        "version": INDEX_VERSION,
+        "title": metadata.get("title", source.stem),
+        "entries": entries,
+        "source": source_stamp(source),
+    }
+    (index_dir / "meta.json").write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def default_index_dir(source: Path) -> Path:
+    """Where the index of a dictionary is kept: .lookup/<name> next to it."""
+    return source.parent / ".lookup" / source.name
+
+
+def _map(path: Path) -> mmap.mmap | bytes:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LookupIndex:
+    def __init__(self, index_dir: str | Path):
+        index_dir = Path(index_dir)
+        meta = json.loads((index_dir / "meta.json").read_text(encoding="utf-8"))
+        self.title: str = meta["title"]
+        self.entries: int = meta["entries"]
+        self._entries = _map(index_dir / "entries.bin")
+        self._index = _map(index_dir / "index.bin")
+        magic, self.count, self._keys_at = _HEADER.unpack_from(self._index, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{index_dir} is not a lookup index")
+
+    @classmethod
+    def open(
+        cls, source: str | Path, index_dir: str | Path | None = None
+    ) -> "LookupIndex":
+        """Opens the index of a dictionary ZIP or directory, building it when missing or stale."""
+        source = Path(source)
+        index_dir = Path(index_dir) if index_dir else default_index_dir(source)
+        meta_path = index_dir / "meta.json"
+        fresh = False
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            fresh = meta.get("version") == INDEX_VERSION and meta.get(
+                "source"
+            ) == source_stamp(source)
+        if not fresh:
+            build_index(source, index_dir)
+        return cls(index_dir)
+
+    def close(self) -> None:
+        for mapped in (self._entries, self._index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def _record(self, i: int) -> tuple[int, int, int, int, int, int]:
+        return _RECORD.unpack_from(self._index, _HEADER.size + i * _RECORD.size)
+
+    def _key(self, i: int) -> bytes:
+        key_offset, key_length = _RECORD.unpack_from(
+            self._index, _HEADER.size + i * _RECORD.size
+        )[:2]
+        start = self._keys_at + key_offset
+        return self._index[start : start + key_length]
+
+    def _lower_bound(self, key: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _entry(self, record: tuple[int, int, int, int, int, int]) -> bytes:
+        offset, length = record[4], record[5]
+        return self._entries[offset : offset + length]
+
+    def _matches(
+        self, key: bytes, flag: int, prefix: bool = False
+    ) -> Iterator[tuple[int, int, int, int, int, int]]:
+        i = self._lower_bound(key)
+        while i < self.count:
+            found = self._key(i)
+            if not (found.startswith(key) if prefix else found == key):
+                return
+            record = self._record(i)
+            if record[2] & flag:
+                yield record
+            i += 1
+
+    def exact(self, query: str) -> list[bytes]:
+        """Entries whose term is the query, then those that match it ignoring case."""
+        seen: set[int] = set()
+        results = []
+        for key, flag in (
+            (query.encode("utf-8"), EXACT),
+            (query.lower().encode("utf-8"), LOWER),
+        ):
+            for record in self._matches(key, flag):
+                if record[4] not in seen:
+                    seen.add(record[4])
+                    results.append(self._entry(record))
+        return results
+
+    def prefix(self, query: str, limit: int = 20) -> list[bytes]:
+        """Up to `limit` entries whose term starts with the query, ignoring case, in key order."""
+        seen: set[int] = set()
+        results = []
+        for record in self._matches(query.lower().encode("utf-8"), LOWER, prefix=True):
+            if record[4] not in seen:
+                seen.add(record[4])
+                results.append(self._entry(record))
+                if len(results) >= limit:
+                    break
+        return results
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+# File types reported as unused media when no entry references them. Referenced
+# files are matched whatever their type, as a DSL may link any file
+MEDIA_SUFFIXES = {
+    ".wav",
+    ".mp3",
+    ".ogg",
+    ".oga",
+    ".opus",
+    ".m4a",
+    ".flac",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".bmp",
+    ".tif",
+    ".tiff",
+    ".webp",
+    ".svg",
+}
+
+# Read size when hashing media, keeps memory bounded for large audio files
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class BundledFile(NamedTuple):
+    """A media file inside a GoldenDict resource bundle (<name>.dsl.files.zip)."""
+
+    bundle: Path
+    member: str
+
+
+MediaSource = Path | BundledFile
+
+
+def _file_digest(source: MediaSource, bundles: dict[Path, zipfile.ZipFile]) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, BundledFile):
+        f = bundles[source.bundle].open(source.member)
+    else:
+        f = open(source, "rb")
+    with f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class MediaIndex:
+    """
+    The files of an input directory and its subdirectories, by their path
+    relative to it as in [s]sub/haus.wav[/s], listed with a single scandir
+    pass instead of one stat per referenced name, plus the members of any
+    .files.zip bundles, which are read in place rather than extracted.
+    Files with identical content are collapsed onto one archive name, so
+    the ZIP holds each of them once. Contents are only compared for names
+    a dictionary references, when resolve() first sees them.
+    """
+
+    def __init__(self, directory: Path, bundles: Iterable[Path] = ()):
+        self.directory = Path(directory)
+        self.bundles = [Path(bundle) for bundle in bundles]
+        self.sizes: dict[str, int] = {}
+        self.sources: dict[str, MediaSource] = {}
+        self._scan(self.directory, "")
+
+        for bundle in self.bundles:
+            with zipfile.ZipFile(bundle) as zipf:
+                for info in zipf.infolist():
+                    # Loose files next to the DSL win over bundled copies
+                    if not info.is_dir() and info.filename not in self.sources:
+                        self.sizes[info.filename] = info.file_size
+                        self.sources[info.filename] = BundledFile(bundle, info.filename)
+
+        # Exact names take precedence, since Windows-authored DSLs reference
+        # files in whatever case the author typed
+        self._folded: dict[str, str] = {}
+        self._by_size: dict[int, list[str]] = {}
+        for name in sorted(self.sizes):
+            self._folded.setdefault(name.casefold(), name)
+            self._by_size.setdefault(self.sizes[name], []).append(name)
+        self._resolved: dict[str, str] = {}
+        self._digests: dict[str, bytes] = {}
+        # Files that were resolved to another file with the same content
+        self.merged: set[str] = set()
+
+    def _scan(self, directory: Path, prefix: str) -> None:
+        with os.scandir(directory) as it:
+            for item in it:
+                if item.is_dir(follow_symlinks=False):
+                    # Hidden directories hold caches, e.g. <output>/.cache
+                    if not item.name.startswith("."):
+                        self._scan(Path(item.path), f"{prefix}{item.name}/")
+                elif item.is_file():
+                    self.sizes[prefix + item.name] = item.stat().st_size
+                    self.sources[prefix + item.name] = Path(item.path)
+
+    def resolve(self, name: str) -> str:
+        """
+        The archive name of a referenced file: the file matched exactly or
+        ignoring case, replaced by the first file with the same content.
+        Names without a file are returned unchanged.
+        """
+        archive_name = self._resolved.get(name)
+        if archive_name is None:
+            found = name if name in self.sizes else self._folded.get(name.casefold())
+            archive_name = self._archive_name(found) if found else name
+            if found and archive_name != found:
+                self.merged.add(found)
+            self._resolved[name] = archive_name
+        return archive_name
+
+    def _archive_name(self, name: str) -> str:
+        """
+        The first file, in name order, with the same content. Only files of
+        the same size that come before it are hashed.
+        """
+        names = self._by_size[self.sizes[name]]
+        if names[0] == name:
+            return name
+        bundles: dict[Path, zipfile.ZipFile] = {}
+        try:
+            digest = self._digest(name, bundles)
+            for other in names:
+                if other == name or self._digest(other, bundles) == digest:
+                    return other
+        finally:
+            for zipf in bundles.values():
+                zipf.close()
+        return name
+
+    def _digest(self, name: str, bundles: dict[Path, zipfile.ZipFile]) -> bytes:
+        if name not in self._digests:
+            source = self.sources[name]
+            if isinstance(source, BundledFile) and source.bundle not in bundles:
+                bundles[source.bundle] = zipfile.ZipFile(source.bundle)
+            self._digests[name] = _file_digest(source, bundles)
+        return self._digests[name]
+
+    @property
+    def duplicates(self) -> int:
+        return len(self.merged)
+
+    def source(self, archive_name: str) -> MediaSource:
+        return self.sources[archive_name]
+
+    def split(self, referenced: set[str]) -> tuple[list[str], list[str], list[str]]:
+        """
+        Returns the (found, missing, unused) file names for the names a
+        dictionary references; unused ones are media files by MEDIA_SUFFIXES.
+        """
+        found = sorted(name for name in referenced if name in self.sizes)
+        missing = sorted(name for name in referenced if name not in self.sizes)
+        used = set(found)
+        unused = sorted(
+            name
+            for name in self.sizes
+            if name not in used
+            and name not in self.merged
+            and Path(name).suffix.lower() in MEDIA_SUFFIXES
+        )
+        return found, missing, unused
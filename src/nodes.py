@@ -0,0 +1,92 @@
+"""
+Compact, immutable nodes the converter builds structured content from.
+
+A node keeps its tag and content in slots and all other attributes in one
+interned tuple, so the many equal attribute sets ({"content": "bold"},
+{"content": "sense", "class": "margin-1"}, ...) are stored once. Child lists
+are tuples. Since nothing in a tree can change, the line cache shares trees
+instead of copying them, and to_json() builds the plain dicts the term banks
+are written from.
+"""
+
+from typing import Any
+
+# ((key, value), ...) with dict values such as `data` stored as item tuples
+Attrs = tuple[tuple[str, Any], ...]
+
+_ATTRS: dict[Attrs, Attrs] = {}
+
+
+def intern_attrs(attrs: dict[str, Any]) -> Attrs:
+    """Returns the shared tuple for these attributes."""
+    key = tuple(
+        (name, tuple(value.items()) if isinstance(value, dict) else value)
+        for name, value in attrs.items()
+    )
+    if "href" in attrs:
+        # Link targets are mostly unique, keep them out of the table
+        return key
+    return _ATTRS.setdefault(key, key)
+
+
+class Node:
+    __slots__ = ("attrs", "content", "tag")
+
+    def __init__(self, tag: str, content: Any = None, attrs: Attrs = ()):
+        self.tag = tag
+        # None for a node without content
+        self.content = content
+        self.attrs = attrs
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.tag!r}, {self.content!r}, {self.attrs!r})"
+
+    def to_json(self) -> dict[str, Any]:
+        node: dict[str, Any] = {"tag": self.tag}
+        if self.content is not None:
+            node["content"] = to_json(self.content)
+        for name, value in self.attrs:
+            node[name] = dict(value) if type(value) is tuple else value
+        return node
+
+
+class LeadingAttrsNode(Node):
+    """A node whose attributes come before its content in the JSON, like sound links."""
+
+    __slots__ = ()
+
+    def to_json(self) -> dict[str, Any]:
+        node: dict[str, Any] = {"tag": self.tag}
+        for name, value in self.attrs:
+            node[name] = dict(value) if type(value) is tuple else value
+        if self.content is not None:
+            node["content"] = to_json(self.content)
+        return node
+
+
+def to_json(content: Any) -> Any:
+    """Builds fresh dicts and lists from a tree of nodes, sharing only the strings."""
+    if isinstance(content, Node):
+        return content.to_json()
+    if type(content) is tuple:
+        return [to_json(item) for item in content]
+    return content
+
+
+def from_json(content: Any) -> Any:
+    """Turns dicts and lists of structured content back into nodes."""
+    if isinstance(content, dict):
+        attrs = {
+            name: value
+            for name, value in content.items()
+            if name not in ("tag", "content")
+        }
+        keys = list(content)
+        leading = "content" in content and keys.index("content") > 1
+        node_type = LeadingAttrsNode if leading else Node
+        return node_type(
+            content["tag"], from_json(content.get("content")), intern_attrs(attrs)
+        )
+    if isinstance(content, list):
+        return tuple(from_json(item) for item in content)
+    return content
@@ -1,20 +1,230 @@
+import functools
+import io
 import json
+import os
+import re
+import shutil
+import time
 import zipfile
+import zlib
+from collections import deque
+from collections.abc import Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, TypedDict
+
+from src.encoders import DEFAULT_ENCODER, JsonEncoder
+from src.media import BundledFile, MediaSource
+from src.profiling import NULL_PROFILER, NullProfiler, Profiler
+from src.sinks import OutputSink, ZipSink
 
 # Default styles.css location relative to project root
 DEFAULT_STYLES_PATH = Path(__file__).parent.parent / "data" / "styles.css"
 
+# Media formats that are already compressed; deflating them again only costs time
+STORED_MEDIA_SUFFIXES = {
+    ".mp3", ".ogg", ".oga", ".opus", ".m4a", ".aac", ".flac",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz",
+}
+
+# Copy size when streaming media out of .files.zip bundles
+MEDIA_COPY_CHUNK = 1 << 20
+
+# A term bank is closed at whichever limit it reaches first. Yomitan parses
+# each bank in one piece while importing, so long Duden entries need fewer
+# entries per bank than short Langenscheidt ones.
+DEFAULT_MAX_BANK_BYTES = 4 << 20
+DEFAULT_MAX_ENTRIES_PER_BANK = 10000
+
+# Room left in each volume for index.json and styles.css
+VOLUME_HEADROOM = 64 << 10
+
+# Local header, central directory entry and ZIP64 extras of a member, its name not included
+MEMBER_OVERHEAD = 128
+
+# Sound links in serialized glossaries, to find the media each volume needs
+SOUND_LINK = re.compile(rb'\?sound=((?:[^"\\]|\\.)*)"')
+
+# Pre-serialized entry JSON, or JSON parts joined when the bank is written
+EncodedEntry = bytes | tuple[bytes, ...]
+
+
+class MemberStats(TypedDict):
+    name: str
+    size: int
+    compressed_size: int
+    seconds: float
+
+
+def _write_precompressed(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: bytes) -> None:
+    """
+    Appends a member whose data is already compressed, with its sizes and
+    CRC set on zinfo. zipfile has no public API for this, so the local
+    header is written the way ZipFile.open(..., "w") does it for a seekable
+    file, through ZipFile._writecheck(), _didModify, fp, start_dir and
+    ZipInfo.FileHeader(). Checked against the zipfile of CPython 3.10,
+    3.11, 3.12 and 3.13; only use it when precompressed_members_supported()
+    says so.
+    """
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.write(data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+
+@functools.cache
+def precompressed_members_supported() -> bool:
+    """
+    Whether _write_precompressed() works with this Python's zipfile: a
+    member is written to a scratch archive and read back, once per process.
+    Without it, banks are deflated by zipfile itself through writestr().
+    """
+    data = b'[["probe", "", "", "", 0, [], 1, ""]]' * 4
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    zinfo = zipfile.ZipInfo("probe.json", date_time=(2020, 1, 1, 0, 0, 0))
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    zinfo.CRC = zlib.crc32(data)
+    buffer = io.BytesIO()
+    try:
+        with zipfile.ZipFile(buffer, "w") as zipf:
+            _write_precompressed(zipf, zinfo, compressed)
+            zipf.writestr("after.json", data)
+        with zipfile.ZipFile(buffer) as zipf:
+            return zipf.testzip() is None and zipf.read("probe.json") == data and zipf.read("after.json") == data
+    except Exception:
+        return False
+
+
+def encode_entry_head(
+    term: str,
+    reading: str,
+    glossary: list[dict[str, Any]],
+    rules: list[str] | None = None,
+    encoder: JsonEncoder = DEFAULT_ENCODER,
+) -> bytes:
+    """
+    Serializes everything of a term bank entry except the sequence number.
+    The result is completed by YomitanPacker.add_encoded_entry(), which lets
+    workers encode entries before their final sequence numbers are known.
+    """
+    return encode_entry_head_raw(term, reading, encoder.dumps(glossary), rules, encoder)
+
+
+def encode_entry_head_raw(
+    term: str,
+    reading: str,
+    glossary_json: bytes,
+    rules: list[str] | None = None,
+    encoder: JsonEncoder = DEFAULT_ENCODER,
+) -> bytes:
+    """Like encode_entry_head() for a glossary that is already serialized."""
+    return encode_term_prefix(term, reading, rules, encoder) + glossary_json
+
+
+def encode_term_prefix(
+    term: str,
+    reading: str,
+    rules: list[str] | None = None,
+    encoder: JsonEncoder = DEFAULT_ENCODER,
+) -> bytes:
+    """Serializes the part of a term bank entry before the glossary, see add_encoded_variants()."""
+    head = encoder.dumps([term, reading, "", " ".join(rules) if rules else "", 0])
+    return head[:-1] + encoder.separator
+
 
 class YomitanPacker:
-    def __init__(self, output_dir: str, dictionary_name: str):
-        self.output_dir = Path(output_dir)
+    def __init__(
+        self,
+        output_dir: str | None,
+        dictionary_name: str,
+        streaming: bool = False,
+        profiler: Profiler | NullProfiler = NULL_PROFILER,
+        encoder: JsonEncoder = DEFAULT_ENCODER,
+        compression_level: int | None = None,
+        compression_threads: int | None = None,
+        max_bank_bytes: int | None = DEFAULT_MAX_BANK_BYTES,
+        max_entries_per_bank: int = DEFAULT_MAX_ENTRIES_PER_BANK,
+        max_archive_bytes: int | None = None,
+        sink: OutputSink | None = None,
+        media_sizes: Mapping[str, int] | None = None,
+    ):
+        """
+        In streaming mode the ZIP is opened on the first entry and every
+        term bank is written as soon as it is full, so memory stays bounded
+        by one bank instead of the whole dictionary. Pre-encoded entries must
+        come from the same encoder the packer uses.
+
+        Term banks are deflated in a thread pool and written as pre-compressed
+        members. compression_level is the zlib level (None for zlib's default,
+        0 stores every member uncompressed).
+
+        Banks are split at max_bank_bytes of serialized JSON or at
+        max_entries_per_bank entries. With max_archive_bytes, term banks go to
+        further volumes, <name>-1.zip, <name>-2.zip, ..., once a volume would
+        exceed it. Each volume gets index.json with the title numbered and
+        the media its entries link to, which count towards the limit, and
+        banks are closed early so that one fits in a volume with its media.
+        Media sizes come from media_sizes, since media is usually added after
+        the banks are written, or from the files added so far.
+
+        Archives go to `sink`, by default a ZipSink writing to output_dir.
+        Without a compression_level, the sink's own preference is used.
+        """
+        if sink is None:
+            sink = ZipSink(output_dir)
+        self.sink = sink
         self.dictionary_name = dictionary_name
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.entries: list[list[Any]] = []
-        self.media_files: dict[str, Path] = {}  # filename -> source_path
-        self.max_entries_per_bank = 10000
+        self.entries: list[EncodedEntry] = []
+        self.media_files: dict[str, MediaSource] = {}  # filename -> source file or bundle member
+        self.max_entries_per_bank = max_entries_per_bank
+        self.max_bank_bytes = max_bank_bytes
+        self.max_archive_bytes = max_archive_bytes
+        self.media_sizes = media_sizes or {}
+        self._media_costs: dict[str, int] = {}
+        self.streaming = streaming
+        self.entry_count = 0
+        self._bank_bytes = 2  # JSON size of the buffered bank, brackets included
+        self._bank_media: set[str] = set()  # sound files the buffered bank links to, with max_archive_bytes
+        self._bank_media_bytes = 0
+        self._zipf: zipfile.ZipFile | None = None
+        self._volumes: list[zipfile.ZipFile] = []
+        self._files: list[BinaryIO] = []
+        self._volume_media: list[set[str]] = []  # media files that go to each volume
+        self._volume_reserved: list[int] = []  # bytes each volume needs beyond what is written
+        self.volume_names: list[str] = []
+        self.volume_paths: list[Path | str] = []  # what the sink returned for each volume
+        self.output_size = 0  # bytes of all volumes
+        self._bank_num = 0  # banks in the current volume
+        self.profiler = profiler
+        self.encoder = encoder
+        self._sequence_suffix = encoder.separator + b'""]'
+        if compression_level is None:
+            compression_level = sink.compression_level
+        self.compression_level = compression_level
+        self.compression = zipfile.ZIP_STORED if compression_level == 0 else zipfile.ZIP_DEFLATED
+        # Deflate banks in the thread pool and write them as they are; otherwise zipfile deflates them
+        self._precompress = self.compression == zipfile.ZIP_DEFLATED and precompressed_members_supported()
+        self.compression_threads = compression_threads or os.cpu_count() or 1
+        self.members: list[MemberStats] = []
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: deque[tuple[int, set[str], Future[tuple[bytes, int, float]]]] = deque()
+
+    def _volume_name(self, volume: int, count: int) -> str:
+        if count == 1:
+            return f"{self.dictionary_name}.zip"
+        return f"{self.dictionary_name}-{volume}.zip"
+
+    def _partial_name(self, volume: int) -> str:
+        # Volumes are named once their count is known
+        return f"{self.dictionary_name}.zip.part{'' if volume == 1 else volume}"
 
     def add_entry(self, term: str, reading: str, glossary: list[dict[str, Any]], sequence: int, rules: list[str] | None = None):
         """
@@ -31,37 +241,389 @@ class YomitanPacker:
             sequence,
             ""   # term_tags
         ]
+        self._append(self.encoder.dumps(entry))
+
+    def add_encoded_entry(self, head: bytes, sequence: int):
+        """Adds an entry pre-serialized by encode_entry_head()."""
+        separator = self.encoder.separator
+        self._append(head + separator + str(sequence).encode("ascii") + self._sequence_suffix)
+
+    def add_encoded_variants(self, prefixes: list[bytes], glossary_json: bytes, sequence: int):
+        """
+        Adds one entry per term prefix from encode_term_prefix(), all sharing
+        the serialized glossary and the sequence number. The glossary bytes
+        are kept once in memory until the bank is written.
+        """
+        tail = self.encoder.separator + str(sequence).encode("ascii") + self._sequence_suffix
+        for prefix in prefixes:
+            self._append((prefix, glossary_json, tail))
+
+    def _append(self, entry: EncodedEntry) -> None:
+        size = _entry_size(entry)
+        media = self._entry_media(entry)
+        media_bytes = sum(map(self._media_cost, media - self._bank_media))
+        if self.streaming and not self._fits(len(self.entries), self._bank_bytes, size, self._bank_media_bytes + media_bytes):
+            self._flush_bank()
+            media_bytes = sum(map(self._media_cost, media))
+        self._bank_bytes += size + (len(self.encoder.separator) if self.entries else 0)
+        self._bank_media |= media
+        self._bank_media_bytes += media_bytes
         self.entries.append(entry)
+        self.entry_count += 1
+
+    def _fits(self, count: int, bank_bytes: int, size: int, media_bytes: int = 0) -> bool:
+        """
+        Whether an entry of `size` bytes still goes into a bank of `count`
+        entries and `bank_bytes` bytes that links to `media_bytes` of media,
+        the entry's own included.
+        """
+        if count == 0:
+            return True
+        if count >= self.max_entries_per_bank:
+            return False
+        bank_bytes += len(self.encoder.separator) + size
+        if self.max_bank_bytes is not None and bank_bytes > self.max_bank_bytes:
+            return False
+        # A bank and its media have to fit in a volume of their own
+        return self.max_archive_bytes is None or bank_bytes + media_bytes + VOLUME_HEADROOM <= self.max_archive_bytes
+
+    def _entry_media(self, entry: EncodedEntry) -> set[str]:
+        """Sound files an entry links to; only collected with max_archive_bytes."""
+        if self.max_archive_bytes is None:
+            return set()
+        # A link never spans the parts of a variant
+        parts = (entry,) if isinstance(entry, bytes) else entry
+        return {json.loads(b'"' + name + b'"') for part in parts for name in SOUND_LINK.findall(part)}
 
-    def add_media_file(self, source_path: Path):
-        """Adds a media file to be included in the ZIP root."""
-        if source_path.exists():
-            self.media_files[source_path.name] = source_path
+    def _split_banks(self, entries: list[EncodedEntry]) -> Iterator[tuple[list[EncodedEntry], set[str]]]:
+        """Cuts buffered entries into banks, with their media, by the same limits streaming mode applies."""
+        start = 0
+        bank_bytes = 2
+        bank_media: set[str] = set()
+        bank_media_bytes = 0
+        for i, entry in enumerate(entries):
+            size = _entry_size(entry)
+            media = self._entry_media(entry)
+            media_bytes = sum(map(self._media_cost, media - bank_media))
+            if not self._fits(i - start, bank_bytes, size, bank_media_bytes + media_bytes):
+                yield entries[start:i], bank_media
+                start, bank_bytes, bank_media, bank_media_bytes = i, 2, set(), 0
+                media_bytes = sum(map(self._media_cost, media))
+            bank_bytes += size + (len(self.encoder.separator) if i > start else 0)
+            bank_media |= media
+            bank_media_bytes += media_bytes
+        if start < len(entries):
+            yield entries[start:], bank_media
 
-    def pack(self, metadata: dict[str, Any], styles_path: Path | None = None):
-        """Creates the ZIP archive with index.json, styles.css, term banks."""
-        zip_path = self.output_dir / f"{self.dictionary_name}.zip"
+    def add_media_file(self, source: MediaSource, filename: str | None = None):
+        """
+        Adds an existing media file or bundle member to be included in the
+        ZIP root, under its own name unless `filename` is given. pack()
+        copies it in chunks.
+        """
+        self.media_files[filename or Path(source.member if isinstance(source, BundledFile) else source).name] = source
+
+    def _open(self) -> zipfile.ZipFile:
+        if self._zipf is None:
+            fileobj = self.sink.open(self._partial_name(len(self._volumes) + 1))
+            self._files.append(fileobj)
+            self._zipf = self._create_zip(fileobj)
+            self._volumes.append(self._zipf)
+            self._volume_media.append(set())
+            self._volume_reserved.append(0)
+            self._bank_num = 0
+        return self._zipf
+
+    def _volume_for(self, compressed_size: int, media: set[str]) -> zipfile.ZipFile:
+        """
+        The volume the next bank goes to, starting a new one when the bank
+        and the media it links to that the current one lacks would not fit.
+        """
+        zipf = self._open()
+        if self.max_archive_bytes is not None:
+            reserved = self._bank_reserve(media)
+            if not self._has_room(-1, compressed_size + reserved):
+                self._zipf = None
+                zipf = self._open()
+                reserved = self._bank_reserve(media)
+            # The bank itself is counted by the file position once it is written
+            self._volume_reserved[-1] += reserved
+            self._volume_media[-1] |= media
+        return zipf
+
+    def _bank_reserve(self, media: set[str]) -> int:
+        """Bytes the next bank adds to the current volume besides its data."""
+        filename = f"term_bank_{self._bank_num + 1}.json"
+        return _member_overhead(filename) + sum(self._media_cost(name) for name in media - self._volume_media[-1])
+
+    def _media_cost(self, name: str) -> int:
+        """Upper bound of the bytes a media file adds to a volume, 0 if it was not found (yet)."""
+        if name in self._media_costs:
+            return self._media_costs[name]
+        size = self.media_sizes.get(name)
+        if size is None:
+            if name not in self.media_files:
+                return 0
+            size = _source_size(self.media_files[name])
+        if self.compression == zipfile.ZIP_DEFLATED and Path(name).suffix.lower() not in STORED_MEDIA_SUFFIXES:
+            # zlib's bound for data that does not compress
+            size += (size >> 12) + (size >> 14) + 13
+        self._media_costs[name] = size + _member_overhead(name)
+        return self._media_costs[name]
+
+    def _has_room(self, volume: int, cost: int) -> bool:
+        """Whether `cost` more bytes fit in a volume; an empty one takes anything."""
+        reserved = self._volume_reserved[volume]
+        written = self._files[volume].tell()
+        return not reserved or written + reserved + cost + VOLUME_HEADROOM <= self.max_archive_bytes
+
+    def _place_unlinked_media(self) -> None:
+        """Puts media no bank links to, e.g. from a skipped image tag, in the first volume with room."""
+        linked = set().union(*self._volume_media)
+        for name in self.media_files:
+            if name in linked:
+                continue
+            cost = self._media_cost(name)
+            volume = next((v for v in range(len(self._volumes)) if self._has_room(v, cost)), None)
+            if volume is None:
+                self._zipf = None
+                self._open()
+                volume = len(self._volumes) - 1
+            self._volume_reserved[volume] += cost
+            self._volume_media[volume].add(name)
+
+    def _create_zip(self, fileobj: BinaryIO) -> zipfile.ZipFile:
+        level = None if self.compression == zipfile.ZIP_STORED else self.compression_level
+        return zipfile.ZipFile(fileobj, "w", self.compression, compresslevel=level)
+
+    def _compress(self, data: bytes) -> tuple[bytes, int, float]:
+        """Runs in the thread pool; returns (member data, CRC-32, seconds)."""
+        started = time.perf_counter()
+        crc = zlib.crc32(data)
+        if self._precompress:
+            level = zlib.Z_DEFAULT_COMPRESSION if self.compression_level is None else self.compression_level
+            # Raw deflate stream, the same zipfile itself would write
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            data = compressor.compress(data) + compressor.flush()
+        return data, crc, time.perf_counter() - started
+
+    def _write_bank(self, bank_entries: list[EncodedEntry], media: set[str]) -> None:
+        with self.profiler.stage("serialize"):
+            # Joining per-entry JSON gives the same bytes as dumping the whole list
+            encoded = (e if isinstance(e, bytes) else b"".join(e) for e in bank_entries)
+            data = b"[" + self.encoder.separator.join(encoded) + b"]"
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.compression_threads)
+        self._pending.append((len(data), media, self._pool.submit(self._compress, data)))
+        # Keep at most two banks per thread in flight to bound memory
+        while len(self._pending) > 2 * self.compression_threads:
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        """Waits for the oldest compressed bank and appends it to its volume."""
+        size, media, future = self._pending.popleft()
+        with self.profiler.stage("compress"):
+            data, crc, seconds = future.result()
+            # Banks are numbered per volume, so every volume starts at term_bank_1.json
+            zipf = self._volume_for(len(data), media)
+            self._bank_num += 1
+            filename = f"term_bank_{self._bank_num}.json"
+            compressed_size = self._write_compressed(zipf, filename, size, data, crc)
+        self._record_member(filename, size, compressed_size, seconds)
+
+    def _drain(self) -> None:
+        while self._pending:
+            self._write_pending()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _write_compressed(self, zipf: zipfile.ZipFile, filename: str, size: int, data: bytes, crc: int) -> int:
+        """
+        Appends a bank from _compress(), deflated there when _precompress is
+        set and written by zipfile otherwise. Returns the compressed size.
+        """
+        zinfo = zipfile.ZipInfo(filename, date_time=time.localtime(time.time())[:6])
+        zinfo.compress_type = self.compression
+        zinfo.external_attr = 0o600 << 16
+        if not self._precompress:
+            level = None if self.compression == zipfile.ZIP_STORED else self.compression_level
+            zipf.writestr(zinfo, data, compresslevel=level)
+            return zinfo.compress_size
+        zinfo.file_size = size
+        zinfo.compress_size = len(data)
+        zinfo.CRC = crc
+        _write_precompressed(zipf, zinfo, data)
+        return len(data)
 
+    def _record_member(self, filename: str, size: int, compressed_size: int, seconds: float) -> None:
+        self.members.append({"name": filename, "size": size, "compressed_size": compressed_size, "seconds": seconds})
+        self.profiler.member_done(filename, size, compressed_size, seconds)
+
+    def compression_summary(self) -> MemberStats:
+        """Totals over every member written so far, under the name "total"."""
+        return {
+            "name": "total",
+            "size": sum(m["size"] for m in self.members),
+            "compressed_size": sum(m["compressed_size"] for m in self.members),
+            "seconds": sum(m["seconds"] for m in self.members),
+        }
+
+    def _flush_bank(self) -> None:
+        """Writes the buffered entries as the next term bank and releases them."""
+        if not self.entries:
+            return
+        self._write_bank(self.entries, self._bank_media)
+        self.entries = []
+        self._bank_bytes = 2
+        self._bank_media = set()
+        self._bank_media_bytes = 0
+
+    def pack(self, metadata: dict[str, Any], styles_path: Path | None = None) -> Path | str:
+        """
+        Creates the ZIP archive with index.json, styles.css, term banks and
+        media, hands it to the sink and returns what the sink returned, the
+        path for a ZipSink; with several volumes, that of the first one (all
+        of them are in volume_paths).
+        """
         # Use provided styles_path or fall back to default
         style_to_use = styles_path if styles_path else DEFAULT_STYLES_PATH
 
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-            # Write index.json
-            zipf.writestr("index.json", json.dumps(metadata, ensure_ascii=False, indent=4))
+        if self.streaming:
+            self._flush_bank()
+        else:
+            for bank, media in self._split_banks(self.entries):
+                self._write_bank(bank, media)
+        try:
+            self._drain()
+            self._open()
+            if self.max_archive_bytes is None:
+                self._volume_media[0] = set(self.media_files)
+            else:
+                self._place_unlinked_media()
+            count = len(self._volumes)
+            for volume, zipf in enumerate(self._volumes, 1):
+                volume_metadata = metadata
+                if count > 1:
+                    volume_metadata = {**metadata, "title": f"{metadata['title']} ({volume}/{count})"}
+                wanted = self._volume_media[volume - 1]
+                media = {name: source for name, source in self.media_files.items() if name in wanted}
+                self._write_metadata(zipf, volume_metadata, style_to_use, media)
+        except BaseException:
+            self.close()
+            raise
+        self._close_volumes()
+
+        self.volume_names = [self._volume_name(volume, count) for volume in range(1, count + 1)]
+        self.output_size = sum(fileobj.seek(0, os.SEEK_END) for fileobj in self._files)
+        self.volume_paths = [self.sink.commit(fileobj, name) for fileobj, name in zip(self._files, self.volume_names)]
+        self._files = []
+        self._volume_media = []
+        self._volume_reserved = []
+        return self.volume_paths[0]
+
+    def close(self) -> None:
+        """
+        Releases a dictionary that was not packed, e.g. after a failed
+        conversion: stops the compression threads and lets the sink discard
+        the partial archives, so no .zip.part is left behind. Does nothing
+        after pack().
+        """
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        # zipfile leaves files it was given open, the sink's files are discarded here
+        self._close_volumes()
+        for fileobj in self._files:
+            self.sink.discard(fileobj)
+        self._files = []
+        self._volume_media = []
+        self._volume_reserved = []
+
+    def _close_volumes(self) -> None:
+        for zipf in self._volumes:
+            zipf.close()
+        self._volumes = []
+        self._zipf = None
+
+    def _write_metadata(
+        self,
+        zipf: zipfile.ZipFile,
+        metadata: dict[str, Any],
+        style_to_use: Path | None,
+        media_files: dict[str, MediaSource],
+    ) -> None:
+        # Write index.json
+        self._write_member(zipf, "index.json", json.dumps(metadata, ensure_ascii=False, indent=4))
+
+        # Always include styles.css if it exists
+        if style_to_use and style_to_use.exists():
+            self._write_member(zipf, "styles.css", style_to_use)
+
+        # Write media files to root, keeping .files.zip bundles open between members
+        bundles: dict[Path, zipfile.ZipFile] = {}
+        try:
+            with self.profiler.stage("media"):
+                for filename, source in media_files.items():
+                    self._write_member(zipf, filename, source, bundles)
+        finally:
+            for bundle in bundles.values():
+                bundle.close()
+
+    def _write_member(
+        self,
+        zipf: zipfile.ZipFile,
+        filename: str,
+        source: str | MediaSource,
+        bundles: dict[Path, zipfile.ZipFile] | None = None,
+    ) -> None:
+        """
+        Writes a string, file or bundle member as a member, storing media
+        that is already compressed. Bundle members are streamed straight out
+        of the archives in `bundles`, which is filled as they are opened.
+        """
+        started = time.perf_counter()
+        stored = Path(filename).suffix.lower() in STORED_MEDIA_SUFFIXES
+        if isinstance(source, BundledFile):
+            if bundles is None:
+                raise ValueError(f"{filename} is in a bundle, but no bundle cache was given")
+            if source.bundle not in bundles:
+                bundles[source.bundle] = zipfile.ZipFile(source.bundle)
+            bundle_info = bundles[source.bundle].getinfo(source.member)
+            target: zipfile.ZipInfo | str
+            if not stored and zipf.compresslevel is not None:
+                # Only a member opened by name gets the archive's level, with zipfile's default date
+                target = filename
+            else:
+                target = zipfile.ZipInfo(filename, date_time=bundle_info.date_time)
+                target.compress_type = zipfile.ZIP_STORED if stored else zipf.compression
+                target.external_attr = 0o600 << 16
+            # Decides on ZIP64 before the data is written, with zipfile's own margin for deflate growth
+            force_zip64 = bundle_info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+            with bundles[source.bundle].open(bundle_info) as src, zipf.open(target, "w", force_zip64=force_zip64) as dst:
+                shutil.copyfileobj(src, dst, MEDIA_COPY_CHUNK)
+        elif isinstance(source, Path):
+            zipf.write(source, filename, compress_type=zipfile.ZIP_STORED if stored else None)
+        else:
+            zipf.writestr(filename, source)
+        info = zipf.getinfo(filename)
+        self._record_member(filename, info.file_size, info.compress_size, time.perf_counter() - started)
+
+
+def _member_overhead(name: str) -> int:
+    # The name is stored in the local header and in the central directory
+    return MEMBER_OVERHEAD + 2 * len(name.encode())
 
-            # Always include styles.css if it exists
-            if style_to_use and style_to_use.exists():
-                zipf.write(style_to_use, "styles.css")
 
-            # Write media files to root
-            for filename, source_path in self.media_files.items():
-                zipf.write(source_path, filename)
+def _source_size(source: MediaSource) -> int:
+    if isinstance(source, BundledFile):
+        with zipfile.ZipFile(source.bundle) as bundle:
+            return bundle.getinfo(source.member).file_size
+    return Path(source).stat().st_size
 
-            # Write term banks
-            for i in range(0, len(self.entries), self.max_entries_per_bank):
-                bank_num = (i // self.max_entries_per_bank) + 1
-                bank_entries = self.entries[i : i + self.max_entries_per_bank]
-                filename = f"term_bank_{bank_num}.json"
-                zipf.writestr(filename, json.dumps(bank_entries, ensure_ascii=False))
 
-        return zip_path
+def _entry_size(entry: EncodedEntry) -> int:
+    return len(entry) if isinstance(entry, bytes) else sum(map(len, entry))
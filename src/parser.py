@@ -1,60 +1,314 @@
+import io
+import json
 import logging
-from collections.abc import Iterator
-from typing import TypedDict
+import mmap
+import os
+from collections.abc import Iterable, Iterator
+from itertools import chain
+from typing import BinaryIO, TypedDict
+
+from src.dictzip import is_compressed, open_binary
+from src.reader import detect_encoding, iter_line_blocks, split_lines
 
 logger = logging.getLogger(__name__)
 
+# Read size used when scanning the raw bytes for entry boundaries
+SCAN_CHUNK_SIZE = 1 << 20
+
+# Bump when the sidecar index layout changes so stale files get rebuilt
+INDEX_VERSION = 2
+
+# (headwords, byte offset, byte length) of one entry in the DSL file
+IndexEntry = tuple[list[str], int, int]
+
 class DslEntry(TypedDict):
+    # First headword, used for logging and profiling
     headword: str
+    # All consecutive headword lines sharing the body, e.g. spelling variants
+    headwords: list[str]
     body: list[str]
 
 class DslParser:
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.headers: dict[str, str] = {}
+        # Byte offset of the first line after the #-headers, set by read_headers()
+        self.body_offset: int | None = None
+        self._raw: BinaryIO | None = None
+        self._codec: tuple[str, int] | None = None
+
+    @property
+    def position(self) -> int:
+        """Approximate byte offset reached by a running parse(), for progress reporting."""
+        return self._raw.tell() if self._raw and not self._raw.closed else 0
+
+    def size(self) -> int:
+        """Size of the DSL text in bytes, uncompressed for .dsl.dz files."""
+        if not is_compressed(self.file_path):
+            return os.path.getsize(self.file_path)
+        with open_binary(self.file_path) as f:
+            return f.seek(0, io.SEEK_END)
+
+    def read_headers(self) -> int:
+        """
+        Reads only the #-header lines, stopping at the first other line.
+        Returns the byte offset where the body starts; parse() resumes there.
+        """
+        codec, bom_len = self._detect_codec()
+        header_mark = "#".encode(codec)
+        width = len(header_mark)
+        offset = bom_len
+        try:
+            with open_binary(self.file_path) as f:
+                for line_start, line in self._iter_raw_lines(f, bom_len, codec):
+                    offset = line_start
+                    if line[:width] != header_mark:
+                        break
+                    self._parse_header(line.decode(codec).rstrip("\n\r"))
+                    offset = line_start + len(line)
+
+        except UnicodeError:
+            logger.error(f"Failed to decode {self.file_path} headers as {codec}")
+            raise
+
+        self.body_offset = offset
+        return offset
 
     def parse(self) -> Iterator[DslEntry]:
         """Parses the DSL file and yields entries."""
+        codec, bom_len = self._detect_codec()
+        start = self.body_offset if self.body_offset is not None else bom_len
         try:
-            with open(self.file_path, "r", encoding="utf-16") as f:
-                current_headword: str | None = None
-                current_body: list[str] = []
-
-                for line in f:
-                    line = line.rstrip("\n\r")
-                    if not line:
-                        if current_headword:
-                            yield {"headword": current_headword, "body": current_body}
-                            current_headword = None
-                            current_body = []
-                        continue
-
-                    if line.startswith("#"):
-                        self._parse_header(line)
-                        continue
-                    
-                    if line.startswith("\t"):
-                        if current_headword:
-                            current_body.append(line.lstrip("\t"))
-                        else:
-                            logger.warning(f"Found body line without headword: {line}")
-                        continue
-                    
-                    # If we have a previous entry, yield it before starting a new one
-                    if current_headword:
-                        yield {"headword": current_headword, "body": current_body}
-                        current_body = []
-                    
-                    current_headword = line.strip()
-
-                # Yield the last entry
-                if current_headword:
-                    yield {"headword": current_headword, "body": current_body}
+            with open_binary(self.file_path) as raw:
+                self._raw = raw
+                yield from self._iter_entries(chain.from_iterable(iter_line_blocks(raw, codec, start)))
 
         except UnicodeError:
-            logger.error(f"Failed to decode {self.file_path} as UTF-16")
+            logger.error(f"Failed to decode {self.file_path} as {codec}")
             raise
 
+    def parse_range(self, start: int, end: int) -> Iterator[DslEntry]:
+        """
+        Parses only the bytes in [start, end) and yields their entries.
+        Offsets must come from shard_offsets() so they fall on entry boundaries.
+        """
+        codec, _ = self._detect_codec()
+        try:
+            with open_binary(self.file_path) as f:
+                yield from self._iter_entries(chain.from_iterable(iter_line_blocks(f, codec, start, end)))
+
+        except UnicodeError:
+            logger.error(f"Failed to decode {self.file_path} bytes {start}-{end} as {codec}")
+            raise
+
+    def shard_offsets(self, count: int) -> list[tuple[int, int]]:
+        """
+        Splits the file into at most `count` byte ranges of similar size.
+        Every range starts on a headword line that follows a body or blank line,
+        so parse_range() over all shards yields exactly the entries of parse().
+        """
+        codec, bom_len = self._detect_codec()
+        with open_binary(self.file_path) as f:
+            size = f.seek(0, io.SEEK_END)
+            # The first shard starts after the headers, workers never re-read them
+            starts = [self.body_offset if self.body_offset is not None else self.read_headers()]
+            for k in range(1, max(count, 1)):
+                target = starts[0] + (size - starts[0]) * k // count
+                if target <= starts[-1]:
+                    continue
+                boundary = self._next_entry_start(f, target, codec, bom_len)
+                if boundary is None:
+                    break
+                if boundary > starts[-1]:
+                    starts.append(boundary)
+
+        ends = starts[1:] + [size]
+        return list(zip(starts, ends))
+
+    def load_index(self, index_path: str | None = None) -> list[IndexEntry]:
+        """
+        Returns the entry index, reading the sidecar file when it still matches
+        the DSL file's size and mtime and rebuilding (and saving) it otherwise.
+        """
+        index_path = index_path or f"{self.file_path}.idx.json"
+        stat = os.stat(self.file_path)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (
+                data.get("version") == INDEX_VERSION
+                and data.get("size") == stat.st_size
+                and data.get("mtime_ns") == stat.st_mtime_ns
+            ):
+                self.headers = data["headers"]
+                self.body_offset = data["body_offset"]
+                return [tuple(e) for e in data["entries"]]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        entries = self.build_index()
+        data = {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "headers": self.headers,
+            "body_offset": self.body_offset,
+            "entries": entries,
+        }
+        try:
+            with open(index_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Could not save index {index_path}: {e}")
+        return entries
+
+    def build_index(self) -> list[IndexEntry]:
+        """Scans the file once and records the byte span of every entry."""
+        codec, _ = self._detect_codec()
+        body_offset = self.read_headers()
+        width = len("\n".encode(codec))
+        non_headword = {c.encode(codec) for c in "\t\r\n#"}
+        header_mark = "#".encode(codec)
+
+        entries: list[IndexEntry] = []
+        headwords: list[str] = []
+        prev_is_headword = False
+        start = end = body_offset
+        with open_binary(self.file_path) as f:
+            for line_start, line in self._iter_raw_lines(f, body_offset, codec):
+                is_headword = line[:width] not in non_headword
+                if is_headword:
+                    # Consecutive headword lines belong to one entry
+                    if not prev_is_headword:
+                        if headwords:
+                            entries.append((headwords, start, end - start))
+                        headwords = []
+                        start = line_start
+                    headword = line.decode(codec).strip()
+                    if headword:
+                        headwords.append(headword)
+                # Header lines between headwords do not split an entry, as in _iter_entries()
+                if line[:width] != header_mark:
+                    prev_is_headword = is_headword
+                end = line_start + len(line)
+        if headwords:
+            entries.append((headwords, start, end - start))
+        return entries
+
+    def parse_spans(self, spans: Iterable[tuple[int, int]]) -> Iterator[DslEntry]:
+        """Yields the entries at the given (offset, length) spans via a memory map or dictzip seeks."""
+        codec, _ = self._detect_codec()
+        if is_compressed(self.file_path):
+            # dictzip seeks inflate only the chunks a span touches
+            with open_binary(self.file_path) as f:
+                for offset, length in spans:
+                    f.seek(offset)
+                    yield from self._iter_entries(split_lines(f.read(length).decode(codec)))
+            return
+        with open(self.file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset, length in spans:
+                yield from self._iter_entries(split_lines(mm[offset : offset + length].decode(codec)))
+
+    def _detect_codec(self) -> tuple[str, int]:
+        """Returns the file's codec and BOM length, detected once per parser."""
+        if self._codec is None:
+            self._codec = detect_encoding(self.file_path)
+        return self._codec
+
+    def _next_entry_start(self, f: BinaryIO, offset: int, codec: str, bom_len: int) -> int | None:
+        """Finds the first entry boundary at or after `offset`."""
+        width = len("\n".encode(codec))
+        # Code units are fixed width, align to one so newline matches are real
+        offset -= (offset - bom_len) % width
+        body_or_blank = {c.encode(codec) for c in "\t\r\n"}
+
+        prev_is_body = False
+        first = True
+        for line_start, line in self._iter_raw_lines(f, offset, codec):
+            if first:
+                # The line we landed in is likely partial, skip it
+                first = False
+                continue
+            unit = line[:width]
+            if unit in body_or_blank:
+                prev_is_body = True
+                continue
+            if prev_is_body and not unit.startswith("#".encode(codec)):
+                return line_start
+            prev_is_body = False
+        return None
+
+    @staticmethod
+    def _iter_raw_lines(f: BinaryIO, start: int, codec: str) -> Iterator[tuple[int, bytes]]:
+        """Yields (offset, raw_bytes) for each line from `start`, newline included."""
+        newline = "\n".encode(codec)
+        width = len(newline)
+        f.seek(start)
+        pos = start
+        buf = b""
+        while True:
+            chunk = f.read(SCAN_CHUNK_SIZE)
+            if not chunk:
+                if buf:
+                    yield pos, buf
+                return
+            buf += chunk
+            line_start = 0
+            idx = buf.find(newline)
+            while idx != -1:
+                if idx % width:
+                    idx = buf.find(newline, idx + 1)
+                    continue
+                end = idx + width
+                yield pos + line_start, buf[line_start:end]
+                line_start = end
+                idx = buf.find(newline, end)
+            buf = buf[line_start:]
+            pos += line_start
+
+    def _iter_entries(self, lines: Iterable[str]) -> Iterator[DslEntry]:
+        """
+        Groups lines without line endings into entries; the first character
+        decides the line type. Consecutive headword lines share the body
+        that follows them.
+        """
+        current_headwords: list[str] = []
+        current_body: list[str] = []
+
+        for line in lines:
+            if not line:
+                if current_headwords:
+                    yield {"headword": current_headwords[0], "headwords": current_headwords, "body": current_body}
+                    current_headwords = []
+                    current_body = []
+                continue
+
+            first = line[0]
+            if first == "\t":
+                if current_headwords:
+                    current_body.append(line.lstrip("\t"))
+                else:
+                    logger.warning(f"Found body line without headword: {line}")
+                continue
+
+            if first == "#":
+                self._parse_header(line)
+                continue
+
+            # A headword after body lines starts the next entry
+            if current_body:
+                yield {"headword": current_headwords[0], "headwords": current_headwords, "body": current_body}
+                current_headwords = []
+                current_body = []
+
+            headword = line.strip()
+            if headword:
+                current_headwords.append(headword)
+
+        # Yield the last entry
+        if current_headwords:
+            yield {"headword": current_headwords[0], "headwords": current_headwords, "body": current_body}
+
     def _parse_header(self, line: str) -> None:
         """Parses header lines like #NAME \"Dictionary\"."""
         line = line.lstrip("#").strip()
@@ -0,0 +1,631 @@
+"""
+Conversion of one DSL dictionary into Yomitan archives: parsing, tag
+conversion, serialization, packing, media and the companion forms
+dictionary. main.py drives it from the command line, src/api.py from
+library code.
+"""
+
+import json
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+from typing import TypedDict
+
+from src.cache import DEFAULT_MAX_ENTRIES, ConversionCache
+from src.converter import DslConverter
+from src.encoders import DEFAULT_ENCODER, JsonEncoder, get_encoder
+from src.inflection import build_forms_dictionary
+from src.media import MediaIndex
+from src.packer import YomitanPacker, encode_term_prefix
+from src.parser import DslEntry, DslParser, IndexEntry
+from src.profiling import NULL_PROFILER, NullProfiler, Profiler
+from src.reader import read_lines
+from src.sinks import OutputSink
+from src.sorter import EntrySorter
+
+logger = logging.getLogger(__name__)
+
+# Shards per worker process; more shards than workers keeps the pool busy
+# when entry sizes are uneven and bounds the memory each task holds
+SHARDS_PER_JOB = 4
+
+# Plain and dictzip-compressed DSL files
+DSL_SUFFIXES = (".dsl", ".dsl.dz")
+
+
+class ConversionStats(TypedDict):
+    name: str
+    entries: int
+    seconds: float
+    output_size: int
+
+
+# Term bank prefixes of an entry's terms and the glossary JSON they share
+EncodedEntry = tuple[list[bytes], bytes]
+
+# Lookup term -> POS rules detected for it, the input of the forms dictionary
+Lemmas = dict[str, set[str]]
+
+
+class ShardResult(TypedDict):
+    entries: list[EncodedEntry]
+    media_files: set[str]
+    media_merged: set[str]
+    cache_hits: int
+    cache_misses: int
+    line_cache_hits: int
+    line_cache_misses: int
+    compact_saved: int
+    lemmas: Lemmas
+
+
+class EntrySelection(TypedDict, total=False):
+    only: list[str]
+    sample: int
+    entry_range: tuple[int, int]
+
+
+class PackLimits(TypedDict, total=False):
+    max_bank_bytes: int | None
+    max_entries_per_bank: int
+    max_archive_bytes: int | None
+
+
+class SortOptions(TypedDict, total=False):
+    duplicates: str
+    run_bytes: int
+
+
+class DictionaryLogAdapter(logging.LoggerAdapter):
+    """Prefixes every message with the dictionary name, so interleaved worker logs stay readable."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['dictionary']}] {msg}", kwargs
+
+
+def dsl_stem(path: Path) -> str:
+    """Dictionary name of a DSL file: Duden.dsl and Duden.dsl.dz both give Duden."""
+    name = path.name
+    for suffix in sorted(DSL_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            return name[: -len(suffix)]
+    return path.stem
+
+
+def find_dsl_files(input_path: Path) -> list[Path]:
+    """Lists the main DSL files, preferring Name.dsl over Name.dsl.dz when both exist."""
+    by_stem: dict[str, Path] = {}
+    for suffix in reversed(DSL_SUFFIXES):
+        for path in input_path.glob(f"*{suffix}"):
+            if not dsl_stem(path).endswith("_abrv"):
+                by_stem[dsl_stem(path)] = path
+    return sorted(by_stem.values())
+
+
+def media_bundles(main_dsl: Path) -> list[Path]:
+    """GoldenDict resource bundles of a dictionary: Name.dsl.files.zip or Name.dsl.dz.files.zip."""
+    names = dict.fromkeys(
+        [f"{dsl_stem(main_dsl)}.dsl.files.zip", f"{main_dsl.name}.files.zip"]
+    )
+    return [
+        main_dsl.with_name(name) for name in names if main_dsl.with_name(name).is_file()
+    ]
+
+
+def load_abbreviations(input_path: Path) -> dict[str, str]:
+    abbrevs = {}
+    abrv_files = sorted(
+        f for suffix in DSL_SUFFIXES for f in input_path.glob(f"*_abrv{suffix}")
+    )
+    for abrv_file in abrv_files:
+        logger.info(f"Loading abbreviations from {abrv_file.name}...")
+        try:
+            # Abrv files are simple: headword \n \t expansion
+            current_abrv = None
+            for line in read_lines(abrv_file):
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("\t"):
+                    if current_abrv:
+                        abbrevs[current_abrv] = line.strip()
+                        current_abrv = None
+                else:
+                    current_abrv = line.strip()
+        except Exception as e:
+            logger.warning(f"Failed to load abbreviations from {abrv_file}: {e}")
+    return abbrevs
+
+
+def load_pos_rules(main_dsl: Path) -> dict[str, str] | None:
+    """
+    Loads the [p] abbreviation -> rule table from <name>_rules.json next to the
+    DSL file, for dictionaries whose abbreviations differ from the default.
+    """
+    rules_file = main_dsl.with_name(f"{dsl_stem(main_dsl)}_rules.json")
+    if not rules_file.exists():
+        return None
+    logger.info(f"Loading POS rules from {rules_file.name}...")
+    with open(rules_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def entry_terms(converter: DslConverter, entry: DslEntry) -> list[str]:
+    """Lookup terms of all headwords of an entry, with their (optional) parts expanded."""
+    return list(
+        dict.fromkeys(
+            term
+            for headword in entry["headwords"]
+            for term in converter.expand_headword(headword)
+        )
+    )
+
+
+def convert_entry(
+    converter: DslConverter, entry: DslEntry
+) -> tuple[list[str], list[dict], list[str]]:
+    """Converts a parsed DSL entry to (terms, glossary, rules) for the packer."""
+    terms = entry_terms(converter, entry)
+
+    # Convert tags in body lines, the POS rules are detected along the way
+    # Media files are collected cumulatively on the converter for the whole dictionary
+    structured_content, rules = converter.convert_with_rules(entry["body"])
+
+    # Wrap in the format Yomitan expects for glossary items
+    glossary = [{"type": "structured-content", "content": structured_content}]
+    return terms, glossary, rules
+
+
+def record_lemmas(lemmas: Lemmas | None, terms: list[str], rules: list[str]) -> None:
+    if lemmas is not None and rules:
+        for term in terms:
+            lemmas.setdefault(term, set()).update(rules)
+
+
+def encode_entry(
+    converter: DslConverter,
+    entry: DslEntry,
+    cache: ConversionCache | None = None,
+    profiler: Profiler | NullProfiler = NULL_PROFILER,
+    encoder: JsonEncoder = DEFAULT_ENCODER,
+    lemmas: Lemmas | None = None,
+) -> EncodedEntry:
+    """
+    Converts and serializes an entry for YomitanPacker.add_encoded_variants().
+    The body is converted and serialized once, however many terms share it.
+    With a cache, entries whose body is unchanged reuse the stored glossary.
+    With lemmas, the terms and their POS rules are recorded for the forms dictionary.
+    """
+    if cache is None:
+        with profiler.stage("convert", entry["headword"]):
+            terms, glossary, rules = convert_entry(converter, entry)
+        with profiler.stage("serialize"):
+            glossary_json = encoder.dumps(glossary)
+        record_lemmas(lemmas, terms, rules)
+        return [
+            encode_term_prefix(term, "", rules, encoder) for term in terms
+        ], glossary_json
+
+    key = cache.key(entry["body"])
+    cached = cache.get(key)
+    if cached is not None:
+        glossary_json, rules, media = cached
+        converter.media_files.update(media)
+        terms = entry_terms(converter, entry)
+        record_lemmas(lemmas, terms, rules)
+        return [
+            encode_term_prefix(term, "", rules, encoder) for term in terms
+        ], glossary_json
+
+    # Collect this entry's media on their own so they can be cached with it
+    dictionary_media = converter.media_files
+    converter.media_files = set()
+    try:
+        with profiler.stage("convert", entry["headword"]):
+            terms, glossary, rules = convert_entry(converter, entry)
+    finally:
+        entry_media = converter.media_files
+        converter.media_files = dictionary_media
+        dictionary_media |= entry_media
+    with profiler.stage("serialize"):
+        glossary_json = encoder.dumps(glossary)
+    cache.put(key, glossary_json, rules, sorted(entry_media))
+    record_lemmas(lemmas, terms, rules)
+    return [
+        encode_term_prefix(term, "", rules, encoder) for term in terms
+    ], glossary_json
+
+
+def convert_shard(
+    dsl_path: str,
+    start: int,
+    end: int,
+    abbreviations: dict[str, str],
+    cache_path: str | None = None,
+    pos_rules: dict[str, str] | None = None,
+    encoder_name: str = "json",
+    media: tuple[str, list[str]] | None = None,
+    collect_lemmas: bool = False,
+    compact: bool = False,
+) -> ShardResult:
+    """
+    Process-pool worker: parses, converts and serializes one shard of a DSL file.
+    Returns the encoded entries (without sequence numbers), the media they
+    reference, the cache counters and, with collect_lemmas, the shard's lemmas.
+    media is the media directory and the .files.zip bundles; the worker
+    lists them itself and resolves only the names its entries reference.
+    """
+    shard_parser = DslParser(dsl_path)
+    media_index = MediaIndex(Path(media[0]), map(Path, media[1])) if media else None
+    resolve_media = media_index.resolve if media_index else None
+    converter = DslConverter(
+        abbreviations, pos_rules=pos_rules, resolve_media=resolve_media, compact=compact
+    )
+    encoder = get_encoder(encoder_name)
+    cache = None
+    if cache_path:
+        cache = ConversionCache(
+            cache_path,
+            abbreviations,
+            pos_rules=converter.pos_rules,
+            encoder=encoder.name,
+            resolve_media=resolve_media,
+            compact=compact,
+        )
+    lemmas: Lemmas | None = {} if collect_lemmas else None
+    try:
+        entries = [
+            encode_entry(converter, entry, cache, encoder=encoder, lemmas=lemmas)
+            for entry in shard_parser.parse_range(start, end)
+        ]
+    finally:
+        if cache:
+            cache.close()
+    return {
+        "entries": entries,
+        "media_files": converter.media_files,
+        "media_merged": media_index.merged if media_index else set(),
+        "cache_hits": cache.hits if cache else 0,
+        "cache_misses": cache.misses if cache else 0,
+        "line_cache_hits": converter.line_cache_hits,
+        "line_cache_misses": converter.line_cache_misses,
+        "compact_saved": converter.compact_saved,
+        "lemmas": lemmas or {},
+    }
+
+
+def select_entries(
+    index: list[IndexEntry], selection: EntrySelection, converter: DslConverter
+) -> list[int]:
+    """Returns the positions in `index` picked by --only, --range and --sample, in file order."""
+    positions = range(len(index))
+    if "only" in selection:
+        wanted = set(selection["only"])
+        positions = [
+            i
+            for i in positions
+            if any(
+                headword in wanted
+                or not wanted.isdisjoint(converter.expand_headword(headword))
+                for headword in index[i][0]
+            )
+        ]
+    if "entry_range" in selection:
+        start, end = selection["entry_range"]
+        positions = positions[start:end]
+    if "sample" in selection and selection["sample"] < len(positions):
+        # Fixed seed so repeated debugging runs look at the same entries
+        positions = sorted(
+            random.Random(0).sample(list(positions), selection["sample"])
+        )
+    return list(positions)
+
+
+def convert_dsl_file(
+    main_dsl: Path,
+    input_path: Path,
+    output_dir: str | None,
+    abbreviations: dict[str, str],
+    jobs: int = 1,
+    selection: EntrySelection | None = None,
+    use_cache: bool = False,
+    cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+    profile: bool = False,
+    cprofile_convert: bool = False,
+    json_encoder: str = "json",
+    compression_level: int | None = None,
+    forms: bool = False,
+    limits: PackLimits | None = None,
+    compact: bool = False,
+    sort: SortOptions | None = None,
+    sink: OutputSink | None = None,
+) -> ConversionStats:
+    """
+    Converts a single DSL dictionary into a Yomitan ZIP and returns its stats.
+    With a selection only the matching entries are converted, using the
+    sidecar entry index, and written to <name>-subset.zip. With use_cache,
+    unchanged entries are taken from <output>/.cache/<name>.sqlite. With
+    profile, per-stage timings go to <output>/<name>.profile.json.
+    compression_level 0 stores the archive members uncompressed. With forms,
+    inflected forms of the headwords go to a companion <name>-forms.zip.
+    limits override the term bank and archive size limits of the packer.
+    With compact, the structured content is shrunk by src/compact.py.
+    With sort, term rows go through an EntrySorter and reach the packer in
+    headword order, with repeated headwords grouped or merged.
+    With a sink, the archives go there instead of output_dir, which is then
+    only needed for the cache and the profile.
+    """
+    if output_dir is None and (use_cache or profile):
+        raise ValueError("The cache and the profile need an output directory")
+    stem = dsl_stem(main_dsl)
+    log = DictionaryLogAdapter(logger, {"dictionary": stem})
+    log.info(f"Processing {main_dsl.name}...")
+    started = time.perf_counter()
+
+    dsl_parser = DslParser(str(main_dsl))
+    pos_rules = load_pos_rules(main_dsl)
+
+    # Read only the headers; parsing later resumes at the body offset
+    dsl_parser.read_headers()
+
+    dict_title = dsl_parser.headers.get("NAME", stem)
+    filename = stem
+    if "Langenscheidt" in dict_title or "langens" in filename.lower():
+        dict_title = "Langenscheidt De-De"
+    elif "duden" in filename.lower() and "big" in filename.lower():
+        dict_title = "Duden Big De-De"
+    elif "duden" in filename.lower() and "synonym" in filename.lower():
+        dict_title = "Duden Synonym De-De"
+    elif "duden" in filename.lower() and "etym" in filename.lower():
+        dict_title = "Duden Etym De-De"
+
+    # Skip media for Langens - TIFF images don't work in Yomitan
+    skip_media = "Langens" in dict_title or "langens" in str(input_path).lower()
+    media_index = (
+        None if skip_media else MediaIndex(input_path, media_bundles(main_dsl))
+    )
+    resolve_media = media_index.resolve if media_index else None
+    converter = DslConverter(
+        abbreviations, pos_rules=pos_rules, resolve_media=resolve_media, compact=compact
+    )
+
+    packer_name = f"{stem}-subset" if selection else stem
+    profiler: Profiler | NullProfiler = NULL_PROFILER
+    if profile:
+        profiler = Profiler(stem, dsl_parser.size(), cprofile_convert)
+        profiler.start()
+        if jobs > 1:
+            log.warning("--profile measures the serial pipeline, ignoring --jobs.")
+            jobs = 1
+    packer: YomitanPacker | None = None
+    try:
+        encoder = get_encoder(json_encoder)
+        packer = YomitanPacker(
+            output_dir,
+            packer_name,
+            streaming=True,
+            profiler=profiler,
+            encoder=encoder,
+            compression_level=compression_level,
+            sink=sink,
+            media_sizes=media_index.sizes if media_index else None,
+            **(limits or {}),
+        )
+
+        cache_path = (
+            Path(output_dir) / ".cache" / f"{stem}.sqlite" if use_cache else None
+        )
+        cache = None
+        if cache_path:
+            cache = ConversionCache(
+                cache_path,
+                abbreviations,
+                cache_max_entries,
+                converter.pos_rules,
+                encoder.name,
+                resolve_media,
+                compact,
+            )
+        hits = misses = 0
+        lemmas: Lemmas | None = {} if forms else None
+        sorter = (
+            EntrySorter(encoder, temp_dir=output_dir, **sort)
+            if sort is not None
+            else None
+        )
+        writer: YomitanPacker | EntrySorter = sorter or packer
+
+        try:
+            sequence = 1
+            if selection:
+                index = dsl_parser.load_index()
+                positions = select_entries(index, selection, converter)
+                spans = [(index[i][1], index[i][2]) for i in positions]
+                for position, entry in zip(positions, dsl_parser.parse_spans(spans)):
+                    # Keep the sequence number the entry has in a full conversion
+                    writer.add_encoded_variants(
+                        *encode_entry(
+                            converter, entry, cache, profiler, encoder, lemmas
+                        ),
+                        position + 1,
+                    )
+                    profiler.entry_done(index[position][1])
+                log.info(f"Selected {len(positions)} of {len(index)} entries.")
+            elif jobs > 1:
+                shards = dsl_parser.shard_offsets(jobs * SHARDS_PER_JOB)
+                starts = [start for start, _ in shards]
+                ends = [end for _, end in shards]
+                media = (
+                    (str(media_index.directory), list(map(str, media_index.bundles)))
+                    if media_index
+                    else None
+                )
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    # map() yields shard results in file order, keeping sequence numbers stable
+                    results = pool.map(
+                        convert_shard,
+                        repeat(str(main_dsl)),
+                        starts,
+                        ends,
+                        repeat(abbreviations),
+                        repeat(str(cache_path) if cache_path else None),
+                        repeat(pos_rules),
+                        repeat(encoder.name),
+                        repeat(media),
+                        repeat(forms),
+                        repeat(compact),
+                    )
+                    for result in results:
+                        for prefixes, glossary_json in result["entries"]:
+                            writer.add_encoded_variants(
+                                prefixes, glossary_json, sequence
+                            )
+                            sequence += 1
+                        converter.media_files |= result["media_files"]
+                        if media_index:
+                            media_index.merged |= result["media_merged"]
+                        if lemmas is not None:
+                            for term, rules in result["lemmas"].items():
+                                lemmas.setdefault(term, set()).update(rules)
+                        hits += result["cache_hits"]
+                        misses += result["cache_misses"]
+                        # Fold the worker counters into the main converter for reporting
+                        converter.line_cache_hits += result["line_cache_hits"]
+                        converter.line_cache_misses += result["line_cache_misses"]
+                        converter.compact_saved += result["compact_saved"]
+            else:
+                entries = dsl_parser.parse()
+                while True:
+                    with profiler.stage("parse"):
+                        entry = next(entries, None)
+                    if entry is None:
+                        break
+                    writer.add_encoded_variants(
+                        *encode_entry(
+                            converter, entry, cache, profiler, encoder, lemmas
+                        ),
+                        sequence,
+                    )
+                    sequence += 1
+                    profiler.entry_done(dsl_parser.position)
+
+            if sorter:
+                with profiler.stage("sort"):
+                    sorter.write_to(packer)
+                merged = (
+                    f", {sorter.merged} duplicates merged"
+                    if sorter.duplicates == "merge"
+                    else ""
+                )
+                log.info(
+                    f"Sorted {sorter.rows} terms in {sorter.run_count} runs{merged}."
+                )
+
+            line_cache = converter.line_cache_info()
+            log.info(
+                f"Line cache: {line_cache['hit_rate']:.1%} hit rate "
+                f"({line_cache['hits']} hits, {line_cache['misses']} misses)."
+            )
+
+            if cache:
+                hits += cache.hits
+                misses += cache.misses
+                cache.evict()
+                log.info(f"Cache: {hits} hits, {misses} misses.")
+        finally:
+            if cache:
+                cache.close()
+
+        if media_index:
+            with profiler.stage("media"):
+                found, missing, unused = media_index.split(converter.media_files)
+                for media_filename in found:
+                    packer.add_media_file(
+                        media_index.source(media_filename), media_filename
+                    )
+            log.info(
+                f"Media: {len(found)} files, {len(missing)} missing, {len(unused)} unused, "
+                f"{media_index.duplicates} duplicates merged."
+            )
+            if missing:
+                more = f" and {len(missing) - 5} more" if len(missing) > 5 else ""
+                log.warning(f"Missing media: {', '.join(missing[:5])}{more}")
+
+        metadata = {
+            "title": dict_title,
+            "format": 3,
+            "author": "DSL to Yomitan Converter",
+            "sourceLanguage": "de",
+            "targetLanguage": "de",  # Default to German-German
+            "description": f"Converted from {main_dsl.name}",
+            "revision": datetime.now().strftime("%Y.%m.%d.%H%M%S"),
+        }
+
+        # Check if it's De-Ru
+        if "De-Ru" in dict_title or "DeRu" in main_dsl.name:
+            metadata["targetLanguage"] = "ru"
+        elif "Ru-De" in dict_title or "RuDe" in main_dsl.name:
+            metadata["sourceLanguage"] = "ru"
+            metadata["targetLanguage"] = "de"
+
+        if selection:
+            # Distinct title so a subset can be imported next to the full dictionary
+            metadata["title"] += " (subset)"
+
+        # Packer automatically includes data/styles.css
+        packer.pack(metadata)
+        for member in packer.members:
+            log.debug(
+                f"{member['name']}: {member['size']} -> {member['compressed_size']} bytes "
+                f"in {member['seconds']:.3f} s"
+            )
+        total = packer.compression_summary()
+        ratio = total["compressed_size"] / total["size"] if total["size"] else 1.0
+        log.info(
+            f"Compressed {len(packer.members)} members: {total['size'] / 1_048_576:.1f} MiB -> "
+            f"{total['compressed_size'] / 1_048_576:.1f} MiB ({ratio:.1%}) in {total['seconds']:.2f} s."
+        )
+        if compact:
+            bank_size = sum(
+                m["size"] for m in packer.members if m["name"].startswith("term_bank_")
+            )
+            before = bank_size + converter.compact_saved
+            log.info(
+                f"Compact content: {converter.compact_saved / 1_048_576:.1f} MiB saved "
+                f"({converter.compact_saved / before if before else 0.0:.1%} of the term banks)."
+            )
+        created = ", ".join(map(str, packer.volume_paths))
+        if len(packer.volume_paths) > 1:
+            created = f"{len(packer.volume_paths)} volumes, {created},"
+        log.info(f"Successfully created {created} with {packer.entry_count} entries.")
+        if lemmas is not None:
+            forms_path, form_count = build_forms_dictionary(
+                lemmas,
+                output_dir,
+                packer_name,
+                metadata["title"],
+                jobs,
+                encoder,
+                compression_level,
+                sink,
+            )
+            log.info(
+                f"Created {forms_path} with {form_count} forms of {len(lemmas)} headwords."
+            )
+        if profiler.enabled:
+            log.info(f"Profile written to {profiler.finish(Path(output_dir))}")
+        return {
+            "name": main_dsl.name,
+            "entries": packer.entry_count,
+            "seconds": time.perf_counter() - started,
+            "output_size": packer.output_size,
+        }
+    finally:
+        # Stops tracemalloc after a failure too, pool workers are reused for later dictionaries
+        profiler.stop()
+        # After a failure, closes the partial archive and the compression threads, main.py goes on
+        if packer is not None:
+            packer.close()
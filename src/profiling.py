@@ -0,0 +1,168 @@
+import cProfile
+import heapq
+import json
+import logging
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress log lines
+PROGRESS_INTERVAL = 10.0
+
+# Number of slowest entries kept in the report
+SLOWEST_ENTRIES = 20
+
+
+class NullProfiler:
+    """Profiler stand-in used when --profile is off; every hook is a no-op."""
+
+    enabled = False
+
+    def stage(self, name: str, item: str | None = None):
+        return nullcontext()
+
+    def entry_done(self, offset: int) -> None:
+        pass
+
+    def member_done(
+        self, name: str, size: int, compressed_size: int, seconds: float
+    ) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """
+    Collects wall and CPU time per pipeline stage, throughput, peak memory
+    and the slowest entries of one dictionary conversion.
+    """
+
+    enabled = True
+
+    def __init__(self, name: str, total_bytes: int = 0, cprofile_convert: bool = False):
+        self.name = name
+        self.total_bytes = total_bytes
+        self.entries = 0
+        self.stages: dict[str, dict[str, float]] = {}
+        self._slowest: list[tuple[float, str]] = []
+        self.members: list[dict[str, Any]] = []
+        self._cprofile = cProfile.Profile() if cprofile_convert else None
+        self._started_wall = 0.0
+        self._started_cpu = 0.0
+        self._last_progress = 0.0
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self._started_wall = self._last_progress = time.perf_counter()
+        self._started_cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, item: str | None = None) -> Iterator[None]:
+        """Times the block under `name`; with an item, it also competes for the slowest list."""
+        profile = self._cprofile if name == "convert" else None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            elapsed = time.perf_counter() - wall
+            totals = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            totals["wall"] += elapsed
+            totals["cpu"] += time.process_time() - cpu
+            totals["calls"] += 1
+            if item is not None:
+                if len(self._slowest) < SLOWEST_ENTRIES:
+                    heapq.heappush(self._slowest, (elapsed, item))
+                elif elapsed > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, (elapsed, item))
+
+    def entry_done(self, offset: int) -> None:
+        """
+        Counts a finished entry and, at most every PROGRESS_INTERVAL, logs
+        progress and ETA from the parser's byte offset.
+        """
+        self.entries += 1
+        now = time.perf_counter()
+        if now - self._last_progress < PROGRESS_INTERVAL or not self.total_bytes:
+            return
+        self._last_progress = now
+        elapsed = now - self._started_wall
+        done = min(offset / self.total_bytes, 1.0)
+        eta = elapsed * (1 - done) / done if done else 0.0
+        logger.info(
+            f"[{self.name}] {done:.1%} of {self.total_bytes / 1_048_576:.0f} MiB, "
+            f"{self.entries / elapsed:.0f} entries/s, ETA {eta:.0f} s"
+        )
+
+    def member_done(
+        self, name: str, size: int, compressed_size: int, seconds: float
+    ) -> None:
+        """Records the size before and after compression and the compression time of a ZIP member."""
+        self.members.append(
+            {
+                "name": name,
+                "size": size,
+                "compressed_size": compressed_size,
+                "ratio": round(compressed_size / size, 4) if size else 1.0,
+                "seconds": round(seconds, 4),
+            }
+        )
+
+    def report(self) -> dict[str, Any]:
+        wall = time.perf_counter() - self._started_wall
+        _, peak = (
+            tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        )
+        return {
+            "dictionary": self.name,
+            "entries": self.entries,
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(time.process_time() - self._started_cpu, 3),
+            "entries_per_sec": round(self.entries / wall, 1) if wall else 0.0,
+            "input_bytes": self.total_bytes,
+            "peak_memory_mb": round(peak / 1_048_576, 2),
+            "stages": {
+                name: {
+                    "wall": round(t["wall"], 3),
+                    "cpu": round(t["cpu"], 3),
+                    "calls": int(t["calls"]),
+                }
+                for name, t in self.stages.items()
+            },
+            "slowest_entries": [
+                {"headword": headword, "seconds": round(seconds, 6)}
+                for seconds, headword in sorted(self._slowest, reverse=True)
+            ],
+            "zip_members": self.members,
+        }
+
+    def stop(self) -> None:
+        """Stops tracing; safe to call again after finish()."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def finish(self, output_dir: Path) -> Path:
+        """Stops tracing and writes <name>.profile.json (and <name>.convert.prof) to output_dir."""
+        report = self.report()
+        self.stop()
+        report_path = output_dir / f"{self.name}.profile.json"
+        report_path.write_text(
+            json.dumps(report, ensure_ascii=False, indent=4), encoding="utf-8"
+        )
+        if self._cprofile:
+            self._cprofile.dump_stats(output_dir / f"{self.name}.convert.prof")
+        return report_path
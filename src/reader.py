@@ -0,0 +1,142 @@
+"""
+Encoding detection and block-buffered line reading for DSL files.
+
+Lingvo DSL is usually UTF-16LE with a BOM, but UTF-16BE, UTF-8 and legacy
+code page files exist too. The encoding comes from the BOM when there is
+one and is sniffed from the first bytes otherwise. Text is decoded in large
+blocks and split into lines with str methods, which is much cheaper than
+iterating a TextIOWrapper line by line.
+"""
+
+import codecs
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+from src.dictzip import open_binary
+
+logger = logging.getLogger(__name__)
+
+# Bytes decoded at a time
+BLOCK_SIZE = 1 << 22
+
+# Bytes looked at when there is no BOM
+SNIFF_SIZE = 1 << 16
+
+# Used when neither the BOM, the sniff nor chardet settle the encoding
+FALLBACK_ENCODING = "cp1252"
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """
+    Guesses the encoding of BOM-less text. UTF-16 shows up as NUL bytes in
+    every other position, valid UTF-8 decodes cleanly; anything else is left
+    to chardet when it is installed.
+    """
+    if not sample:
+        return "utf-8"
+    odd_zeros = sample[1::2].count(0)
+    even_zeros = sample[0::2].count(0)
+    half = len(sample) // 2 or 1
+    if odd_zeros > half // 4 and odd_zeros > 2 * even_zeros:
+        return "utf-16-le"
+    if even_zeros > half // 4 and even_zeros > 2 * odd_zeros:
+        return "utf-16-be"
+    try:
+        # A multi-byte sequence may be cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        import chardet
+    except ImportError:
+        return FALLBACK_ENCODING
+    guess = chardet.detect(sample)
+    if guess.get("encoding") and (guess.get("confidence") or 0) >= 0.5:
+        return codecs.lookup(guess["encoding"]).name
+    return FALLBACK_ENCODING
+
+
+def detect_encoding(path: str | Path) -> tuple[str, int]:
+    """Returns the codec of a DSL file and the length of its BOM (0 without one)."""
+    with open_binary(path) as f:
+        head = f.read(SNIFF_SIZE)
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    encoding = sniff_encoding(head)
+    logger.debug(f"{path} has no BOM, sniffed {encoding}")
+    return encoding, 0
+
+
+# Characters str.splitlines() breaks on that universal newlines do not
+_EXTRA_LINE_BREAKS = "\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def split_lines(text: str) -> list[str]:
+    """
+    Splits on \\n, \\r\\n and \\r like universal newlines, without the line
+    endings. A trailing line break leaves an empty string at the end.
+    """
+    if any(c in text for c in _EXTRA_LINE_BREAKS):
+        return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    # One pass instead of replace + split, about twice as fast on large blocks
+    lines = text.splitlines()
+    if not text or text[-1] in "\r\n":
+        lines.append("")
+    return lines
+
+
+def iter_line_blocks(
+    f: BinaryIO,
+    encoding: str,
+    start: int = 0,
+    end: int | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> Iterator[list[str]]:
+    """
+    Decodes the bytes in [start, end) block by block and yields the
+    complete lines of each block. A line cut by the block boundary is
+    carried over into the next block.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    f.seek(start)
+    remaining = end - start if end is not None else None
+    carry = ""
+    while True:
+        size = block_size if remaining is None else min(block_size, remaining)
+        block = f.read(size) if size else b""
+        if remaining is not None:
+            remaining -= len(block)
+        text = carry + decoder.decode(block, final=not block)
+        if not block:
+            if text:
+                lines = split_lines(text)
+                # A trailing newline leaves an empty string behind, not a line
+                yield lines[:-1] if not lines[-1] else lines
+            return
+        # A \r at the very end may be the first half of \r\n, keep it for the next block
+        cut = max(text.rfind("\n"), text.rfind("\r", 0, len(text) - 1))
+        if cut == -1:
+            carry = text
+            continue
+        carry = text[cut + 1 :]
+        lines = split_lines(text[: cut + 1])
+        lines.pop()
+        yield lines
+
+
+def read_lines(path: str | Path) -> Iterator[str]:
+    """Yields the lines of a (possibly dictzip-compressed) DSL file in whatever encoding it uses."""
+    encoding, bom_len = detect_encoding(path)
+    with open_binary(path) as f:
+        for lines in iter_line_blocks(f, encoding, bom_len):
+            yield from lines
@@ -0,0 +1,94 @@
+"""
+Local HTTP endpoint for looking up headwords in lookup indexes.
+
+    GET /lookup?q=Haus                   entries of the term, ignoring case as a fallback
+    GET /lookup?q=Hau&mode=prefix&limit=20
+    GET /dictionaries
+
+Responses are JSON; each result carries the dictionary title and the term
+bank entry exactly as it is stored in the dictionary.
+"""
+
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.lookup import LookupIndex
+
+DEFAULT_LIMIT = 20
+
+logger = logging.getLogger(__name__)
+
+
+class LookupServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], indexes: list[LookupIndex]):
+        super().__init__(address, LookupHandler)
+        self.indexes = indexes
+        # Titles are serialized once; results splice them around the stored entries
+        self.titles = [
+            json.dumps(index.title, ensure_ascii=False).encode("utf-8")
+            for index in indexes
+        ]
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests, and send the headers and the
+    # body without waiting for the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: LookupServer
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/lookup":
+            self._lookup(params)
+        elif url.path == "/dictionaries":
+            body = [
+                {"title": index.title, "entries": index.entries}
+                for index in self.server.indexes
+            ]
+            self._send(200, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _lookup(self, params: dict[str, list[str]]) -> None:
+        query = params.get("q", [""])[0]
+        mode = params.get("mode", ["exact"])[0]
+        try:
+            limit = int(params.get("limit", [DEFAULT_LIMIT])[0])
+        except ValueError:
+            self._send(400, b'{"error": "limit must be a number"}')
+            return
+        if mode not in ("exact", "prefix") or not query:
+            self._send(400, b'{"error": "expected q and mode=exact or mode=prefix"}')
+            return
+
+        results = []
+        for index, title in zip(self.server.indexes, self.server.titles):
+            entries = (
+                index.exact(query) if mode == "exact" else index.prefix(query, limit)
+            )
+            results.extend(
+                b'{"dictionary": ' + title + b', "entry": ' + entry + b"}"
+                for entry in entries
+            )
+        if mode == "prefix":
+            results = results[:limit]
+        head = json.dumps({"query": query, "mode": mode}, ensure_ascii=False).encode(
+            "utf-8"
+        )
+        self._send(200, head[:-1] + b', "results": [' + b", ".join(results) + b"]}")
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
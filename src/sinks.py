@@ -0,0 +1,114 @@
+"""
+Destinations for the archives YomitanPacker writes.
+
+The packer builds every archive in a seekable file it gets from a sink's
+open() and hands the finished file back to commit() under the archive's
+final name, <name>.zip or <name>-<volume>.zip, or to discard() when the
+conversion fails. The sink decides where the
+dictionary ends up: a ZIP on disk, an unpacked directory, bytes in memory or
+a callback that receives the members one by one.
+"""
+
+import io
+import shutil
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from pathlib import Path
+from typing import BinaryIO
+
+
+class OutputSink(ABC):
+    # zlib level the packer uses when it is not given one; sinks that unpack
+    # the archive ask for 0, since deflating would be undone right away
+    compression_level: int | None = None
+
+    @abstractmethod
+    def open(self, name: str) -> BinaryIO:
+        """A new seekable file for an archive; `name` is only unique, not final."""
+
+    @abstractmethod
+    def commit(self, fileobj: BinaryIO, name: str) -> Path | str:
+        """Takes a complete archive under its final name; returns where it went."""
+
+    def discard(self, fileobj: BinaryIO) -> None:
+        """Drops an archive that was opened but will never be committed."""
+        fileobj.close()
+
+
+class ZipSink(OutputSink):
+    """Writes <output_dir>/<name>.zip, renaming a side file so no truncated ZIP is ever left behind."""
+
+    def __init__(self, output_dir: str | Path):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def open(self, name: str) -> BinaryIO:
+        return open(self.output_dir / name, "w+b")
+
+    def commit(self, fileobj: BinaryIO, name: str) -> Path:
+        fileobj.close()
+        path = self.output_dir / name
+        Path(fileobj.name).replace(path)
+        return path
+
+    def discard(self, fileobj: BinaryIO) -> None:
+        fileobj.close()
+        Path(fileobj.name).unlink(missing_ok=True)
+
+
+class DirectorySink(OutputSink):
+    """Unpacks every archive into <output_dir>/<name without .zip>/, replacing an older copy."""
+
+    compression_level = 0
+
+    def __init__(self, output_dir: str | Path):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def open(self, name: str) -> BinaryIO:
+        return tempfile.TemporaryFile(dir=self.output_dir)
+
+    def commit(self, fileobj: BinaryIO, name: str) -> Path:
+        path = self.output_dir / name.removesuffix(".zip")
+        partial = path.with_name(f"{path.name}.part")
+        shutil.rmtree(partial, ignore_errors=True)
+        with fileobj, zipfile.ZipFile(fileobj) as zipf:
+            zipf.extractall(partial)
+        shutil.rmtree(path, ignore_errors=True)
+        partial.replace(path)
+        return path
+
+
+class BytesSink(OutputSink):
+    """Keeps every archive in memory: archives maps its name to the ZIP bytes."""
+
+    def __init__(self):
+        self.archives: dict[str, bytes] = {}
+
+    def open(self, name: str) -> BinaryIO:
+        return io.BytesIO()
+
+    def commit(self, fileobj: BinaryIO, name: str) -> str:
+        self.archives[name] = fileobj.getvalue()
+        fileobj.close()
+        return name
+
+
+class CallbackSink(OutputSink):
+    """Calls callback(archive name, member name, data) for every member of every archive."""
+
+    compression_level = 0
+
+    def __init__(self, callback: Callable[[str, str, bytes], None]):
+        self.callback = callback
+
+    def open(self, name: str) -> BinaryIO:
+        return tempfile.TemporaryFile()
+
+    def commit(self, fileobj: BinaryIO, name: str) -> str:
+        with fileobj, zipfile.ZipFile(fileobj) as zipf:
+            for info in zipf.infolist():
+                self.callback(name, info.filename, zipf.read(info))
+        return name
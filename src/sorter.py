@@ -0,0 +1,155 @@
+"""
+Optional stage between conversion and the packer that orders term rows by
+headword and handles repeated headwords.
+
+Rows are buffered up to a fixed number of bytes, sorted and written to a
+run file; once all entries are in, the runs are merged and streamed into
+the packer. Memory therefore stays at one run however large the dictionary
+is. Rows are ordered by case-folded term, then term, then the sequence
+number they would have in a plain conversion, so the result does not depend
+on the run size or on --jobs.
+"""
+
+import heapq
+import json
+import struct
+import tempfile
+from collections.abc import Iterator
+from itertools import groupby
+from pathlib import Path
+from typing import BinaryIO
+
+from src.encoders import DEFAULT_ENCODER, JsonEncoder
+
+# Serialized rows held in memory before a sorted run is written
+DEFAULT_RUN_BYTES = 64 << 20
+
+# keep: only sort. group: rows of one term share the lowest sequence number,
+# so Yomitan shows them as one result. merge: like group, and rows that also
+# have the same rules become one row with the glossaries of all of them.
+DUPLICATE_MODES = ("keep", "group", "merge")
+
+# term length, prefix length, glossary length, sequence
+_RECORD = struct.Struct("<IIIQ")
+
+# (term, term prefix, glossary JSON, sequence)
+Row = tuple[str, bytes, bytes, int]
+
+
+def _sort_key(row: Row) -> tuple[str, str, int]:
+    return row[0].casefold(), row[0], row[3]
+
+
+def _write_run(path: Path, rows: list[Row]) -> None:
+    rows.sort(key=_sort_key)
+    with open(path, "wb") as f:
+        for term, prefix, glossary_json, sequence in rows:
+            encoded_term = term.encode("utf-8")
+            f.write(
+                _RECORD.pack(
+                    len(encoded_term), len(prefix), len(glossary_json), sequence
+                )
+            )
+            f.write(encoded_term)
+            f.write(prefix)
+            f.write(glossary_json)
+
+
+def _read_run(f: BinaryIO) -> Iterator[Row]:
+    while header := f.read(_RECORD.size):
+        term_size, prefix_size, glossary_size, sequence = _RECORD.unpack(header)
+        term = f.read(term_size).decode("utf-8")
+        yield term, f.read(prefix_size), f.read(glossary_size), sequence
+
+
+class EntrySorter:
+    """Takes entries like YomitanPacker.add_encoded_variants() and writes them to a packer in headword order."""
+
+    def __init__(
+        self,
+        encoder: JsonEncoder = DEFAULT_ENCODER,
+        duplicates: str = "keep",
+        run_bytes: int = DEFAULT_RUN_BYTES,
+        temp_dir: str | Path | None = None,
+    ):
+        if duplicates not in DUPLICATE_MODES:
+            raise ValueError(f"Unknown duplicate mode: {duplicates}")
+        self.encoder = encoder
+        self.duplicates = duplicates
+        self.run_bytes = run_bytes
+        self._temp = tempfile.TemporaryDirectory(prefix=".sort-", dir=temp_dir)
+        self._runs: list[Path] = []
+        self._rows: list[Row] = []
+        self._buffered = 0
+        self.rows = 0
+        self.merged = 0
+
+    @property
+    def run_count(self) -> int:
+        return len(self._runs)
+
+    def add_encoded_variants(
+        self, prefixes: list[bytes], glossary_json: bytes, sequence: int
+    ) -> None:
+        separator = len(self.encoder.separator)
+        for prefix in prefixes:
+            # The prefix is `[term, reading, "", rules, 0, `; close it to read the term back
+            term = json.loads(prefix[:-separator] + b"]")[0]
+            self._rows.append((term, prefix, glossary_json, sequence))
+            self._buffered += len(term) + len(prefix) + len(glossary_json)
+            self.rows += 1
+            if self._buffered >= self.run_bytes:
+                self._flush_run()
+
+    def _flush_run(self) -> None:
+        path = Path(self._temp.name) / f"run-{len(self._runs)}.bin"
+        _write_run(path, self._rows)
+        self._runs.append(path)
+        self._rows = []
+        self._buffered = 0
+
+    def write_to(self, packer) -> None:
+        """Merges the runs and adds the rows to the packer, then removes the run files."""
+        try:
+            if self._rows:
+                self._flush_run()
+            files = [open(path, "rb") for path in self._runs]
+            try:
+                merged = heapq.merge(*(_read_run(f) for f in files), key=_sort_key)
+                for term, rows in groupby(merged, key=lambda row: row[0]):
+                    self._write_term(packer, list(rows))
+            finally:
+                for f in files:
+                    f.close()
+        finally:
+            self._temp.cleanup()
+
+    def _write_term(self, packer, rows: list[Row]) -> None:
+        """Adds the rows of one term, which come in sequence order."""
+        if self.duplicates == "keep":
+            for _, prefix, glossary_json, sequence in rows:
+                packer.add_encoded_variants([prefix], glossary_json, sequence)
+            return
+
+        sequence = rows[0][3]
+        if self.duplicates == "group":
+            for _, prefix, glossary_json, _ in rows:
+                packer.add_encoded_variants([prefix], glossary_json, sequence)
+            return
+
+        # Same prefix means same term and rules; identical glossaries are kept once
+        glossaries: dict[bytes, list[bytes]] = {}
+        for _, prefix, glossary_json, _ in rows:
+            parts = glossaries.setdefault(prefix, [])
+            if glossary_json not in parts:
+                parts.append(glossary_json)
+        self.merged += len(rows) - len(glossaries)
+        separator = self.encoder.separator
+        for prefix, parts in glossaries.items():
+            # Glossaries are JSON lists, so their items are spliced into one list
+            glossary_json = (
+                b"["
+                + separator.join(part[1:-1] for part in parts if len(part) > 2)
+                + b"]"
+            )
+            packer.add_encoded_variants([prefix], glossary_json, sequence)
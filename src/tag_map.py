@@ -12,6 +12,9 @@ TAG_PATTERNS = {
     "com": (re.compile(r"\[com\](.*?)\[/com\]", re.DOTALL), r'<span class="comment">\1</span>'),
 }
 
+# Color of a [c] tag without a value
+DEFAULT_COLOR = "darkcyan"
+
 # Complex tags that need special handling
 COLOR_PATTERN = re.compile(r"\[c\s*(?P<color>\w+)?\](?P<content>.*?)\[/c\]", re.DOTALL)
 MARGIN_PATTERN = re.compile(r"\[m(?P<level>\d)\](?P<content>.*?)\[/m\]", re.DOTALL)
@@ -20,6 +23,31 @@ LANG_PATTERN = re.compile(r"\[lang\s+id=(?P<id>\d+)\](?P<content>.*?)\[/lang\]",
 STRESS_PATTERN = re.compile(r"\['\](?P<vowel>.)\[/'\]")
 OPTIONAL_PATTERN = re.compile(r"\[\*\](?P<content>.*?)\[/\*\]", re.DOTALL)
 
+# Any opening or closing tag, with the value of an opening one
+TAG_PATTERN = re.compile(r"\[(?P<close>/)?(?P<tag>[\w\*\']+)(?:\s+(?P<val>.*?))?\]")
+# Stress tags around a headword vowel, ['] and [/'] on their own
+STRESS_TAGS = re.compile(r"\[/?\'\]")
+
 # Escaped brackets
 ESC_OPEN_BRACKET = re.compile(r"\\\[")
 ESC_CLOSE_BRACKET = re.compile(r"\\\]")
+
+# Part-of-speech abbreviations ([p]...[/p]) mapped to Yomitan deinflection rules.
+# Order matters: rules are reported in the order they first appear here.
+POS_RULES = {
+    # Nouns
+    "f": "n",
+    "m": "n",
+    "n": "n",
+    "nm": "n",
+    "nf": "n",
+    # Verbs
+    "v": "v",
+    "vt": "v",
+    "vi": "v",
+    "refl": "v",
+    # Adjectives
+    "adj": "adj",
+    # Adverbs
+    "adv": "adv",
+}
@@ -0,0 +1,110 @@
+import io
+import json
+import threading
+import zipfile
+
+import pytest
+
+from src.api import convert_dictionary
+from src.sinks import BytesSink, CallbackSink, DirectorySink, OutputSink
+
+DSL = (
+    '#NAME\t"Test"\n'
+    "\n"
+    "Haus\n"
+    "\t[m1][p]n[/p] Gebäude[/m]\n"
+    "\n"
+    "laufen\n"
+    "\t[m1][p]v[/p] sich bewegen[/m]\n"
+)
+
+
+def _write_dsl(tmp_path):
+    dsl_path = tmp_path / "input" / "Test.dsl"
+    dsl_path.parent.mkdir()
+    dsl_path.write_text(DSL, encoding="utf-16")
+    return dsl_path
+
+
+def test_sinks_receive_the_same_dictionary(tmp_path):
+    dsl_path = _write_dsl(tmp_path)
+    stats = convert_dictionary(dsl_path, output_dir=tmp_path / "zips")
+    assert stats["entries"] == 2
+    assert stats["output_size"] == (tmp_path / "zips" / "Test.zip").stat().st_size
+    with zipfile.ZipFile(tmp_path / "zips" / "Test.zip") as zipf:
+        bank = zipf.read("term_bank_1.json")
+    assert [entry[0] for entry in json.loads(bank)] == ["Haus", "laufen"]
+
+    sink = BytesSink()
+    stats = convert_dictionary(dsl_path, sink)
+    assert stats["output_size"] == len(sink.archives["Test.zip"])
+    with zipfile.ZipFile(io.BytesIO(sink.archives["Test.zip"])) as zipf:
+        assert zipf.read("term_bank_1.json") == bank
+
+    convert_dictionary(dsl_path, DirectorySink(tmp_path / "unpacked"))
+    assert (tmp_path / "unpacked" / "Test" / "term_bank_1.json").read_bytes() == bank
+    assert [path.name for path in (tmp_path / "unpacked").iterdir()] == ["Test"]
+
+    with pytest.raises(ValueError):
+        convert_dictionary(dsl_path)
+
+    class OpenOnlySink(OutputSink):
+        def open(self, name):
+            return io.BytesIO()
+
+    # A sink without commit() is rejected before any archive is written
+    with pytest.raises(TypeError):
+        OpenOnlySink()
+
+
+def test_callback_sink_gets_every_member_of_every_archive(tmp_path):
+    members: dict[tuple[str, str], bytes] = {}
+    convert_dictionary(
+        _write_dsl(tmp_path),
+        CallbackSink(
+            lambda archive, name, data: members.setdefault((archive, name), data)
+        ),
+        forms=True,
+    )
+    assert {archive for archive, _ in members} == {"Test.zip", "Test-forms.zip"}
+    assert json.loads(members["Test.zip", "index.json"])["title"] == "Test"
+    forms = json.loads(members["Test-forms.zip", "term_bank_1.json"])
+    assert ["Häuser", "", "", "", 0, [["Haus", ["plural"]]]] in [
+        entry[:6] for entry in forms
+    ]
+
+
+def test_failed_conversion_leaves_no_partial_archive(tmp_path, monkeypatch):
+    from src import pipeline
+
+    encode_entry = pipeline.encode_entry
+    calls = []
+
+    def fail_on_fifth_entry(*args):
+        calls.append(args)
+        if len(calls) == 5:
+            raise ValueError("broken entry")
+        return encode_entry(*args)
+
+    monkeypatch.setattr(pipeline, "encode_entry", fail_on_fifth_entry)
+    # One entry per bank and one compression thread, which keeps two banks
+    # in flight: the archive is open and a bank pending when the fifth fails
+    monkeypatch.setattr("src.packer.os.cpu_count", lambda: 1)
+    dsl_path = _write_dsl(tmp_path)
+    dsl_path.write_text(
+        DSL + "".join(f"\nWort{i}\n\t[m1]Definition[/m]\n" for i in range(4)),
+        encoding="utf-16",
+    )
+    limits = {
+        "max_bank_bytes": None,
+        "max_entries_per_bank": 1,
+        "max_archive_bytes": None,
+    }
+    with pytest.raises(ValueError):
+        convert_dictionary(dsl_path, output_dir=tmp_path / "zips", limits=limits)
+    assert list((tmp_path / "zips").iterdir()) == []
+    assert not [
+        thread
+        for thread in threading.enumerate()
+        if thread.name.startswith("ThreadPoolExecutor")
+    ]
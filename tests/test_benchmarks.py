@@ -0,0 +1,34 @@
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import find_regressions
+from src.parser import DslParser
+
+
+def test_generated_corpus_parses(tmp_path):
+    dsl_path = generate_corpus(tmp_path / "synthetic.dsl", 50, seed=1)
+    entries = list(DslParser(str(dsl_path)).parse())
+    assert len(entries) == 50
+    assert all(entry["body"] for entry in entries)
+    assert (tmp_path / "synthetic_abrv.dsl").exists()
+    # Same seed, same corpus
+    assert (
+        generate_corpus(tmp_path / "again.dsl", 50, seed=1).read_bytes()
+        == dsl_path.read_bytes()
+    )
+
+
+def test_find_regressions():
+    baseline = {"10k": {"convert": {"entries_per_sec": 1000.0, "peak_mb": 100.0}}}
+    assert (
+        find_regressions(
+            {"10k": {"convert": {"entries_per_sec": 900.0, "peak_mb": 110.0}}},
+            baseline,
+            0.2,
+        )
+        == []
+    )
+    regressions = find_regressions(
+        {"10k": {"convert": {"entries_per_sec": 700.0, "peak_mb": 130.0}}},
+        baseline,
+        0.2,
+    )
+    assert len(regressions) == 2
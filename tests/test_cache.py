@@ -0,0 +1,35 @@
+from src.cache import ConversionCache
+
+
+def test_cache_roundtrip_and_context(tmp_path):
+    path = tmp_path / "dict.sqlite"
+    cache = ConversionCache(path, {"m": "Maskulinum"})
+    key = cache.key(["[m1][p]m[/p][/m]"])
+    assert cache.get(key) is None
+    cache.put(
+        key, b'[{"type": "structured-content", "content": "x"}]', ["n"], ["a.wav"]
+    )
+    cache.close()
+
+    cache = ConversionCache(path, {"m": "Maskulinum"})
+    assert cache.get(key) == (
+        b'[{"type": "structured-content", "content": "x"}]',
+        ["n"],
+        ["a.wav"],
+    )
+    assert (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+    # A different abbreviation table must not reuse the old conversion
+    cache = ConversionCache(path, {"m": "männlich"})
+    assert cache.get(cache.key(["[m1][p]m[/p][/m]"])) is None
+    cache.close()
+
+
+def test_cache_evicts_above_cap(tmp_path):
+    cache = ConversionCache(tmp_path / "dict.sqlite", {}, max_entries=3)
+    for i in range(5):
+        cache.put(cache.key([f"line {i}"]), b"[]", [], [])
+    assert cache.evict() == 2
+    assert cache.evict() == 0
+    cache.close()
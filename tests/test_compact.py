@@ -0,0 +1,68 @@
+import json
+
+from src.compact import compact_content
+from src.converter import DslConverter
+
+
+def test_compact_content_keeps_styled_nodes():
+    colored = {
+        "tag": "span",
+        "content": "x",
+        "data": {"content": "color", "value": "darkcyan", "class": "colored"},
+    }
+    tree = [
+        {"tag": "span", "content": "a"},
+        " b ",
+        colored,
+        {"tag": "span", "content": ""},
+        {"tag": "span", "content": ["c", {"tag": "span", "content": "d"}]},
+    ]
+    assert compact_content(tree) == [
+        "a b ",
+        {"tag": "span", "content": "x", "data": {"content": "color"}},
+        "cd",
+    ]
+
+    # A bare div is folded into a parent div, but not into a sense-group,
+    # whose children are styled with a child combinator
+    sense = {"tag": "div", "content": "s", "data": {"content": "sense"}}
+    assert compact_content(
+        {
+            "tag": "div",
+            "content": {"tag": "div", "content": sense},
+            "data": {"content": "sense"},
+        }
+    ) == {
+        "tag": "div",
+        "content": sense,
+        "data": {"content": "sense"},
+    }
+    group = {
+        "tag": "div",
+        "content": {"tag": "div", "content": [sense, sense]},
+        "data": {"content": "sense-group"},
+    }
+    assert compact_content(json.loads(json.dumps(group))) == group
+
+
+def test_converter_counts_compact_savings():
+    lines = [
+        "[lang id=1]a[/lang] b [c]x[/c] [s]p.png[/s][c red]y[/c]",
+        "[t]abc[/t]",
+        "[t]abc[/t]",
+    ]
+    plain = DslConverter().convert_to_structured_content(lines)
+    converter = DslConverter(compact=True)
+    compact = converter.convert_to_structured_content(lines)
+
+    assert compact[0]["content"][1] == {
+        "tag": "div",
+        "content": "abc",
+        "data": {"content": "sense"},
+    }
+    # Savings are counted for cached lines as well
+    saved = len(json.dumps(plain, ensure_ascii=False)) - len(
+        json.dumps(compact, ensure_ascii=False)
+    )
+    assert converter.compact_saved == saved
+    assert converter.line_cache_hits == 1
@@ -47,3 +47,58 @@ def test_malformed_nesting():
     # The first span should be 'f' wrapped in p, i, c - now uses div due to nesting
     assert result[0]["tag"] in ("span", "div")
     assert "abbreviation" in str(result[0])
+
+
+def test_line_cache_returns_private_copies():
+    converter = DslConverter()
+    first = converter.convert_to_structured_content(["[m1][p]m[/p] [s]wort.wav[/s][/m]"])
+    converter.media_files = set()
+    second = converter.convert_to_structured_content(["[m1][p]m[/p] [s]wort.wav[/s][/m]"])
+
+    assert first == second
+    # Mutating one result must not change the cached tree
+    second[0]["content"][0]["content"] = "changed"
+    assert converter.convert_to_structured_content(["[m1][p]m[/p] [s]wort.wav[/s][/m]"]) == first
+    # Media of a cached line are still reported
+    assert converter.media_files == {"wort.wav"}
+    info = converter.line_cache_info()
+    assert (info["hits"], info["misses"]) == (2, 1)
+
+
+def test_overlapping_and_unmatched_tags():
+    converter = DslConverter(line_cache_size=0)
+    # [/b] closes the [i] opened after it, the stray [/u] is ignored
+    assert converter._text_to_structured_content("[b]a[i]b[/b]c[/u]") == [
+        {
+            "tag": "span",
+            "content": ["a", {"tag": "span", "content": "b", "data": {"content": "italic"}}],
+            "data": {"content": "bold"},
+        },
+        "c",
+    ]
+    assert converter._text_to_structured_content("plain text") == "plain text"
+    assert converter._text_to_structured_content("") == ""
+
+
+def test_convert_with_rules():
+    converter = DslConverter()
+    body = ["[m1][p]vt[/p] [p]f[/p][/m]", "[m2][p]m [/p] Beispiel[/m]"]
+    content, rules = converter.convert_with_rules(body)
+    assert content == converter.convert_to_structured_content(body)
+    # Reported in table order, and only for exact [p]abbr[/p] matches
+    assert rules == ["n", "v"]
+    # Cached lines still contribute their rules
+    assert converter.convert_with_rules(body)[1] == ["n", "v"]
+
+    custom = DslConverter(pos_rules={"сущ": "n"})
+    assert custom.convert_with_rules(["[p]сущ[/p]", "[p]vt[/p]"])[1] == ["n"]
+
+
+def test_expand_headword():
+    expand = DslConverter.expand_headword
+    assert expand("[']A[/']bend") == ["Abend"]
+    assert expand("Schiff(s)bau") == ["Schiffsbau", "Schiffbau"]
+    assert expand("{sich }(etwas) merken") == ["etwas merken", "merken"]
+    assert expand("Bank(e(n))") == ["Banken", "Banke", "Bank"]
+    assert expand("C\\+\\+ \\(Sprache\\)") == ["C++ (Sprache)"]
+    assert expand("(ab)") == ["ab"]
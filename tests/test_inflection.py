@@ -0,0 +1,64 @@
+import json
+import zipfile
+
+from src.inflection import build_forms_dictionary, generate_forms, inflect
+
+
+def forms_of(lemma, rules):
+    return {form for form, _ in inflect(lemma, rules)}
+
+
+def test_inflect_by_pos_rule():
+    assert {"Hauses", "Häuser", "Häusern"} <= forms_of("Haus", ["n"])
+    assert {"Lehrerinnen"} <= forms_of("Lehrerin", ["n"])
+    assert {"macht", "machte", "gemacht"} <= forms_of("machen", ["v"])
+    assert {"arbeitet", "gearbeitet"} <= forms_of("arbeiten", ["v"])
+    assert {"aufgestanden", "aufzustehen", "aufstand"} <= forms_of("aufstehen", ["v"])
+    assert {"ging", "gegangen"} <= forms_of("gehen", ["v"])
+    # Irregular verbs keep their regular present, the table replaces single forms
+    assert {"geht", "gehe", "gehst", "gehend"} <= forms_of("gehen", ["v"])
+    assert {"kommt", "komme"} <= forms_of("kommen", ["v"])
+    assert {"fahre", "fahrt", "fährst", "fährt", "fahrend"} <= forms_of("fahren", ["v"])
+    assert "fahrst" not in forms_of("fahren", ["v"])
+    assert {"gib", "gibst", "gebt"} <= forms_of("geben", ["v"])
+    assert not {"geb", "gebst"} & forms_of("geben", ["v"])
+    assert {"steht", "aufsteht"} <= forms_of("aufstehen", ["v"])
+    assert {"tue", "tuend"} <= forms_of("tun", ["v"])
+    assert "seit" not in forms_of("sein", ["v"])
+    # Strong verbs with an inseparable prefix keep their irregular forms
+    assert {"verstand", "verstanden", "versteht", "verstehe"} <= forms_of(
+        "verstehen", ["v"]
+    )
+    assert "verstehte" not in forms_of("verstehen", ["v"])
+    assert {"bekam", "bekamen"} <= forms_of("bekommen", ["v"])
+    assert {"erfuhr", "erfährt"} <= forms_of("erfahren", ["v"])
+    assert {"gefiel", "gefällt"} <= forms_of("gefallen", ["v"])
+    # bei|chten is not a separable verb
+    assert {"beichtet", "beichtete"} <= forms_of("beichten", ["v"])
+    assert not {"cht", "beigechtet", "beizuchten"} & forms_of("beichten", ["v"])
+    assert {"größer", "größten", "große"} <= forms_of("groß", ["adj"])
+    assert {"besser", "beste"} <= forms_of("gut", ["adj"])
+    # The lemma itself, unknown rules and multi-word headwords give nothing
+    assert "Haus" not in forms_of("Haus", ["n"])
+    assert forms_of("schnell", ["adv"]) == set()
+    assert forms_of("nach Hause", ["n"]) == set()
+
+
+def test_forms_dictionary_points_forms_to_lemmas(tmp_path):
+    lemmas = {"Laden": {"n"}, "kaufen": {"v"}, "Rat": {"n"}, "raten": {"v"}}
+    assert generate_forms(lemmas, jobs=2) == generate_forms(lemmas)
+
+    path, count = build_forms_dictionary(lemmas, str(tmp_path), "dict", "Test")
+    assert path == tmp_path / "dict-forms.zip"
+    with zipfile.ZipFile(path) as zipf:
+        assert json.loads(zipf.read("index.json"))["title"] == "Test Forms"
+        entries = json.loads(zipf.read("term_bank_1.json"))
+    assert len(entries) == count
+    by_form = {}
+    for term, _, _, _, _, glossary, _, _ in entries:
+        by_form.setdefault(term, []).append(glossary[0])
+    # Forms keep the case of their lemma, so "Rate" and "rate" stay apart
+    assert by_form["Rate"] == [["Rat", ["plural"]]]
+    assert by_form["rate"] == [["raten", ["present"]]]
+    assert by_form["gekauft"] == [["kaufen", ["participle"]]]
+    assert "Laden" not in by_form
@@ -0,0 +1,78 @@
+import json
+import threading
+import urllib.request
+import zipfile
+
+from src.encoders import get_encoder
+from src.lookup import LookupIndex
+from src.packer import YomitanPacker
+from src.server import LookupServer
+
+TERMS = ["Haus", "haus", "Hausbau", "Häuser", "laden", "Laden", "Zug"]
+
+
+def _pack(tmp_path, encoder="json"):
+    packer = YomitanPacker(
+        str(tmp_path), "test", encoder=get_encoder(encoder), max_entries_per_bank=3
+    )
+    for i, term in enumerate(TERMS):
+        glossary = [{"type": "structured-content", "content": f"Def {i} «{term}»"}]
+        packer.add_entry(term, "", glossary, i + 1)
+    return packer.pack({"title": "Test", "format": 3})
+
+
+def test_index_answers_exact_and_prefix_lookups(tmp_path):
+    zip_path = _pack(tmp_path)
+    index = LookupIndex.open(zip_path)
+    try:
+        assert (index.title, index.entries) == ("Test", len(TERMS))
+        assert [json.loads(entry)[0] for entry in index.exact("Haus")] == [
+            "Haus",
+            "haus",
+        ]
+        assert [json.loads(entry)[0] for entry in index.exact("LADEN")] == [
+            "laden",
+            "Laden",
+        ]
+        assert json.loads(index.exact("Häuser")[0])[5] == [
+            {"type": "structured-content", "content": "Def 3 «Häuser»"}
+        ]
+        assert [json.loads(entry)[0] for entry in index.prefix("HAU")] == [
+            "Haus",
+            "haus",
+            "Hausbau",
+        ]
+        assert len(index.prefix("h", limit=2)) == 2
+        assert index.exact("Haut") == []
+    finally:
+        index.close()
+
+    # An unpacked dictionary written with orjson gives the same entries
+    unpacked = tmp_path / "unpacked"
+    with zipfile.ZipFile(_pack(tmp_path / "orjson", "orjson")) as zipf:
+        zipf.extractall(unpacked)
+    index = LookupIndex.open(unpacked)
+    assert [json.loads(entry)[0] for entry in index.exact("Zug")] == ["Zug"]
+    index.close()
+
+
+def test_server_returns_entries_with_their_dictionary(tmp_path):
+    index = LookupIndex.open(_pack(tmp_path))
+    server = LookupServer(("127.0.0.1", 0), [index])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{url}/lookup?q=H%C3%A4user") as response:
+            body = json.loads(response.read())
+        assert body["query"] == "Häuser"
+        assert [(r["dictionary"], r["entry"][0]) for r in body["results"]] == [
+            ("Test", "Häuser")
+        ]
+        with urllib.request.urlopen(
+            f"{url}/lookup?q=la&mode=prefix&limit=1"
+        ) as response:
+            assert len(json.loads(response.read())["results"]) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        index.close()
@@ -0,0 +1,135 @@
+import zipfile
+import zlib
+
+import pytest
+
+from src import media
+from src.cache import ConversionCache
+from src.converter import DslConverter
+from src.media import BundledFile, MediaIndex
+from src.packer import YomitanPacker
+
+
+def test_media_index_matches_case_and_merges_duplicates(tmp_path, monkeypatch):
+    hashed = []
+    digest = media._file_digest
+    monkeypatch.setattr(
+        media,
+        "_file_digest",
+        lambda source, bundles: hashed.append(source) or digest(source, bundles),
+    )
+    (tmp_path / "Haus.wav").write_bytes(b"RIFF1")
+    (tmp_path / "dach.wav").write_bytes(b"RIFF1")
+    (tmp_path / "baum.wav").write_bytes(b"RIFF2")
+    (tmp_path / "alt.wav").write_bytes(b"RIFF3")
+    (tmp_path / "dict.dsl").write_bytes(b"")
+    (tmp_path / "laute").mkdir()
+    (tmp_path / "laute" / "tanne.wav").write_bytes(b"RIFF tanne")
+    (tmp_path / "wort.spx").write_bytes(b"Speex audio")
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "old.wav").write_bytes(b"RIFF4")
+
+    index = MediaIndex(tmp_path)
+    assert set(index.sizes) == {
+        "Haus.wav",
+        "dach.wav",
+        "baum.wav",
+        "alt.wav",
+        "dict.dsl",
+        "laute/tanne.wav",
+        "wort.spx",
+    }
+    # Nothing is hashed until a name is referenced
+    assert hashed == []
+
+    converter = DslConverter(resolve_media=index.resolve)
+    content = converter.convert_to_structured_content(
+        [
+            "[s]HAUS.wav[/s] [s]dach.wav[/s] [s]fehlt.wav[/s] [s]laute/tanne.wav[/s] [s]wort.spx[/s]"
+        ]
+    )
+    hrefs = [
+        node["href"]
+        for node in content[0]["content"]
+        if isinstance(node, dict) and "href" in node
+    ]
+    assert hrefs == [
+        "?sound=Haus.wav",
+        "?sound=Haus.wav",
+        "?sound=fehlt.wav",
+        "?sound=laute/tanne.wav",
+    ]
+    assert index.duplicates == 1
+    # Only the files of the referenced sizes
+    assert sorted(path.name for path in hashed) == ["Haus.wav", "dach.wav"]
+
+    found, missing, unused = index.split(converter.media_files)
+    # Subdirectories and any file type are found, only media files count as unused
+    assert (found, missing, unused) == (
+        ["Haus.wav", "laute/tanne.wav", "wort.spx"],
+        ["fehlt.wav"],
+        ["alt.wav", "baum.wav"],
+    )
+    assert index.source("laute/tanne.wav") == tmp_path / "laute" / "tanne.wav"
+
+
+def test_cache_key_depends_only_on_referenced_media(tmp_path):
+    (tmp_path / "haus.wav").write_bytes(b"RIFF1")
+
+    def key(body):
+        cache = ConversionCache(
+            tmp_path / "cache.sqlite", {}, resolve_media=MediaIndex(tmp_path).resolve
+        )
+        try:
+            return cache.key(body)
+        finally:
+            cache.close()
+
+    with_sound = key(["[s]Haus.wav[/s] Haus"])
+    without_sound = key(["Haus"])
+    # An unrelated file leaves every key alone
+    (tmp_path / "baum.wav").write_bytes(b"RIFF2")
+    assert (key(["[s]Haus.wav[/s] Haus"]), key(["Haus"])) == (with_sound, without_sound)
+    # A file that changes what a reference resolves to changes its key
+    (tmp_path / "Haus.wav").write_bytes(b"RIFF3")
+    assert key(["[s]Haus.wav[/s] Haus"]) != with_sound
+
+
+def test_bundled_media_is_streamed_into_the_archive(tmp_path, monkeypatch):
+    bundle = tmp_path / "dict.dsl.dz.files.zip"
+    with zipfile.ZipFile(bundle, "w") as zipf:
+        zipf.writestr("haus.wav", b"RIFF1")
+        zipf.writestr("bild.png", b"PNG")
+        wave = b"RIFF" + b"".join(i.to_bytes(2, "little") for i in range(50_000))
+        zipf.writestr("wort.wav", wave)
+    (tmp_path / "bild.png").write_bytes(b"PNG loose")
+
+    index = MediaIndex(tmp_path, [bundle])
+    assert index.source("haus.wav") == BundledFile(bundle, "haus.wav")
+    assert index.source("bild.png") == tmp_path / "bild.png"
+
+    packer = YomitanPacker(str(tmp_path / "out"), "dict")
+    packer.add_media_file(index.source("haus.wav"), "haus.wav")
+    with zipfile.ZipFile(packer.pack({"title": "Test", "format": 3})) as zipf:
+        assert zipf.read("haus.wav") == b"RIFF1"
+
+    # An explicit level reaches bundled members too, still copied in chunks
+    for level in (1, 9):
+        packer = YomitanPacker(
+            str(tmp_path / f"level{level}"), "dict", compression_level=level
+        )
+        packer.add_media_file(BundledFile(bundle, "wort.wav"), "wort.wav")
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                zipfile.ZipFile,
+                "read",
+                lambda *args: pytest.fail("bundle member read whole"),
+            )
+            zip_path = packer.pack({"title": "Test", "format": 3})
+        with zipfile.ZipFile(zip_path) as zipf:
+            assert zipf.testzip() is None
+            assert zipf.read("wort.wav") == wave
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            assert zipf.getinfo("wort.wav").compress_size == len(
+                compressor.compress(wave) + compressor.flush()
+            )
@@ -0,0 +1,33 @@
+import json
+
+from src.converter import DslConverter
+from src.nodes import from_json, to_json
+
+
+def test_nodes_share_attributes_and_serialize_like_dicts():
+    converter = DslConverter()
+    first = converter._convert_line("[b]a[/b] [c]b[/c] [s]x.wav[/s] [ref]Haus[/ref]")
+    second = converter._convert_line("[b]c[/b] [c]d[/c]")
+    # Equal data dicts are stored once
+    assert first[0].attrs is second[0].attrs
+    assert first[2].attrs is second[2].attrs
+
+    content = to_json(first)
+    assert json.dumps(content) == json.dumps(
+        [
+            {"tag": "span", "content": "a", "data": {"content": "bold"}},
+            " ",
+            {
+                "tag": "span",
+                "content": "b",
+                "data": {"content": "color", "value": "darkcyan", "class": "colored"},
+            },
+            " ",
+            {"tag": "a", "href": "?sound=x.wav", "content": "🔊"},
+            " ",
+            {"tag": "a", "content": "Haus", "href": "?query=Haus"},
+        ]
+    )
+    # Round trips keep the key order, and every call builds fresh dicts
+    assert json.dumps(to_json(from_json(content))) == json.dumps(content)
+    assert to_json(first)[0]["data"] is not content[0]["data"]
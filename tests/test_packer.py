@@ -0,0 +1,318 @@
+import json
+import random
+import zipfile
+
+import pytest
+
+from src import packer as packer_module
+from src.encoders import get_encoder
+from src.packer import (
+    VOLUME_HEADROOM,
+    YomitanPacker,
+    encode_entry_head,
+    encode_term_prefix,
+)
+
+
+def _fill(packer, count):
+    for i in range(count):
+        glossary = [
+            {
+                "type": "structured-content",
+                "content": {"tag": "div", "content": f"Def {i}"},
+            }
+        ]
+        packer.add_entry(f"Wort{i}", "", glossary, i + 1, ["n"] if i % 2 else None)
+
+
+def _read_members(zip_path):
+    with zipfile.ZipFile(zip_path) as zipf:
+        return {name: zipf.read(name) for name in zipf.namelist()}
+
+
+def test_pack_splits_banks(tmp_path):
+    packer = YomitanPacker(str(tmp_path), "test")
+    packer.max_entries_per_bank = 3
+    _fill(packer, 7)
+    zip_path = packer.pack({"title": "Test", "format": 3})
+
+    members = _read_members(zip_path)
+    assert "index.json" in members
+    assert "styles.css" in members
+    banks = [json.loads(members[f"term_bank_{n}.json"]) for n in (1, 2, 3)]
+    assert [len(bank) for bank in banks] == [3, 3, 1]
+    assert banks[0][1] == [
+        "Wort1",
+        "",
+        "",
+        "n",
+        0,
+        [{"type": "structured-content", "content": {"tag": "div", "content": "Def 1"}}],
+        2,
+        "",
+    ]
+
+
+def test_streaming_matches_buffered_output(tmp_path):
+    buffered = YomitanPacker(str(tmp_path / "buffered"), "test")
+    streaming = YomitanPacker(str(tmp_path / "streaming"), "test", streaming=True)
+    for packer in (buffered, streaming):
+        packer.max_entries_per_bank = 3
+        _fill(packer, 7)
+
+    # Full banks are flushed as soon as they are complete
+    assert len(streaming.entries) == 1
+    assert streaming.entry_count == 7
+
+    metadata = {"title": "Test", "format": 3}
+    assert _read_members(buffered.pack(metadata)) == _read_members(
+        streaming.pack(metadata)
+    )
+    assert not (tmp_path / "streaming" / "test.zip.part").exists()
+
+
+def test_encoded_entries_match_raw_entries(tmp_path):
+    glossary = [
+        {"type": "structured-content", "content": {"tag": "div", "content": "Bäume"}}
+    ]
+    raw = YomitanPacker(str(tmp_path / "raw"), "test")
+    raw.add_entry("Baum", "", glossary, 1, ["n"])
+    encoded = YomitanPacker(str(tmp_path / "encoded"), "test")
+    encoded.add_encoded_entry(encode_entry_head("Baum", "", glossary, ["n"]), 1)
+
+    metadata = {"title": "Test", "format": 3}
+    assert _read_members(raw.pack(metadata)) == _read_members(encoded.pack(metadata))
+
+
+def test_orjson_encoder_produces_same_data(tmp_path):
+    pytest.importorskip("orjson")
+    encoder = get_encoder("orjson")
+    glossary = [
+        {
+            "type": "structured-content",
+            "content": ["Text ", {"tag": "span", "content": "ä"}],
+        }
+    ]
+    packer = YomitanPacker(str(tmp_path), "test", encoder=encoder)
+    packer.add_encoded_entry(
+        encode_entry_head("Wort", "", glossary, ["n", "v"], encoder), 7
+    )
+    packer.add_entry("Haus", "", glossary, 8)
+
+    bank = json.loads(
+        _read_members(packer.pack({"title": "Test", "format": 3}))["term_bank_1.json"]
+    )
+    assert bank == [
+        ["Wort", "", "", "n v", 0, glossary, 7, ""],
+        ["Haus", "", "", "", 0, glossary, 8, ""],
+    ]
+
+
+@pytest.mark.parametrize("level", [None, 1, 0])
+def test_compression_levels_and_stored_media(tmp_path, level):
+    sound = tmp_path / "wort.mp3"
+    sound.write_bytes(b"ID3" + bytes(4096))
+    packer = YomitanPacker(
+        str(tmp_path / "out"),
+        "test",
+        streaming=True,
+        compression_level=level,
+        compression_threads=2,
+    )
+    packer.max_entries_per_bank = 2
+    _fill(packer, 9)
+    packer.add_media_file(sound)
+    zip_path = packer.pack({"title": "Test", "format": 3})
+
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
+        infos = {info.filename: info for info in zipf.infolist()}
+        banks = [json.loads(zipf.read(f"term_bank_{n}.json")) for n in range(1, 6)]
+    assert [entry[6] for bank in banks for entry in bank] == list(range(1, 10))
+    assert infos["wort.mp3"].compress_type == zipfile.ZIP_STORED
+    expected = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+    assert infos["term_bank_1.json"].compress_type == expected
+    assert infos["index.json"].compress_type == expected
+    assert {m["name"] for m in packer.members} == set(infos)
+
+
+def test_precompressed_members_are_supported():
+    # Falling back is safe but slow: a new Python changed the zipfile internals
+    # _write_precompressed() relies on, so check them against its zipfile
+    assert packer_module.precompressed_members_supported(), (
+        "pre-deflated banks fall back to writestr() on this Python"
+    )
+
+
+def test_precompressed_banks_match_zipfile_fallback(tmp_path, monkeypatch):
+    archives = {}
+    for precompress in (True, False):
+        monkeypatch.setattr(
+            packer_module,
+            "precompressed_members_supported",
+            lambda precompress=precompress: precompress,
+        )
+        packer = YomitanPacker(
+            str(tmp_path / str(precompress)),
+            "test",
+            streaming=True,
+            compression_threads=2,
+        )
+        assert packer._precompress is precompress
+        packer.max_entries_per_bank = 2
+        _fill(packer, 9)
+        zip_path = packer.pack({"title": "Test", "format": 3})
+        with zipfile.ZipFile(zip_path) as zipf:
+            assert zipf.testzip() is None
+            assert {info.compress_type for info in zipf.infolist()} == {
+                zipfile.ZIP_DEFLATED
+            }
+        archives[precompress] = _read_members(zip_path)
+    assert archives[True] == archives[False]
+
+
+def test_encoded_variants_share_glossary(tmp_path):
+    glossary = [{"type": "structured-content", "content": "Bild"}]
+    raw = YomitanPacker(str(tmp_path / "raw"), "test")
+    for term in ("Photographie", "Fotografie"):
+        raw.add_entry(term, "", glossary, 3, ["n"])
+    variants = YomitanPacker(str(tmp_path / "variants"), "test")
+    glossary_json = json.dumps(glossary, ensure_ascii=False).encode("utf-8")
+    prefixes = [
+        encode_term_prefix(term, "", ["n"]) for term in ("Photographie", "Fotografie")
+    ]
+    variants.add_encoded_variants(prefixes, glossary_json, 3)
+
+    assert variants.entries[0][1] is variants.entries[1][1]
+    metadata = {"title": "Test", "format": 3}
+    assert _read_members(raw.pack(metadata)) == _read_members(variants.pack(metadata))
+
+
+def test_banks_split_by_serialized_size(tmp_path):
+    packer = YomitanPacker(
+        str(tmp_path),
+        "test",
+        streaming=True,
+        max_bank_bytes=1000,
+        max_entries_per_bank=50,
+    )
+    _fill(packer, 40)
+    members = _read_members(packer.pack({"title": "Test", "format": 3}))
+
+    banks = [
+        data for name, data in sorted(members.items()) if name.startswith("term_bank_")
+    ]
+    assert len(banks) > 1
+    # A bank only goes over the limit when a single entry does
+    assert all(len(data) <= 1000 for data in banks)
+    entries = [entry for data in banks for entry in json.loads(data)]
+    assert [entry[6] for entry in entries] == sorted(entry[6] for entry in entries)
+
+    buffered = YomitanPacker(
+        str(tmp_path / "buffered"), "test", max_bank_bytes=1000, max_entries_per_bank=50
+    )
+    _fill(buffered, 40)
+    assert (
+        _read_members(buffered.pack({"title": "Test", "format": 3})).keys()
+        == members.keys()
+    )
+
+
+def test_archive_is_split_into_volumes_with_their_media(tmp_path):
+    for name in ("a.wav", "b.wav"):
+        (tmp_path / name).write_bytes(b"RIFF" + name.encode())
+    packer = YomitanPacker(
+        str(tmp_path / "out"),
+        "test",
+        streaming=True,
+        max_entries_per_bank=1,
+        max_archive_bytes=VOLUME_HEADROOM + 200,
+    )
+    for i, sound in enumerate(["a.wav", "b.wav", "b.wav"]):
+        glossary = [
+            {
+                "type": "structured-content",
+                "content": {"tag": "a", "href": f"?sound={sound}"},
+            }
+        ]
+        packer.add_entry(f"Wort{i}", "", glossary, i + 1)
+    packer.add_media_file(tmp_path / "a.wav")
+    packer.add_media_file(tmp_path / "b.wav")
+    first = packer.pack({"title": "Test", "format": 3, "revision": "1"})
+
+    assert first == tmp_path / "out" / "test-1.zip"
+    assert [path.name for path in packer.volume_paths] == [
+        "test-1.zip",
+        "test-2.zip",
+        "test-3.zip",
+    ]
+    assert not (tmp_path / "out" / "test.zip").exists()
+    volumes = [_read_members(path) for path in packer.volume_paths]
+    assert [json.loads(v["index.json"])["title"] for v in volumes] == [
+        "Test (1/3)",
+        "Test (2/3)",
+        "Test (3/3)",
+    ]
+    assert {json.loads(v["index.json"])["revision"] for v in volumes} == {"1"}
+    assert [sorted(n for n in v if n.endswith(".wav")) for v in volumes] == [
+        ["a.wav"],
+        ["b.wav"],
+        ["b.wav"],
+    ]
+    assert [json.loads(v["term_bank_1.json"])[0][0] for v in volumes] == [
+        "Wort0",
+        "Wort1",
+        "Wort2",
+    ]
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+@pytest.mark.parametrize("late_media", [False, True])
+def test_volumes_stay_under_the_limit_with_their_media(tmp_path, late_media, streaming):
+    sounds = {f"s{n}.wav": random.Random(n).randbytes(20_000) for n in range(6)}
+    sounds["extra.png"] = random.Random(9).randbytes(30_000)  # linked from no entry
+    for name, data in sounds.items():
+        (tmp_path / name).write_bytes(data)
+    limit = VOLUME_HEADROOM + 50_000
+    packer = YomitanPacker(
+        str(tmp_path / "out"),
+        "test",
+        streaming=streaming,
+        max_entries_per_bank=2,
+        max_archive_bytes=limit,
+        media_sizes={name: len(data) for name, data in sounds.items()}
+        if late_media
+        else None,
+    )
+    if not late_media:
+        for name in sounds:
+            packer.add_media_file(tmp_path / name)
+    for i in range(12):
+        glossary = [
+            {
+                "type": "structured-content",
+                "content": {"tag": "a", "href": f"?sound=s{i % 6}.wav"},
+            }
+        ]
+        packer.add_entry(f"Wort{i}", "", glossary, i + 1)
+    if late_media:
+        for name in sounds:
+            packer.add_media_file(tmp_path / name)
+    packer.pack({"title": "Test", "format": 3})
+
+    assert len(packer.volume_paths) > 1
+    assert all(path.stat().st_size <= limit for path in packer.volume_paths)
+    volumes = [_read_members(path) for path in packer.volume_paths]
+    for members in volumes:
+        banks = [
+            json.loads(data)
+            for name, data in members.items()
+            if name.startswith("term_bank_")
+        ]
+        linked = {
+            entry[5][0]["content"]["href"].removeprefix("?sound=")
+            for bank in banks
+            for entry in bank
+        }
+        assert linked <= members.keys()
+    assert sum("extra.png" in members for members in volumes) == 1
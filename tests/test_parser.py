@@ -1,5 +1,12 @@
+import codecs
+import gzip
+
+import pytest
+
+from src.dictzip import write_dictzip
 from src.parser import DslParser
 
+
 def test_parse_basic_entry(tmp_path):
     dsl_content = (
         '#NAME\t"Test Dict"\n'
@@ -34,3 +41,127 @@ def test_parse_header(tmp_path):
     # We need to call parse() or at least read the header
     list(parser.parse())
     assert parser.headers["NAME"] == "Another Test"
+
+def test_shards_cover_all_entries(tmp_path):
+    lines = ['#NAME\t"Shard Test"', ""]
+    for i in range(200):
+        lines.append(f"Wört{i}")
+        lines.append(f"\t[m1]Bedeutung {i} 😀[/m]")
+        if i % 3:
+            lines.append("")
+    dsl_file = tmp_path / "test.dsl"
+    for encoding in ("utf-16", "utf-16-be"):
+        data = "\r\n".join(lines).encode(encoding)
+        if encoding == "utf-16-be":
+            data = b"\xfe\xff" + data
+        dsl_file.write_bytes(data)
+
+        expected = list(DslParser(str(dsl_file)).parse())
+        for count in (1, 3, 7, 50):
+            parser = DslParser(str(dsl_file))
+            shards = parser.shard_offsets(count)
+            assert 1 < len(shards) <= count or count == 1
+            entries = [e for start, end in shards for e in parser.parse_range(start, end)]
+            assert entries == expected
+
+def test_read_headers_stops_at_body(tmp_path):
+    dsl_content = '#NAME\t"Header Test"\n#INDEX_LANGUAGE\t"German"\n\nWort\n\tBody\n'
+    dsl_file = tmp_path / "test.dsl"
+    dsl_file.write_text(dsl_content, encoding="utf-16")
+
+    parser = DslParser(str(dsl_file))
+    offset = parser.read_headers()
+    # BOM plus the two header lines, two bytes per UTF-16 code unit
+    assert offset == 2 + 2 * len('#NAME\t"Header Test"\n#INDEX_LANGUAGE\t"German"\n')
+    assert parser.headers == {"NAME": "Header Test", "INDEX_LANGUAGE": "German"}
+    assert list(parser.parse()) == [{"headword": "Wort", "headwords": ["Wort"], "body": ["Body"]}]
+
+def test_index_spans_match_parse(tmp_path):
+    dsl_content = '#NAME\t"Index Test"\n\nWort\n\tErste\n\tZweite\n\nHaus\n\tGebäude\nBaum\n\tPflanze\n'
+    dsl_file = tmp_path / "test.dsl"
+    dsl_file.write_text(dsl_content, encoding="utf-16")
+    index_file = tmp_path / "test.dsl.idx.json"
+
+    parser = DslParser(str(dsl_file))
+    index = parser.load_index()
+    assert [headwords for headwords, _, _ in index] == [["Wort"], ["Haus"], ["Baum"]]
+    assert index_file.exists()
+    spans = [(offset, length) for _, offset, length in index]
+    assert list(parser.parse_spans(spans)) == list(DslParser(str(dsl_file)).parse())
+
+    # A fresh index is loaded as is, a changed source file triggers a rebuild
+    reloaded = DslParser(str(dsl_file))
+    assert reloaded.load_index() == index
+    assert reloaded.headers["NAME"] == "Index Test"
+    dsl_file.write_text(dsl_content + "Neu\n\tEintrag\n", encoding="utf-16")
+    assert [headwords for headwords, _, _ in DslParser(str(dsl_file)).load_index()][-1] == ["Neu"]
+
+def test_dictzip_matches_plain_file(tmp_path):
+    lines = ['#NAME\t"Dictzip Test"', ""]
+    for i in range(300):
+        lines += [f"Wört{i}", f"\t[m1]Bedeutung {i}[/m]", ""]
+    data = "\r\n".join(lines).encode("utf-16")
+    plain = tmp_path / "test.dsl"
+    plain.write_bytes(data)
+    # Small chunks so entries straddle chunk boundaries
+    write_dictzip(tmp_path / "test.dsl.dz", data, chunk_size=500)
+    (tmp_path / "test.dsl.gz").write_bytes(gzip.compress(data))
+
+    expected = list(DslParser(str(plain)).parse())
+    for name in ("test.dsl.dz", "test.dsl.gz"):
+        parser = DslParser(str(tmp_path / name))
+        assert parser.size() == len(data)
+        assert list(parser.parse()) == expected
+        assert parser.headers["NAME"] == "Dictzip Test"
+        entries = [e for start, end in parser.shard_offsets(5) for e in parser.parse_range(start, end)]
+        assert entries == expected
+        index = parser.load_index()
+        assert list(parser.parse_spans([(offset, length) for _, offset, length in index[::-1]])) == expected[::-1]
+
+@pytest.mark.parametrize(
+    "encoding, bom",
+    [
+        ("utf-8", codecs.BOM_UTF8),
+        ("utf-8", b""),
+        ("utf-16-le", b""),
+        ("utf-16-be", b""),
+        ("utf-16-be", codecs.BOM_UTF16_BE),
+        ("cp1252", b""),
+    ],
+)
+def test_encodings_are_detected(tmp_path, encoding, bom):
+    lines = ['#NAME\t"Kodierung"', ""]
+    for i in range(50):
+        lines += [f"Straße{i}", f"\t[m1]Größe {i}[/m]", ""]
+    dsl_file = tmp_path / "test.dsl"
+    dsl_file.write_bytes(bom + "\r\n".join(lines).encode(encoding))
+
+    parser = DslParser(str(dsl_file))
+    entries = list(parser.parse())
+    assert len(entries) == 50
+    assert entries[7] == {"headword": "Straße7", "headwords": ["Straße7"], "body": ["[m1]Größe 7[/m]"]}
+    assert parser.headers["NAME"] == "Kodierung"
+    assert [e for start, end in parser.shard_offsets(4) for e in parser.parse_range(start, end)] == entries
+
+def test_consecutive_headwords_share_the_body(tmp_path):
+    dsl_content = (
+        '#NAME\t"Varianten"\n\n'
+        "Photographie\nFotografie\n\t[m1]Bild[/m]\n\t[m1]Technik[/m]\n"
+        "Haus\n\t[m1]Gebäude[/m]\n\n"
+        "Leer\n\n"
+        "Schiff(s)bau\n{sich }bauen\n#INDEX_LANGUAGE\t\"German\"\nbaute\n\t[m1]Werft[/m]\n"
+    )
+    dsl_file = tmp_path / "test.dsl"
+    dsl_file.write_text(dsl_content, encoding="utf-16")
+
+    parser = DslParser(str(dsl_file))
+    entries = list(parser.parse())
+    assert [(e["headwords"], e["body"]) for e in entries] == [
+        (["Photographie", "Fotografie"], ["[m1]Bild[/m]", "[m1]Technik[/m]"]),
+        (["Haus"], ["[m1]Gebäude[/m]"]),
+        (["Leer"], []),
+        (["Schiff(s)bau", "{sich }bauen", "baute"], ["[m1]Werft[/m]"]),
+    ]
+    index = parser.load_index()
+    assert [headwords for headwords, _, _ in index] == [e["headwords"] for e in entries]
+    assert list(parser.parse_spans([(offset, length) for _, offset, length in index])) == entries
@@ -0,0 +1,52 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from src.pipeline import convert_dsl_file
+from src.profiling import SLOWEST_ENTRIES, Profiler
+from src.sinks import OutputSink
+
+
+def test_profiler_report(tmp_path):
+    profiler = Profiler("test", total_bytes=1000)
+    profiler.start()
+    for i in range(SLOWEST_ENTRIES + 5):
+        with profiler.stage("parse"):
+            pass
+        with profiler.stage("convert", f"Wort{i}"):
+            sum(range(i * 1000))
+        profiler.entry_done(i * 10)
+
+    report_path = profiler.finish(tmp_path)
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["entries"] == SLOWEST_ENTRIES + 5
+    assert report["stages"]["convert"]["calls"] == SLOWEST_ENTRIES + 5
+    assert set(report["stages"]) == {"parse", "convert"}
+    slowest = report["slowest_entries"]
+    assert len(slowest) == SLOWEST_ENTRIES
+    assert [e["seconds"] for e in slowest] == sorted(
+        (e["seconds"] for e in slowest), reverse=True
+    )
+    assert not (tmp_path / "test.convert.prof").exists()
+
+
+class FailingSink(OutputSink):
+    def open(self, name):
+        return io.BytesIO()
+
+    def commit(self, fileobj, name):
+        raise OSError("disk full")
+
+
+def test_failed_conversion_stops_tracing(tmp_path):
+    dsl_path = tmp_path / "Test.dsl"
+    dsl_path.write_text(
+        '#NAME\t"Test"\n\nWort\n\t[m1]Definition[/m]\n', encoding="utf-16"
+    )
+    with pytest.raises(OSError):
+        convert_dsl_file(
+            dsl_path, tmp_path, str(tmp_path), {}, profile=True, sink=FailingSink()
+        )
+    assert not tracemalloc.is_tracing()
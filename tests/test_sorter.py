@@ -0,0 +1,78 @@
+import json
+
+from src.packer import encode_term_prefix
+from src.sorter import EntrySorter
+
+
+class CollectingPacker:
+    def __init__(self):
+        self.rows = []
+
+    def add_encoded_variants(self, prefixes, glossary_json, sequence):
+        for prefix in prefixes:
+            self.rows.append(
+                (json.loads(prefix[:-2] + b"]"), json.loads(glossary_json), sequence)
+            )
+
+
+ENTRIES = [
+    (["laden"], ["v"], "load"),
+    (["Zug"], ["n"], "train"),
+    (["Laden", "Läden"], ["n"], "shop"),
+    (["laden"], ["v"], "invite"),
+    (["laden"], ["adj"], "loaded"),
+    (["Zug"], ["n"], "train"),
+]
+
+
+def sort_entries(tmp_path, duplicates, run_bytes):
+    sorter = EntrySorter(duplicates=duplicates, run_bytes=run_bytes, temp_dir=tmp_path)
+    for sequence, (terms, rules, text) in enumerate(ENTRIES, 1):
+        prefixes = [encode_term_prefix(term, "", rules) for term in terms]
+        sorter.add_encoded_variants(prefixes, json.dumps([text]).encode(), sequence)
+    packer = CollectingPacker()
+    sorter.write_to(packer)
+    assert list(tmp_path.iterdir()) == []
+    return sorter, [
+        (head[0], head[3], glossary, sequence)
+        for head, glossary, sequence in packer.rows
+    ]
+
+
+def test_sort_is_independent_of_run_size(tmp_path):
+    sorter, rows = sort_entries(tmp_path, "keep", run_bytes=1)
+    assert sorter.run_count == 7
+    assert rows == [
+        ("Laden", "n", ["shop"], 3),
+        ("laden", "v", ["load"], 1),
+        ("laden", "v", ["invite"], 4),
+        ("laden", "adj", ["loaded"], 5),
+        ("Läden", "n", ["shop"], 3),
+        ("Zug", "n", ["train"], 2),
+        ("Zug", "n", ["train"], 6),
+    ]
+    assert sort_entries(tmp_path, "keep", run_bytes=1 << 20)[1] == rows
+
+
+def test_duplicates_are_grouped_or_merged(tmp_path):
+    _, grouped = sort_entries(tmp_path, "group", run_bytes=1)
+    assert [
+        (term, sequence) for term, _, _, sequence in grouped if term in ("laden", "Zug")
+    ] == [
+        ("laden", 1),
+        ("laden", 1),
+        ("laden", 1),
+        ("Zug", 2),
+        ("Zug", 2),
+    ]
+
+    sorter, merged = sort_entries(tmp_path, "merge", run_bytes=100)
+    # Same term and rules are merged, identical glossaries are kept once
+    assert merged == [
+        ("Laden", "n", ["shop"], 3),
+        ("laden", "v", ["load", "invite"], 1),
+        ("laden", "adj", ["loaded"], 1),
+        ("Läden", "n", ["shop"], 3),
+        ("Zug", "n", ["train"], 2),
+    ]
+    assert sorter.merged == 2
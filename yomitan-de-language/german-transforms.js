@@ -18,6 +18,138 @@ const conditions = {
   adj: { name: "Adjective", isDictionaryForm: true },
 };
 
+// === КОМПИЛЯЦИЯ ПРАВИЛ ===
+// Yomitan вызывает isInflected.test() для каждого правила и каждой строки-кандидата.
+// Вместо отдельного прохода RegExp на правило строка разбирается один раз
+// (обратное дерево суффиксов, позиции переносов строк и умлаутов, регистр),
+// а правила лишь проверяют готовый результат. Каждое isInflected остаётся
+// RegExp с исходным source: Yomitan строит из них эвристику трансформации.
+
+// Узел дерева (trie): переходы по символам и номер слова, которое здесь заканчивается
+function createTrieNode() {
+  return { next: new Map(), id: -1 };
+}
+
+function trieAdd(root, key, reverse) {
+  let node = root;
+  for (let i = 0; i < key.length; i++) {
+    const ch = key[reverse ? key.length - 1 - i : i];
+    let child = node.next.get(ch);
+    if (child === undefined) {
+      child = createTrieNode();
+      node.next.set(ch, child);
+    }
+    node = child;
+  }
+  return node;
+}
+
+// Длины всех слов дерева, которыми начинается (или при reverse — заканчивается) text
+function trieMatches(root, text, reverse) {
+  const lengths = [];
+  let node = root;
+  for (let i = 0; i < text.length; i++) {
+    node = node.next.get(text[reverse ? text.length - 1 - i : i]);
+    if (node === undefined) break;
+    if (node.id !== -1) lengths.push(i + 1);
+  }
+  return lengths;
+}
+
+function createWordTrie(words, reverse) {
+  const root = createTrieNode();
+  words.forEach((word, id) => {
+    trieAdd(root, word, reverse).id = id;
+  });
+  return root;
+}
+
+// Приведение регистра как у RegExp с флагом i (без u): toUpperCase по
+// символу, если он остаётся одним символом и не-ASCII не становится ASCII
+const foldedChars = new Map();
+function foldCase(text) {
+  let folded = "";
+  for (let i = 0; i < text.length; i++) {
+    const code = text.charCodeAt(i);
+    if (code < 128) {
+      folded += code >= 97 && code <= 122 ? String.fromCharCode(code - 32) : text[i];
+      continue;
+    }
+    let upper = foldedChars.get(text[i]);
+    if (upper === undefined) {
+      upper = text[i].toUpperCase();
+      if (upper.length !== 1 || upper.charCodeAt(0) < 128) upper = text[i];
+      foldedChars.set(text[i], upper);
+    }
+    folded += upper;
+  }
+  return folded;
+}
+
+// Все суффиксы простых правил в одном обратном дереве
+const suffixTrie = createTrieNode();
+let suffixCount = 0;
+
+function registerSuffix(suffix) {
+  const node = trieAdd(suffixTrie, suffix, true);
+  if (node.id === -1) node.id = suffixCount++;
+  return node.id;
+}
+
+// Разбор последней проверенной строки: Yomitan проверяет её всеми правилами подряд
+let analysis = null;
+
+function analyze(term) {
+  if (analysis !== null && analysis.term === term) return analysis;
+  const suffixes = new Uint8Array(suffixCount);
+  let node = suffixTrie;
+  for (let i = term.length - 1; i >= 0; i--) {
+    node = node.next.get(term[i]);
+    if (node === undefined) break;
+    if (node.id !== -1) suffixes[node.id] = 1;
+  }
+  // `.` не совпадает с переносами строк, [äöü] ищется только в нижнем регистре
+  let firstBreak = term.length;
+  let firstUmlaut = term.length;
+  for (let i = 0; i < term.length; i++) {
+    const code = term.charCodeAt(i);
+    if (code === 10 || code === 13 || code === 0x2028 || code === 0x2029) {
+      firstBreak = i;
+      break;
+    }
+    if (firstUmlaut === term.length && (code === 0xe4 || code === 0xf6 || code === 0xfc)) {
+      firstUmlaut = i;
+    }
+  }
+  analysis = { term, suffixes, firstBreak, firstUmlaut, folded: null };
+  return analysis;
+}
+
+function foldedTerm(termAnalysis) {
+  if (termAnalysis.folded === null) termAnalysis.folded = foldCase(termAnalysis.term);
+  return termAnalysis.folded;
+}
+
+// RegExp, чей test() заменён скомпилированной проверкой. С confirm проверка
+// лишь отсеивает строки, а окончательное решение принимает исходный RegExp.
+class CompiledPattern extends RegExp {
+  static get [Symbol.species]() {
+    return RegExp;
+  }
+
+  constructor(source, flags, matches, confirm = false) {
+    super(source, flags);
+    this.matches = matches;
+    this.confirm = confirm;
+  }
+
+  test(term) {
+    term = String(term);
+    if (!this.matches(term)) return false;
+    return this.confirm ? super.test(term) : true;
+  }
+}
+
 // === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 function stripSuffix(term, suffix, replacement) {
   if (term.endsWith(suffix)) {
@@ -35,9 +167,14 @@ function deinflectUmlaut(term) {
 }
 
 function makeSafeRule(suffix, replacement = "", minRootLength = 3) {
+  const id = registerSuffix(suffix);
   return {
     type: "other",
-    isInflected: new RegExp(`^.{${minRootLength},}${suffix}$`),
+    isInflected: new CompiledPattern(`^.{${minRootLength},}${suffix}$`, "", (term) => {
+      const { suffixes, firstBreak } = analyze(term);
+      const rootLength = term.length - suffix.length;
+      return suffixes[id] === 1 && rootLength >= minRootLength && firstBreak >= rootLength;
+    }),
     deinflect: (term) => stripSuffix(term, suffix, replacement),
     conditionsIn: [],
     conditionsOut: [],
@@ -45,9 +182,14 @@ function makeSafeRule(suffix, replacement = "", minRootLength = 3) {
 }
 
 function makeSafeUmlautRule(suffix, replacement = "", minRootLength = 3) {
+  const id = registerSuffix(suffix);
   return {
     type: "other",
-    isInflected: new RegExp(`^.*[äöü].*${suffix}$`),
+    isInflected: new CompiledPattern(`^.*[äöü].*${suffix}$`, "", (term) => {
+      const { suffixes, firstBreak, firstUmlaut } = analyze(term);
+      const rootLength = term.length - suffix.length;
+      return suffixes[id] === 1 && firstBreak >= rootLength && firstUmlaut < rootLength;
+    }),
     deinflect: (term) => {
       if (term.length - suffix.length < minRootLength) return term;
       const stripped = stripSuffix(term, suffix, replacement);
@@ -146,9 +288,13 @@ const irregularNouns = {
   herren: "herr",
 };
 
+const irregularNounForms = new Set(Object.keys(irregularNouns).map(foldCase));
+
 const irregularNounsRule = {
   type: "other",
-  isInflected: new RegExp(`^(${Object.keys(irregularNouns).join("|")})$`, "i"),
+  isInflected: new CompiledPattern(`^(${Object.keys(irregularNouns).join("|")})$`, "i", (term) =>
+    irregularNounForms.has(foldedTerm(analyze(term)))
+  ),
   deinflect: (term) => {
     const lowerTerm = term.toLowerCase();
     const dictForm = irregularNouns[lowerTerm];
@@ -164,13 +310,22 @@ const irregularNounsRule = {
 };
 
 // === ПРАВИЛО РАСЩЕПЛЕНИЯ КОМПАУНДОВ (Compound Splitter) ===
+const compoundRootTrie = createWordTrie(foldCase(compoundRoots).split("|"), true);
+const compoundRootAtEnd = new RegExp(`(${compoundRoots})$`, "i");
+
 const compoundRule = {
   type: "other",
   // Ищем слова, которые ЗАКАНЧИВАЮТСЯ на один из частых корней,
   // но при этом имеют минимум 2 буквы перед ним (чтобы не отрезать само слово от себя)
-  isInflected: new RegExp(`^.{2,}?(${compoundRoots})$`, "i"),
+  isInflected: new CompiledPattern(`^.{2,}?(${compoundRoots})$`, "i", (term) => {
+    const termAnalysis = analyze(term);
+    return trieMatches(compoundRootTrie, foldedTerm(termAnalysis), true).some((rootLength) => {
+      const headLength = term.length - rootLength;
+      return headLength >= 2 && termAnalysis.firstBreak >= headLength;
+    });
+  }),
   deinflect: (term) => {
-    const match = term.match(new RegExp(`(${compoundRoots})$`, "i"));
+    const match = term.match(compoundRootAtEnd);
     if (match) {
       const root = match[1];
       // Возвращаем найденный корень с сохранением регистра исходного слова
@@ -358,9 +513,13 @@ const irregularVerbs = {
   gewaschen: "waschen",
 };
 
+const irregularVerbForms = new Set(Object.keys(irregularVerbs).map(foldCase));
+
 const irregularVerbsRule = {
   type: "other",
-  isInflected: new RegExp(`^(${Object.keys(irregularVerbs).join("|")})$`, "i"),
+  isInflected: new CompiledPattern(`^(${Object.keys(irregularVerbs).join("|")})$`, "i", (term) =>
+    irregularVerbForms.has(foldedTerm(analyze(term)))
+  ),
   deinflect: (term) => {
     const lowerTerm = term.toLowerCase();
     return irregularVerbs[lowerTerm] || term;
@@ -370,14 +529,39 @@ const irregularVerbsRule = {
 };
 
 // === ПРАВИЛА ОТДЕЛЯЕМЫХ ПРИСТАВОК ===
+// Один разбор строки для всех приставок: дерево с начала (ausgemacht) и с конца (macht aus)
+const foldedSepPrefixes = foldCase(sepPrefixes).split("|");
+const sepPrefixTrie = createWordTrie(foldedSepPrefixes, false);
+const sepPrefixEndTrie = createWordTrie(foldedSepPrefixes, true);
+const splitVerbPattern = new RegExp(`^([a-zäöüß]+)\\s+(${sepPrefixes})$`, "i");
+const prefixedWeakParticiple = new RegExp(`^(${sepPrefixes})ge(.{3,})t$`, "i");
+const prefixedStrongParticiple = new RegExp(`^(${sepPrefixes})ge(.{3,}en)$`, "i");
+
+// Приставка + ge + минимум 3 символа + окончание (T или EN в приведённом регистре)
+function matchesPrefixedParticiple(term, ending) {
+  const termAnalysis = analyze(term);
+  const folded = foldedTerm(termAnalysis);
+  if (!folded.endsWith(ending)) return false;
+  const stemEnd = term.length - ending.length;
+  return (
+    termAnalysis.firstBreak >= stemEnd &&
+    trieMatches(sepPrefixTrie, folded, false).some(
+      (prefixLength) => folded.startsWith("GE", prefixLength) && stemEnd - prefixLength - 2 >= 3
+    )
+  );
+}
+
 const separablePrefixRules = [
   {
     type: "other",
-    isInflected: new RegExp(`^([a-zäöüß]+)\\s+(${sepPrefixes})$`, "i"),
+    isInflected: new CompiledPattern(
+      splitVerbPattern.source,
+      "i",
+      (term) => trieMatches(sepPrefixEndTrie, foldedTerm(analyze(term)), true).length > 0,
+      true
+    ),
     deinflect: (term) => {
-      const match = term.match(
-        new RegExp(`^([a-zäöüß]+)\\s+(${sepPrefixes})$`, "i")
-      );
+      const match = term.match(splitVerbPattern);
       if (!match) return term;
       let [, verb, prefix] = match;
       verb = verb.toLowerCase();
@@ -391,17 +575,19 @@ const separablePrefixRules = [
   },
   {
     type: "other",
-    isInflected: new RegExp(`^(${sepPrefixes})ge(.{3,})t$`, "i"),
-    deinflect: (term) =>
-      term.replace(new RegExp(`^(${sepPrefixes})ge(.{3,})t$`, "i"), "$1$2en"),
+    isInflected: new CompiledPattern(prefixedWeakParticiple.source, "i", (term) =>
+      matchesPrefixedParticiple(term, "T")
+    ),
+    deinflect: (term) => term.replace(prefixedWeakParticiple, "$1$2en"),
     conditionsIn: [],
     conditionsOut: [],
   },
   {
     type: "other",
-    isInflected: new RegExp(`^(${sepPrefixes})ge(.{3,}en)$`, "i"),
-    deinflect: (term) =>
-      term.replace(new RegExp(`^(${sepPrefixes})ge(.{3,}en)$`, "i"), "$1$2"),
+    isInflected: new CompiledPattern(prefixedStrongParticiple.source, "i", (term) =>
+      matchesPrefixedParticiple(term, "EN")
+    ),
+    deinflect: (term) => term.replace(prefixedStrongParticiple, "$1$2"),
     conditionsIn: [],
     conditionsOut: [],
   },
@@ -451,7 +637,12 @@ const conjugationRules = [
 const complexVerbRules = [
   {
     type: "other",
-    isInflected: /^(.*[^aeiou])(i|ie)([^aeiou]+)(t|st)$/,
+    isInflected: new CompiledPattern(
+      "^(.*[^aeiou])(i|ie)([^aeiou]+)(t|st)$",
+      "",
+      (term) => term.endsWith("t") && term.includes("i"),
+      true
+    ),
     deinflect: (term) => {
       const match = term.match(/^(.*[^aeiou])(i|ie)([^aeiou]+)(t|st)$/);
       if (!match) return term;
@@ -462,31 +653,57 @@ const complexVerbRules = [
   },
   {
     type: "other",
-    isInflected: /^(.{2,})zu(.{3,}en)$/,
+    isInflected: new CompiledPattern(
+      "^(.{2,})zu(.{3,}en)$",
+      "",
+      (term) => term.endsWith("en") && term.includes("zu"),
+      true
+    ),
     deinflect: (term) => term.replace(/^(.{2,})zu(.{3,}en)$/, "$1$2"),
     conditionsIn: [],
     conditionsOut: [],
   },
   {
     type: "other",
-    isInflected: /^ge.{3,}t$/,
+    isInflected: new CompiledPattern(
+      "^ge.{3,}t$",
+      "",
+      (term) =>
+        term.length >= 6 &&
+        term.startsWith("ge") &&
+        term.endsWith("t") &&
+        analyze(term).firstBreak >= term.length - 1
+    ),
     deinflect: (term) => term.slice(2, -1) + "en",
     conditionsIn: [],
     conditionsOut: [],
   },
   {
     type: "other",
-    isInflected: /^ge.{3,}en$/,
+    isInflected: new CompiledPattern(
+      "^ge.{3,}en$",
+      "",
+      (term) =>
+        term.length >= 7 &&
+        term.startsWith("ge") &&
+        term.endsWith("en") &&
+        analyze(term).firstBreak >= term.length - 2
+    ),
     deinflect: (term) => term.slice(2),
     conditionsIn: [],
     conditionsOut: [],
   },
 ];
 
+const sharpSEndings = ["ss", "sst", "ssen", "sste", "sse"].map(registerSuffix);
+
 const miscRules = [
   {
     type: "other",
-    isInflected: /ss(t|en|te|e)?$/,
+    isInflected: new CompiledPattern("ss(t|en|te|e)?$", "", (term) => {
+      const { suffixes } = analyze(term);
+      return sharpSEndings.some((id) => suffixes[id] === 1);
+    }),
     deinflect: (term) =>
       term.replace(/ss(t|en|te|e)?$/, (match) => "ß" + match.slice(2)),
     conditionsIn: [],
@@ -110,3 +110,97 @@ describe('german-transforms misc rules', () => {
     assert.equal(applyRules(rules, 'herausgehen', 'v'), 'ausgehen');
   });
 });
+
+// Fixed word list for the compiled matcher checks and the benchmark:
+// inflected forms, dictionary forms, compounds and split verbs
+const benchmarkWords = [
+  'Tage', 'Kinder', 'Regeln', 'Autos', 'Tische', 'Häuser', 'Männer', 'Töne', 'Türen', 'Bäume',
+  'Ärztinnen', 'Ärztin', 'Lehrerinnen', 'Mütter', 'Vätern', 'Themen', 'Museen', 'Ideen', 'Eiern',
+  'guten', 'gutes', 'gutem', 'schneller', 'neusten', 'kälter', 'ärmsten', 'schönsten', 'größeren',
+  'wanderst', 'machtest', 'macht', 'fährt', 'liest', 'spricht', 'gibt', 'nimmt', 'arbeitete',
+  'zulernen', 'anzufangen', 'gemacht', 'gefahren', 'gegangen', 'gesehen', 'aufgestanden',
+  'ausgemacht', 'eingekauft', 'mitgenommen', 'zurückgegeben', 'herausgegangen', 'hinlegen',
+  'ging aus', 'kam an', 'stand auf', 'macht zu', 'Fluss', 'Maß', 'wissen', 'musste', 'Schloss',
+  'Kindergarten', 'Hausaufgabe', 'Bahnhofstraße', 'Schulhaus', 'Arbeitszimmer', 'Bürgeramt',
+  'Lebenszeit', 'Wasserwerk', 'Spielplatz', 'Kinderbuch', 'Apfelbaum', 'Haustür', 'Mann',
+  'bin', 'ist', 'war', 'hatte', 'wurde', 'kann', 'weiß', 'ging', 'kam', 'sah', 'nahm', 'half',
+  'laufen', 'Haus', 'Tisch', 'schnell', 'gut', 'und', 'der', 'die', 'das', 'ein', 'mit', 'zu',
+  'Verantwortung', 'Geschwindigkeitsbegrenzung', 'Donaudampfschifffahrt', 'Straßenbahnhaltestelle',
+];
+
+// Case, line-break and case-folding corner cases the compiled checks must get right
+const edgeCaseWords = [
+  '', 't', 'en', 'ss', 'WEIß', 'weiẞ', 'ſtand', 'KIND', 'Ta\nge', '\nTage', 'Tage\n', 'ge\nmacht',
+  'gema\nchen', 'aus\nge\nmacht', 'Kinder\nhaus', 'xy haus', 'GING AUS', 'ging\taus',
+  'AUSGEMACHT', 'ausGEmachT', 'AUSGEGANGEN', 'zurückgeholt', 'ZURÜCKGEHOLT', 'HÄUSER', 'äte',
+  'Kinderhaus', 'KINDERHAUS', 'xhaus', 'xxhaus', 'sst', 'Flusse', 'Flüsse',
+];
+
+const allRules = Object.values(transforms).flatMap((transform) => transform.rules);
+
+// What Yomitan would get from the plain regular expression of each rule
+function regexTest(rule, term) {
+  return RegExp.prototype.test.call(rule.isInflected, term);
+}
+
+function compiledTest(rule, term) {
+  return rule.isInflected.test(term);
+}
+
+// Every rule of every transform tested against one term, like a Yomitan lookup
+function lookup(test, term) {
+  const results = [];
+  for (const rule of allRules) {
+    if (test(rule, term)) results.push(rule.deinflect(term));
+  }
+  return results;
+}
+
+function lookupsPerSecond(test, words, minMs = 200) {
+  let count = 0;
+  const start = performance.now();
+  let elapsed = 0;
+  do {
+    for (const word of words) lookup(test, word);
+    count += words.length;
+    elapsed = performance.now() - start;
+  } while (elapsed < minMs);
+  return (count / elapsed) * 1000;
+}
+
+describe('german-transforms compiled matchers', () => {
+  it('match exactly like the rule regular expressions', () => {
+    const words = benchmarkWords.flatMap((word) => [word, word.toUpperCase(), word.toLowerCase()]);
+    for (const term of [...words, ...edgeCaseWords]) {
+      for (const rule of allRules) {
+        assert.equal(
+          compiledTest(rule, term),
+          regexTest(rule, term),
+          `/${rule.isInflected.source}/${rule.isInflected.flags} on ${JSON.stringify(term)}`
+        );
+      }
+    }
+  });
+
+  it('keep RegExp sources for the Yomitan heuristic', () => {
+    for (const rule of allRules) {
+      assert.ok(rule.isInflected instanceof RegExp);
+      assert.doesNotThrow(() => new RegExp(rule.isInflected.source, rule.isInflected.flags));
+    }
+  });
+
+  it('benchmark: lookups per second before and after compilation', (t) => {
+    for (const word of benchmarkWords) {
+      assert.deepEqual(lookup(compiledTest, word), lookup(regexTest, word));
+    }
+    // Warm up both paths before measuring
+    lookupsPerSecond(regexTest, benchmarkWords, 50);
+    lookupsPerSecond(compiledTest, benchmarkWords, 50);
+    const before = lookupsPerSecond(regexTest, benchmarkWords);
+    const after = lookupsPerSecond(compiledTest, benchmarkWords);
+    t.diagnostic(
+      `regex rules: ${Math.round(before)} lookups/s, compiled rules: ${Math.round(after)} lookups/s ` +
+        `(${(after / before).toFixed(1)}x)`
+    );
+  });
+});